@@ -1,7 +1,9 @@
 import os
 import logging
 import asyncio
+import time
 import wave
+from contextlib import contextmanager
 
 from dotenv import load_dotenv
 
@@ -14,7 +16,7 @@ from livekit.agents import (
     llm,
     metrics,
 )
-from livekit.agents.pipeline import VoicePipelineAgent
+from livekit.agents.pipeline import AgentCallContext, VoicePipelineAgent
 from livekit.agents.background_audio import BackgroundAudioPlayer, AudioConfig
 from livekit.rtc import rtc, ParticipantKind
 from livekit.plugins import openai, deepgram, elevenlabs, silero, turn_detector
@@ -22,15 +24,37 @@ from livekit.plugins import openai, deepgram, elevenlabs, silero, turn_detector
 from memory.json_memory import JSONMemory
 
 # Import modular agents
-from agents.agent_selector import select_agent
-from agents.smart_assistant_agent import smart_assistant_agent
-from agents.passenger_details_agent import collect_passenger_details, extract_passenger_details
+from agents.agent_selector import select_agent, reset_memory as reset_selector_memory
+from agents.smart_assistant_agent import smart_assistant_agent_stream, reset_memory as reset_assistant_memory
+from agents.passenger_details_agent import collect_passenger_details, extract_passenger_details_async
 from agents.language_detection_agent import detect_language_from_text
-from agents.flight_selection_agent import flight_selection_agent
-from agents.flight_search_api_agent import flight_search_api_agent
-from agents.flight_search_agent import extract_flight_details
-from agents.flight_query_agent import flight_query_agent
-from agents.confirm_booking_agent import confirm_booking_agent
+from agents.flight_selection_agent import flight_selection_agent, prevalidation_summary
+from agents.flight_search_api_agent import flight_search_api_agent, search_scheduler, supplier_stats_summary
+from agents.flight_search_agent import extract_flight_details_async, prefetch_flight_search
+from agents.flight_query_agent import flight_query_agent_stream
+from agents.fare_calendar_agent import fare_calendar_agent
+from agents.confirm_booking_agent import confirm_booking_agent_stream
+from agents.booking_flow_agent import (
+    handle_deterministic_turn,
+    record_llm_routing,
+    get_flow_stats,
+    get_booking_stage,
+    STAGE_SEARCH_SLOTS,
+)
+from tools.turn_memo import begin_turn, end_turn
+from tools.logging_config import setup_logging, set_call_context
+from tools.deadline import budget_stats_summary
+from tools.circuit_breaker import breaker_snapshot
+from tools.llm_client import llm_routing_summary
+from tools.model_policy import policy_model
+from tools.speech_stream import first_audio, sentence_stream
+from tools.prompt_registry import prompt_summary
+from tools.llm_usage import llm_usage_summary
+from tools.tracing import span, record_span, start_turn_trace, end_turn_trace, current_turn_trace
+from tools.loop_watchdog import loop_watchdog
+from tools.worker_metrics import counter, gauge, histogram, flush_metrics, start_metrics_reporter, start_metrics_server
+from tools.call_profiler import start_call_profile, stop_call_profile, set_profile_label
+from tools.memory_guard import JOB_MEMORY_LIMIT_MB, JOB_MEMORY_WARN_MB, memory_guard
 
 load_dotenv()
 logger = logging.getLogger("inbound-flight-agent")
@@ -48,6 +72,22 @@ passenger_memory = JSONMemory(PASSENGER_DATA_FILE)
 selected_flight_memory = JSONMemory(SELECTED_FLIGHT_FILE)
 flight_list_memory = JSONMemory(FLIGHT_LIST_FILE)
 
+# ✅ The loop only holds weak references to tasks: fire-and-forget tasks are kept here until done
+_background_tasks = set()
+
+
+def _background_task_done(task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Background task failed: %s", task.exception())
+
+
+def _spawn_background(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_task_done)
+    return task
+
 WELCOME_MESSAGE = """
 Hello! Welcome to AKIJ AIR's booking assistant.  
 How can I assist you today?
@@ -64,51 +104,151 @@ Your goal is to help users book flights by collecting flight details, passenger
 - Respond warmly, clearly, and professionally.  
 """
 
+STREAM_FALLBACK_MESSAGE = "Sorry, I couldn't get that answer right now. Could you ask me again?"
+
+
+async def speak_streamed(tool: str, tokens, fallback: str = STREAM_FALLBACK_MESSAGE):
+    """
+    Speaks a streamed tool answer sentence by sentence, so TTS starts on the first sentence instead
+    of the whole paragraph. Returns None: the answer is already spoken (and added to the chat
+    context), so the voice LLM does not generate a follow-up for this tool call.
+    """
+    agent = AgentCallContext.get_current().agent
+    await agent.say(first_audio.track(tool, sentence_stream(tokens, fallback=fallback)), allow_interruptions=True)
+    return None
+
+
+ACTIVE_CALLS = gauge("active_calls", "Calls being handled by this worker process")
+CALLS = counter("calls_total", "Calls accepted by this worker process")
+TURN_FIRST_AUDIO = histogram("turn_first_audio_seconds", "End of the caller's speech until the agent starts speaking")
+TOOL_DURATION = histogram("tool_duration_seconds", "Duration of a tool call", ["tool"])
+TOOL_ERRORS = counter("tool_errors_total", "Tool calls that raised", ["tool"])
+
+
+@contextmanager
+def tool_call(tool: str):
+    """Traces a tool call as a span of the turn, starts its first-audio measurement and times it."""
+    first_audio.start(tool)
+    set_profile_label(tool)
+    started = time.monotonic()
+    try:
+        with span(f"tool.{tool}"):
+            yield
+    except BaseException:
+        TOOL_ERRORS.inc(tool=tool)
+        raise
+    finally:
+        TOOL_DURATION.observe(time.monotonic() - started, tool=tool)
+        set_profile_label(None)
+
+
+def _save_passenger_info(extracted):
+    """Saves extracted passenger fields for the first incomplete passenger and returns the reply."""
+    flight_details = flight_memory.load_data() or {}
+    existing = passenger_memory.load_data() or {"passengers": []}
+    passenger_index = next((i for i, p in enumerate(existing.get("passengers", [])) if not all(p.get(f) for f in p)), len(existing.get("passengers", [])))
+    return collect_passenger_details(passenger_index=passenger_index, flight_type=flight_details.get("flight_type", "domestic"), **extracted)
+
+
 class AssistantFnc(llm.FunctionContext):
     def __init__(self):
         super().__init__()
 
     @llm.ai_callable(description="Extract and save flight search details from user input")
     async def extract_flight_info(self, user_input: str):
-        logger.info(f"Extracting flight info: {user_input}")
-        return extract_flight_details(user_input, user_id="voice_user")
+        logger.info("Extracting flight info: %s", user_input)
+        with tool_call("extract_flight_info"):
+            return await extract_flight_details_async(user_input, user_id="voice_user")
+
+    @llm.ai_callable(description="Compare fares on the days around the requested travel date when the caller is flexible or the date has no seats")
+    async def search_flexible_dates(self, user_input: str):
+        logger.info("Searching flexible dates: %s", user_input)
+        with tool_call("search_flexible_dates"):
+            flight_details = flight_memory.load_data() or {}
+            return await asyncio.to_thread(fare_calendar_agent, flight_details)
 
     @llm.ai_callable(description="Select a flight from available options based on user input")
     async def select_flight(self, user_input: str):
-        logger.info(f"Selecting flight: {user_input}")
-        return flight_selection_agent(user_input)
+        logger.info("Selecting flight: %s", user_input)
+        with tool_call("select_flight"):
+            # ✅ Waits for the offer's validation and calls the LLM: off the event loop
+            return await asyncio.to_thread(flight_selection_agent, user_input)
 
     @llm.ai_callable(description="Collect passenger details from user input")
     async def collect_passenger_info(self, user_input: str):
-        logger.info(f"Collecting passenger info: {user_input}")
-        extracted = extract_passenger_details(user_input)
-        flight_details = flight_memory.load_data() or {}
-        num_adults = flight_details.get("num_adults", 1)
-        num_children = flight_details.get("num_children", 0)
-        existing = passenger_memory.load_data() or {"passengers": []}
-        passenger_index = next((i for i, p in enumerate(existing.get("passengers", [])) if not all(p.get(f) for f in p)), len(existing.get("passengers", [])))
-        return collect_passenger_details(passenger_index=passenger_index, flight_type=flight_details.get("flight_type", "domestic"), **extracted)
+        logger.info("Collecting passenger info: %s", user_input)
+        with tool_call("collect_passenger_info"):
+            extracted = await extract_passenger_details_async(user_input)
+            # ✅ File I/O and the summary LLM call run off the event loop
+            return await asyncio.to_thread(_save_passenger_info, extracted)
 
     @llm.ai_callable(description="Confirm the flight booking")
     async def confirm_booking(self, user_input: str):
-        logger.info(f"Confirming booking for input: {user_input}")
-        return confirm_booking_agent()
+        logger.info("Confirming booking for input: %s", user_input)
+        with tool_call("confirm_booking"):
+            return await speak_streamed("confirm_booking", confirm_booking_agent_stream())
 
     @llm.ai_callable(description="Answer general or fallback queries smartly")
     async def smart_assist(self, user_input: str):
-        return smart_assistant_agent(user_input, user_id="voice_user")
+        with tool_call("smart_assist"):
+            return await speak_streamed("smart_assist", smart_assistant_agent_stream(user_input, user_id="voice_user"))
 
     @llm.ai_callable(description="Detect the user's language from a given location text")
     async def detect_language(self, location_text: str):
-        return detect_language_from_text(location_text)
+        with tool_call("detect_language"):
+            return detect_language_from_text(location_text)
 
     @llm.ai_callable(description="Answer flight-related questions from user input")
     async def query_flights(self, user_input: str):
-        return flight_query_agent(user_input)
+        with tool_call("query_flights"):
+            return await speak_streamed("query_flights", flight_query_agent_stream(user_input))
 
     @llm.ai_callable(description="Use the unified agent selector logic for flexible input handling")
     async def use_selector(self, user_input: str):
-        return select_agent(user_input, user_id="voice_user")
+        with tool_call("use_selector"):
+            # ✅ Synchronous agents (and their step graphs) run off the event loop
+            return await asyncio.to_thread(select_agent, user_input, user_id="voice_user")
+
+async def route_deterministic_turn(agent: VoicePipelineAgent, chat_ctx: llm.ChatContext):
+    """
+    Answers deterministic funnel steps directly and only falls back to the LLM router
+    when the turn needs free-form understanding.
+    """
+    last_message = chat_ctx.messages[-1] if chat_ctx.messages else None
+    user_input = last_message.content if last_message and last_message.role == "user" else None
+    if user_input is not None:
+        begin_turn("voice")  # ✅ Tool and LLM results are memoized until the next utterance
+    with span("route.deterministic") as current:
+        response = await asyncio.to_thread(handle_deterministic_turn, user_input) if isinstance(user_input, str) else None
+        current.set(answered=response is not None)
+    if response is None:
+        record_llm_routing("voice_router")
+        # ✅ Search in the background while the LLM decides to call extract_flight_info; once results
+        # are listed the caller is mostly picking an offer, so the extraction would be wasted
+        if isinstance(user_input, str) and await asyncio.to_thread(get_booking_stage) == STAGE_SEARCH_SLOTS:
+            _spawn_background(asyncio.to_thread(prefetch_flight_search, user_input))
+        return None  # Default LLM stream
+
+    _spawn_background(agent.say(response, allow_interruptions=True))
+    return False  # Skip the LLM for this turn
+
+def trace_pipeline_metrics(agent_metrics: metrics.AgentMetrics):
+    """Turns the pipeline's STT/LLM/TTS metrics into spans of the current turn."""
+    if isinstance(agent_metrics, metrics.PipelineEOUMetrics):
+        # ✅ Both delays are measured from the end of the caller's speech
+        speech_end = agent_metrics.timestamp - agent_metrics.end_of_utterance_delay
+        record_span("stt.end_of_utterance", agent_metrics.end_of_utterance_delay, end=agent_metrics.timestamp)
+        record_span("stt.final_transcript", agent_metrics.transcription_delay, end=speech_end + agent_metrics.transcription_delay)
+    elif isinstance(agent_metrics, metrics.PipelineLLMMetrics):
+        start = agent_metrics.timestamp - agent_metrics.duration
+        record_span("llm.voice_router", agent_metrics.duration, end=agent_metrics.timestamp, ok=not agent_metrics.error,
+                    prompt_tokens=agent_metrics.prompt_tokens, completion_tokens=agent_metrics.completion_tokens)
+        record_span("llm.voice_router.first_token", agent_metrics.ttft, end=start + agent_metrics.ttft)
+    elif isinstance(agent_metrics, metrics.PipelineTTSMetrics):
+        start = agent_metrics.timestamp - agent_metrics.duration
+        record_span("tts.synthesis", agent_metrics.duration, end=agent_metrics.timestamp, ok=not agent_metrics.error,
+                    characters=agent_metrics.characters_count)
+        record_span("tts.first_byte", agent_metrics.ttfb, end=start + agent_metrics.ttfb)
 
 def prewarm(proc: JobProcess):
     proc.userdata["vad"] = silero.VAD.load()
@@ -119,10 +259,22 @@ async def entrypoint(ctx: JobContext):
         text=INSTRUCTIONS + "\nUse the provided functions to assist with flight booking tasks step-by-step."
     )
 
-    logger.info(f"Connecting to room {ctx.room.name}")
+    setup_logging()
+    # ✅ Measures event-loop lag for the whole call and names the code that blocks the loop
+    loop_watchdog.start()
+    start_metrics_reporter()
+    memory_guard.start()
+    logger.info("Connecting to room %s", ctx.room.name)
     await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
     participant = await ctx.wait_for_participant()
-    logger.info(f"Participant connected: {participant.identity}")
+    call_id = set_call_context(room=ctx.room.name, participant=participant.identity)
+    # ✅ The session memories are process-wide: start every caller with empty ones
+    reset_assistant_memory()
+    reset_selector_memory()
+    # ✅ PROFILING=on or room metadata {"profile": true}: flame graph input in data/logs/profile-<call_id>-*.folded
+    if start_call_profile(call_id, ctx.room.metadata):
+        ctx.add_shutdown_callback(lambda: asyncio.to_thread(stop_call_profile))
+    logger.info("Participant connected: %s", participant.identity)
 
     dg_model = "nova-2-general"
     if participant.kind == ParticipantKind.PARTICIPANT_KIND_SIP:
@@ -131,13 +283,14 @@ async def entrypoint(ctx: JobContext):
     agent = VoicePipelineAgent(
         vad=ctx.proc.userdata["vad"],
         stt=deepgram.STT(model=dg_model),
-        llm=openai.LLM(model="gpt-4o-mini"),
+        llm=openai.LLM(model=policy_model("voice_router")),
         tts=elevenlabs.TTS(),
         turn_detector=turn_detector.EOUModel(),
         min_endpointing_delay=0.5,
         max_endpointing_delay=20.0,
         chat_ctx=initial_ctx,
         fnc_ctx=AssistantFnc(),
+        before_llm_cb=route_deterministic_turn,
     )
 
     usage_collector = metrics.UsageCollector()
@@ -146,12 +299,52 @@ async def entrypoint(ctx: JobContext):
     def on_metrics_collected(agent_metrics: metrics.AgentMetrics):
         metrics.log_metrics(agent_metrics)
         usage_collector.collect(agent_metrics)
+        trace_pipeline_metrics(agent_metrics)
+
+    # ✅ One trace per caller turn: from the end of the caller's speech until the agent has answered
+    @agent.on("user_stopped_speaking")
+    def on_user_stopped_speaking():
+        start_turn_trace("voice")
+
+    @agent.on("agent_started_speaking")
+    def on_agent_started_speaking():
+        turn = current_turn_trace()
+        if turn is not None:
+            elapsed = time.time() - turn.start
+            turn.set(first_audio_ms=round(elapsed * 1000))
+            TURN_FIRST_AUDIO.observe(elapsed)
+
+    @agent.on("agent_stopped_speaking")
+    def on_agent_stopped_speaking():
+        end_turn_trace()
+
+    # ✅ Closes the first-audio measurement of the tool call being answered
+    agent.on("agent_started_speaking", first_audio.speech_started)
 
     async def log_usage():
+        ACTIVE_CALLS.dec()
+        end_turn()
+        end_turn_trace()
         summary = usage_collector.get_summary()
-        logger.info(f"Usage Summary: {summary}")
+        logger.info("Usage Summary: %s", summary)
+        logger.info("Side-channel LLM Usage Summary: %s", llm_usage_summary())
+        logger.info("Booking Flow Summary: %s", get_flow_stats())
+        logger.info("Speculative Search Summary: %s", search_scheduler.stats)
+        logger.info("Pre-validation Summary: %s", prevalidation_summary())
+        logger.info("Supplier Summary: %s", supplier_stats_summary())
+        logger.info("Latency Budget Summary: %s", budget_stats_summary())
+        logger.info("Circuit Breaker Summary: %s", breaker_snapshot())
+        logger.info("LLM Routing Summary: %s", llm_routing_summary())
+        logger.info("First Audio Summary: %s", first_audio.summary())
+        logger.info("Prompt Cache Summary: %s", prompt_summary())
+        logger.info("Event Loop Lag Summary: %s", loop_watchdog.summary())
+        logger.info("Memory Summary: %s", memory_guard.call_finished())
+        flush_metrics()  # ✅ Final counters of this call's process, before it exits
 
     ctx.add_shutdown_callback(log_usage)
+    CALLS.inc()
+    ACTIVE_CALLS.inc()
+    memory_guard.call_started(call_id)
 
     # Start the VoicePipelineAgent
     agent.start(ctx.room, participant)
@@ -194,7 +387,7 @@ async def entrypoint(ctx: JobContext):
     elif dtmf_input == "2":
         selected_language = "english"
 
-    logger.info(f"Selected language: {selected_language}")
+    logger.info("Selected language: %s", selected_language)
 
     if selected_language == "bangla":
         agent.chat_ctx.messages[0].text = "আপনি এখন বাংলা ভাষায় সহায়তা পাবেন। দয়া করে আপনার ফ্লাইট সংক্রান্ত তথ্য প্রদান করুন।"
@@ -203,10 +396,16 @@ async def entrypoint(ctx: JobContext):
         await agent.say("You have selected English. Let's get started!", allow_interruptions=True)
 
 if __name__ == "__main__":
+    # ✅ Each call runs in its own job process; this long-lived process serves their summed metrics
+    start_metrics_server()
+    memory_guard.start()  # ✅ Growth of the long-lived process: /debug/memory and `kill -USR2` diff its heap
     cli.run_app(
         WorkerOptions(
             entrypoint_fnc=entrypoint,
             prewarm_fnc=prewarm,
+            # ✅ Job processes are single-use; LiveKit warns about and kills a call's process above these
+            job_memory_warn_mb=JOB_MEMORY_WARN_MB,
+            job_memory_limit_mb=JOB_MEMORY_LIMIT_MB,
             agent_name="akij-inbound-flight-agent",
         )
     )
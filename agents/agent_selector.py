@@ -1,3 +1,4 @@
+import logging
 import re
 import os
 import requests
@@ -18,15 +19,21 @@ from agents.flight_query_agent import flight_query_agent
 from agents.confirm_booking_agent import confirm_booking_agent
 from agents.passenger_details_agent import collect_passenger_details, extract_passenger_details
 from agents.smart_assistant_agent import smart_assistant_agent
+from agents.booking_flow_agent import handle_deterministic_turn, record_llm_routing
+from tools.turn_memo import turn_scope
+from tools.llm_client import LLM_CALL_TIMEOUT
+from tools.model_policy import policy_model
 from dotenv import load_dotenv
 
+logger = logging.getLogger("agent-selector")
+
 
 # ✅ Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 # ✅ Initialize GPT-4o Model
-llm = ChatOpenAI(model="gpt-4o")
+llm = ChatOpenAI(model=policy_model("agent_selector"), timeout=LLM_CALL_TIMEOUT)
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Moves one level up
 DATA_DIR = os.path.join(BASE_DIR, "data")  # Set the data folder inside the project
@@ -34,7 +41,7 @@ DATA_DIR = os.path.join(BASE_DIR, "data")  # Set the data folder inside the proj
 # Ensure the 'data' folder exists
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# ✅ Memory for conversation history
+# ✅ Memory for conversation history (one caller per worker process: reset at the start of every call)
 memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
 passenger_memory = JSONMemory(os.path.join(DATA_DIR, "passenger_data.json"))
 flight_memory = JSONMemory(os.path.join(DATA_DIR, "flight_search_data.json"))
@@ -96,18 +103,30 @@ flight_search_agent = create_structured_chat_agent(llm=llm, tools=[tools[1]], pr
 passenger_details_agent = create_structured_chat_agent(llm=llm, tools=[tools[2]], prompt=prompt)
 
 def select_agent(user_input, user_id, file_upload=None):
-    from app import log_conversation
-
     """
     Dynamically selects the appropriate agent based on LLM intent classification.
     """
+    # ✅ Dedupe repeated tool/LLM work for the lifetime of this user turn
+    with turn_scope("select_agent"):
+        return _select_agent(user_input, user_id, file_upload)
+
+def _select_agent(user_input, user_id, file_upload=None):
+    from app import log_conversation
+
     # Step 1: Detect Intent
     if isinstance(user_input, bytes):  # Check if input is bytes (voice input)
         user_input = user_input.decode("utf-8")
 
+    # ✅ Deterministic funnel steps skip intent detection entirely
+    deterministic_response = handle_deterministic_turn(user_input)
+    if deterministic_response is not None:
+        log_conversation(user_id, user_input, deterministic_response)
+        return {"response": deterministic_response, "next_steps": []}
+
+    record_llm_routing("detect_intent")
     intent = detect_intent(user_input)
     # Debugging logs
-    print(f"🗣️ User Intent Detected: {intent}")
+    logger.info("🗣️ User Intent Detected: %s", intent)
 
     # Define default response & next steps
     response = "I'm not sure how to handle that."
@@ -183,7 +202,7 @@ def select_agent(user_input, user_id, file_upload=None):
         suggested_keywords = ["Upload passport/NID", "Enter Information Manually"]
 
     elif intent == "confirm_booking" or intent == "booking_confirmation":
-        print("Calling confirm_booking_agent...")
+        logger.debug("Calling confirm_booking_agent...")
         response = confirm_booking_agent()
         suggested_keywords = []
 
@@ -202,3 +221,8 @@ def select_agent(user_input, user_id, file_upload=None):
     log_conversation(user_id, user_input, response)
 
     return {"response": response, "next_steps": suggested_keywords}
+
+
+def reset_memory():
+    """Forgets the previous caller's conversation."""
+    memory.clear()
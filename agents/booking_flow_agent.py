@@ -0,0 +1,251 @@
+import logging
+import os
+import re
+from memory.json_memory import JSONMemory
+from agents.flight_selection_agent import select_flight_by_index
+from agents.passenger_details_agent import (
+    collect_passenger_details,
+    extract_passenger_details,
+    get_required_fields,
+    EMAIL_PATTERN,
+    PHONE_PATTERN,
+    PASSPORT_PATTERN,
+)
+from agents.confirm_booking_agent import confirm_booking_agent, on_booking_completed
+
+logger = logging.getLogger("booking-flow")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Moves one level up
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+FLIGHT_LIST_FILE = os.path.join(DATA_DIR, "flight_list.json")
+flight_list_memory = JSONMemory(FLIGHT_LIST_FILE)
+flight_memory = JSONMemory(os.path.join(DATA_DIR, "flight_search_data.json"))
+passenger_memory = JSONMemory(os.path.join(DATA_DIR, "passenger_data.json"))
+selected_flight_memory = JSONMemory(os.path.join(DATA_DIR, "selected_flight.json"))
+booking_status_memory = JSONMemory(os.path.join(DATA_DIR, "booking_status.json"))
+
+# ✅ Stages of the booking funnel, in order
+STAGE_SEARCH_SLOTS = "search_slots"
+STAGE_RESULTS = "results"
+STAGE_SELECTION = "selection"
+STAGE_PASSENGER_DETAILS = "passenger_details"
+STAGE_CONFIRM = "confirm"
+STAGE_PAYMENT = "payment"
+
+SEARCH_SLOTS = ["origin", "destination", "date_of_travel", "journey_type"]
+
+FIELD_LABELS = {
+    "title": "title (Mr. or Ms.)",
+    "gender": "gender",
+    "first_name": "first name",
+    "last_name": "last name",
+    "email": "email address",
+    "phone": "phone number",
+    "dob": "date of birth (YYYY-MM-DD)",
+    "passport_number": "passport number",
+    "nationality": "nationality",
+    "date_of_issue": "passport issue date (YYYY-MM-DD)",
+    "date_of_expiry": "passport expiry date (YYYY-MM-DD)",
+}
+
+ORDINALS = {
+    "first": 1, "1st": 1, "one": 1,
+    "second": 2, "2nd": 2, "two": 2,
+    "third": 3, "3rd": 3, "three": 3,
+    "fourth": 4, "4th": 4, "four": 4,
+    "fifth": 5, "5th": 5, "five": 5,
+}
+ORDINAL_PATTERN = re.compile(
+    r"\b(?:(first|second|third|fourth|fifth|1st|2nd|3rd|4th|5th)\s+(?:one|option|flight)"
+    r"|(?:option|flight|number)\s+(one|two|three|four|five|\d+))\b",
+    re.IGNORECASE,
+)
+CONFIRM_PATTERN = re.compile(r"\b(yes|yeah|yep|sure|confirm|go ahead|proceed|book it)\b", re.IGNORECASE)
+# ✅ Only a leading negation declines: "yes, no changes, confirm" and "confirm, I can't wait" confirm
+NEGATIVE_PATTERN = re.compile(
+    r"^\W*(?:(?:um+|uh+|well|oh|actually)\W+)?(?:no|nope|nah|not|wait|hold on|stop|cancel|change|(?:i\s+)?(?:don'?t|do not))\b",
+    re.IGNORECASE,
+)
+PAYMENT_PATTERN = re.compile(r"\b(pay|payment|link)\b", re.IGNORECASE)
+NAME_INTRO_PATTERN = re.compile(r"\b(my name is|name:|mr\.?|mrs\.?|ms\.?|dr\.?)\s+[a-z]+", re.IGNORECASE)
+DOB_PATTERN = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+
+# ✅ Per-call counters, used to measure LLM calls per completed booking
+flow_stats = {
+    "deterministic_turns": 0,
+    "llm_routed_turns": 0,
+    "completed_bookings": 0,
+}
+_completed_booking_ids = set()
+
+
+def _record_completed_booking(booking_tracking_id):
+    """Counts the move of a booking to the payment stage, once per booking."""
+    if booking_tracking_id not in _completed_booking_ids:
+        _completed_booking_ids.add(booking_tracking_id)
+        flow_stats["completed_bookings"] += 1
+
+
+on_booking_completed(_record_completed_booking)
+
+
+def _load_flight_list():
+    flight_data = flight_list_memory.load_data(shared=True)
+    return flight_data.get("data", []) if isinstance(flight_data, dict) else []
+
+
+def _next_missing_passenger(flight_details):
+    """Returns (passenger_index, missing_fields) for the first incomplete passenger, or None."""
+    total_passengers = flight_details.get("num_adults", 1) + flight_details.get("num_children", 0)
+    required_fields = get_required_fields(flight_details.get("flight_type", "domestic"))
+    passengers = (passenger_memory.load_data() or {}).get("passengers", [])
+
+    for index in range(total_passengers):
+        passenger = passengers[index] if index < len(passengers) else {}
+        missing_fields = [field for field in required_fields if not passenger.get(field)]
+        if missing_fields:
+            return index, missing_fields
+    return None
+
+
+def get_booking_stage():
+    """
+    Derives the current funnel stage from the persisted booking data.
+    """
+    flight_details = flight_memory.load_data() or {}
+    if not isinstance(flight_details, dict) or any(not flight_details.get(slot) for slot in SEARCH_SLOTS):
+        return STAGE_SEARCH_SLOTS
+
+    if not _load_flight_list():
+        return STAGE_RESULTS
+
+    selected_flight = selected_flight_memory.load_data() or {}
+    booking_tracking_id = selected_flight.get("booking_tracking_id")
+    if not booking_tracking_id:
+        return STAGE_SELECTION
+
+    booking_status = booking_status_memory.load_data() or {}
+    if booking_status.get("booking_tracking_id") == booking_tracking_id:
+        return STAGE_PAYMENT
+
+    if _next_missing_passenger(flight_details) is not None:
+        return STAGE_PASSENGER_DETAILS
+
+    return STAGE_CONFIRM
+
+
+def stage_prompt(stage):
+    """
+    Returns the deterministic prompt that moves the caller to the next step of `stage`.
+    """
+    if stage == STAGE_SELECTION:
+        return "Which flight would you like? You can say the first option, the second option, and so on."
+    if stage == STAGE_PASSENGER_DETAILS:
+        next_missing = _next_missing_passenger(flight_memory.load_data() or {})
+        if next_missing:
+            passenger_index, missing_fields = next_missing
+            labels = ", ".join(FIELD_LABELS.get(field, field) for field in missing_fields)
+            return f"Please tell me the {labels} for passenger {passenger_index + 1}."
+    if stage == STAGE_CONFIRM:
+        return "All passenger details are collected. Shall I confirm the booking? Please say yes to proceed."
+    if stage == STAGE_PAYMENT:
+        payment_link = (booking_status_memory.load_data() or {}).get("payment_link")
+        if payment_link:
+            return f"Your booking is reserved. You can complete the payment here: {payment_link}"
+    return None
+
+
+def _handle_selection(user_input):
+    match = ORDINAL_PATTERN.search(user_input)
+    if not match:
+        return None
+    word = (match.group(1) or match.group(2)).lower()
+    position = int(word) if word.isdigit() else ORDINALS.get(word)
+    if not position:
+        return None
+    return select_flight_by_index(position - 1)
+
+
+def _handle_passenger_details(user_input):
+    has_field = (
+        re.search(EMAIL_PATTERN, user_input)
+        or re.search(PHONE_PATTERN, user_input)
+        or re.search(PASSPORT_PATTERN, user_input)
+        or DOB_PATTERN.search(user_input)
+        or NAME_INTRO_PATTERN.search(user_input)
+    )
+    if not has_field:
+        return None
+
+    flight_details = flight_memory.load_data() or {}
+    passenger_index, _ = _next_missing_passenger(flight_details)
+    extracted = extract_passenger_details(user_input)
+    response = collect_passenger_details(
+        passenger_index=passenger_index,
+        flight_type=flight_details.get("flight_type", "domestic"),
+        **extracted,
+    )
+
+    # ✅ When this passenger is complete, lead straight into the next step
+    next_stage = get_booking_stage()
+    next_missing = _next_missing_passenger(flight_details) if next_stage == STAGE_PASSENGER_DETAILS else None
+    if next_missing is None or next_missing[0] != passenger_index:
+        next_prompt = stage_prompt(next_stage)
+        if next_prompt:
+            response = f"{response}\n{next_prompt}"
+    return response
+
+
+def _handle_confirm(user_input):
+    if not CONFIRM_PATTERN.search(user_input) or NEGATIVE_PATTERN.search(user_input):
+        return None
+    return confirm_booking_agent()
+
+
+def _handle_payment(user_input):
+    if not PAYMENT_PATTERN.search(user_input):
+        return None
+    return stage_prompt(STAGE_PAYMENT)
+
+
+STAGE_HANDLERS = {
+    STAGE_SELECTION: _handle_selection,
+    STAGE_PASSENGER_DETAILS: _handle_passenger_details,
+    STAGE_CONFIRM: _handle_confirm,
+    STAGE_PAYMENT: _handle_payment,
+}
+
+
+def handle_deterministic_turn(user_input):
+    """
+    Runs the next funnel step directly when it is fully determined by the current stage.
+    Returns the response text, or None when the turn needs LLM routing.
+    """
+    if not user_input:
+        return None
+
+    stage = get_booking_stage()
+    handler = STAGE_HANDLERS.get(stage)
+    response = handler(user_input) if handler else None
+    if response is None:
+        return None
+
+    flow_stats["deterministic_turns"] += 1
+    logger.info("Deterministic %s turn handled without LLM routing", stage)
+    return response
+
+
+def record_llm_routing(source):
+    """Counts a turn that had to be routed through an LLM (`voice_router` or `detect_intent`)."""
+    flow_stats["llm_routed_turns"] += 1
+    logger.debug("LLM routing used by %s", source)
+
+
+def get_flow_stats():
+    """Returns the funnel counters including routing LLM calls per completed booking."""
+    stats = dict(flow_stats)
+    stats["stage"] = get_booking_stage()
+    completed = stats["completed_bookings"]
+    stats["llm_calls_per_booking"] = round(stats["llm_routed_turns"] / completed, 2) if completed else None
+    return stats
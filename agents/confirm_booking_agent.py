@@ -1,9 +1,21 @@
+import asyncio
+import hashlib
 import json
+import logging
 import os
-import openai
+import threading
+import time
 import requests
 from memory.json_memory import JSONMemory
+from tools.async_steps import run_coroutine_sync, run_step_graph
+from tools.llm_client import chat_completion, stream_chat_completion
+from tools.prompt_registry import register_prompt
+from tools import deadline
+from tools.circuit_breaker import CircuitOpen
 from dotenv import load_dotenv
+
+logger = logging.getLogger("confirm-booking")
+
 load_dotenv()
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Moves one level up
 DATA_DIR = os.path.join(BASE_DIR, "data")  # Set the data folder inside the project
@@ -38,6 +50,24 @@ headers = {
     "secretecode": os.getenv("SECRET_CODE")
 }
 
+BOOKING_CALL_TIMEOUT = float(os.getenv("BOOKING_CALL_TIMEOUT", "15"))
+BOOKING_UNAVAILABLE_MESSAGE = "Our booking system is temporarily unavailable. Your details are saved, please say confirm again in a minute."
+STILL_BOOKING_MESSAGE = "Your booking is still being processed. Please say confirm again in a moment and I'll continue from where we left off."
+
+# ✅ Booking status is read by the booking flow to know the funnel reached payment
+booking_status_memory = JSONMemory(os.path.join(DATA_DIR, "booking_status.json"))
+_booking_completed_callbacks = []  # Called with the booking_tracking_id on the move to payment
+
+
+def on_booking_completed(callback):
+    """Registers `callback(booking_tracking_id)`, called each time a booking reaches the payment stage."""
+    _booking_completed_callbacks.append(callback)
+
+# ✅ Checkpoints of the confirmation workflow:
+# {"booking_tracking_id", "steps": {name: result}, "fingerprints": {name: hash}, "pending": {name: started}, "timings_ms"}
+booking_workflow_memory = JSONMemory(os.path.join(DATA_DIR, "booking_workflow.json"))
+_checkpoint_lock = threading.Lock()
+
 # if passenger_memory_info:
 #     first_passenger_data = passenger_memory_info.get("passengers", [])[0]
 #     name = first_passenger_data.get("first_name", "") + " "+first_passenger_data.get("last_name", "")
@@ -49,7 +79,15 @@ headers = {
 #     contact = "UNKNOWN"
 
 
-def confirm_booking_agent():
+class BookingStepError(Exception):
+    """A booking step failed; the message is what the caller hears."""
+
+
+class BookingOutcomeUnknown(BookingStepError):
+    """The create-booking request may have reached the supplier, but no answer came back."""
+
+
+def _load_booking_context():
     # ✅ Load Passenger Data
     passenger_memory = JSONMemory(os.path.join(DATA_DIR, "passenger_data.json"))
     passenger_memory_info = passenger_memory.load_data() or {}
@@ -70,20 +108,198 @@ def confirm_booking_agent():
         email = "UNKNOWN"
         contact = "UNKNOWN"
 
+    return {
+        "passenger_data": passenger_data,
+        "selected_flight_info": selected_flight_info,
+        "booking_tracking_id": booking_tracking_id,
+        "name": name,
+        "email": email,
+        "contact": contact,
+    }
+
+
+def _load_checkpoint(booking_tracking_id):
+    checkpoint = booking_workflow_memory.load_data() or {}
+    if checkpoint.get("booking_tracking_id") != booking_tracking_id:
+        return {"booking_tracking_id": booking_tracking_id, "steps": {}, "fingerprints": {}, "pending": {}, "timings_ms": {}}
+    checkpoint.setdefault("fingerprints", {})
+    checkpoint.setdefault("pending", {})
+    return checkpoint
+
+
+def _fingerprint(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
 
-    passenger_details_payload = get_passenger_details_payload(passenger_data, booking_tracking_id, selected_flight_info)
-    update_travelers_response = update_travelers(passenger_details_payload)
-    if update_travelers_response:
-        return update_travelers_response  # Return error message if traveler update fails
-    print("Step 2: Creating booking...")
-    booking_data = create_booking(passenger_details_payload, booking_tracking_id, email, contact)
-    if isinstance(booking_data, str):  # If an error message is returned
+def _set_pending(booking_tracking_id, name, pending):
+    with _checkpoint_lock:
+        checkpoint = _load_checkpoint(booking_tracking_id)
+        if pending:
+            checkpoint["pending"][name] = time.time()
+        else:
+            checkpoint["pending"].pop(name, None)
+        booking_workflow_memory.save_data(checkpoint)
+
+
+def _is_pending(booking_tracking_id, name):
+    with _checkpoint_lock:
+        return name in _load_checkpoint(booking_tracking_id)["pending"]
+
+
+def _checkpointed(name, booking_tracking_id, func, fingerprint=None):
+    """
+    Wraps a workflow step so its result is saved once it succeeds and reused on the next attempt.
+    With `fingerprint(results)`, the saved result is only reused while the step's input is unchanged
+    (e.g. the travelers are sent again after the caller corrected a passenger field).
+    """
+    def step(results):
+        key = fingerprint(results) if fingerprint else None
+        with _checkpoint_lock:
+            checkpoint = _load_checkpoint(booking_tracking_id)
+        if name in checkpoint["steps"] and checkpoint["fingerprints"].get(name) == key:
+            logger.info("⏩ Booking step '%s' already done, reusing its result", name)
+            return checkpoint["steps"][name]
+
+        started = time.perf_counter()
+        result = func(results)
+        duration_ms = round((time.perf_counter() - started) * 1000)
+
+        with _checkpoint_lock:
+            checkpoint = _load_checkpoint(booking_tracking_id)
+            checkpoint["steps"][name] = result
+            checkpoint["fingerprints"][name] = key
+            checkpoint["pending"].pop(name, None)
+            checkpoint["timings_ms"][name] = duration_ms
+            booking_workflow_memory.save_data(checkpoint)
+        return result
+    return step
+
+
+def booking_workflow_steps(context):
+    """
+    Step graph of the booking confirmation. Booking details and the payment request both only
+    need the created booking, so they run at the same time.
+    """
+    booking_tracking_id = context["booking_tracking_id"]
+
+    def build_payload(results):
+        return get_booking_payload(context["passenger_data"], booking_tracking_id, context["selected_flight_info"])
+
+    def update(results):
+        error = update_travelers(results["payload"])
+        if error:
+            raise BookingStepError(error)  # Return error message if traveler update fails
+        return "success"
+
+    def create(results):
+        # ✅ A previous attempt got no answer: the supplier may have the booking already, never create it twice
+        if _is_pending(booking_tracking_id, "create_booking"):
+            existing = lookup_booking(booking_tracking_id)
+            if existing is not None:
+                logger.info("✅ Booking %s was created by the previous attempt", booking_tracking_id)
+                return existing
+        _set_pending(booking_tracking_id, "create_booking", True)
+        try:
+            booking_data = create_booking(results["payload"], booking_tracking_id, context["email"], context["contact"])
+        except (deadline.BudgetExhausted, CircuitOpen):
+            _set_pending(booking_tracking_id, "create_booking", False)  # Refused before sending
+            raise
+        if isinstance(booking_data, str):  # If an error message is returned: nothing was created
+            _set_pending(booking_tracking_id, "create_booking", False)
+            raise BookingStepError(booking_data)
         return booking_data
-    print("Step 3: Fetching booking details...")
-    booking_details = fetch_booking_details(booking_tracking_id)
 
-    response = initiate_payment_request(passenger_details_payload, booking_details, booking_tracking_id, name, email, contact)
-    return response
+    def details(results):
+        logger.info("Step 3: Fetching booking details...")
+        booking_details = fetch_booking_details(booking_tracking_id)
+        if isinstance(booking_details, str):
+            raise BookingStepError(booking_details)
+        return booking_details
+
+    def payment(results):
+        return initiate_payment_request(booking_tracking_id, context["name"], context["email"], context["contact"])
+
+    # ✅ The payload is rebuilt from the current passenger data on every attempt, never checkpointed
+    return {
+        "payload": (build_payload, []),
+        "update_travelers": (
+            _checkpointed("update_travelers", booking_tracking_id, update, fingerprint=lambda results: _fingerprint(results["payload"])),
+            ["payload"],
+        ),
+        "create_booking": (_checkpointed("create_booking", booking_tracking_id, create), ["update_travelers"]),
+        "booking_details": (_checkpointed("booking_details", booking_tracking_id, details), ["create_booking"]),
+        "payment_link": (_checkpointed("payment_link", booking_tracking_id, payment), ["create_booking"]),
+    }
+
+
+async def _run_booking_workflow():
+    """
+    Runs the booking confirmation workflow. Every finished step is checkpointed per
+    booking_tracking_id, so saying "confirm" again after a failure resumes from the failed step.
+
+    Returns (results, None) on success, or (None, message for the caller).
+    """
+    context = await asyncio.to_thread(_load_booking_context)
+    booking_tracking_id = context["booking_tracking_id"]
+
+    try:
+        results = await run_step_graph(booking_workflow_steps(context))
+    except BookingOutcomeUnknown:
+        return None, STILL_BOOKING_MESSAGE
+    except BookingStepError as e:
+        return None, str(e)
+    except deadline.BudgetExhausted:
+        # ✅ Finished steps are checkpointed, the next "confirm" resumes from here
+        return None, STILL_BOOKING_MESSAGE
+    except CircuitOpen as e:
+        logger.warning("❌ Booking workflow stopped: %s", e)
+        return None, BOOKING_UNAVAILABLE_MESSAGE
+    except Exception as e:
+        logger.error("❌ Booking workflow error: %s", e)
+        return None, "An error occurred while confirming the booking. Please say confirm to try again."
+    finally:
+        await asyncio.to_thread(_log_step_timings, booking_tracking_id)
+
+    await asyncio.to_thread(booking_status_memory.save_data, {
+        "booking_tracking_id": booking_tracking_id,
+        "status": "payment_pending",
+        "payment_link": results["payment_link"],
+    })
+    for callback in _booking_completed_callbacks:
+        callback(booking_tracking_id)
+    return results, None
+
+
+def confirm_booking_agent():
+    """Confirms the booking and returns the confirmation message (or why it could not be confirmed)."""
+    results, message = run_coroutine_sync(_run_booking_workflow())
+    if results is None:
+        return message
+
+    ## Step 5: Generate Confirmation Message via OpenAI
+    return generate_booking_confirmation_message(results["payload"], results["booking_details"], results["payment_link"])
+
+
+async def confirm_booking_agent_stream():
+    """
+    Streaming variant of confirm_booking_agent for the voice pipeline: the booking steps run in
+    worker threads awaited from the loop, then the confirmation message is yielded token by token.
+    """
+    results, message = await _run_booking_workflow()
+    if results is None:
+        yield message
+        return
+
+    async for token in generate_booking_confirmation_message_stream(results["payload"], results["booking_details"], results["payment_link"]):
+        yield token
+
+
+def _log_step_timings(booking_tracking_id):
+    timings = _load_checkpoint(booking_tracking_id)["timings_ms"]
+    if timings:
+        slowest = max(timings, key=timings.get)
+        logger.info("⏱️ Booking workflow step timings (ms): %s, slowest: %s", timings, slowest)
+
 
 def calculate_pax_type(dob):
     """Determine passenger type based on date of birth."""
@@ -103,79 +319,138 @@ def calculate_pax_type(dob):
     except ValueError:
         return "ADT"  # Default to adult if DOB is invalid
 
-def get_passenger_details_payload(passenger_data, booking_tracking_id, selected_flight_info):
-    """
-    Generates a structured payload for booking confirmation,
-    including flight and passenger details.
-    """
-    # ✅ Default document details
-    default_data = {
-        "doc_country": "BD",
-        "doc_no": "A1235121",
-        "doc_dateofexpiry": "2030-04-25",
-        "doc_dateofissue": "",
-        "passport_copy": "https://itt-documents-copy.s3.amazonaws.com/passport-copy/default-passport.jpeg"
+# ✅ Document issuing country; document fields not collected (domestic flights) are sent empty,
+# never as placeholder passport data
+DEFAULT_DOC_COUNTRY = "BD"
+
+# ✅ Passenger field -> update-travellers payload field
+PAYLOAD_FIELD_MAP = {
+    "title": "title",
+    "gender": "gender",
+    "first_name": "first_name",
+    "last_name": "last_name",
+    "email": "email",
+    "phone": "contact_number",
+    "dob": "dob",
+    "passport_number": "doc_no",
+    "date_of_expiry": "doc_dateofexpiry",
+    "date_of_issue": "doc_dateofissue",
+    "passport_copy": "passport_copy",
+}
+
+# ✅ Update-travellers passenger entries, maintained while passenger details are collected
+booking_payload_memory = JSONMemory(os.path.join(DATA_DIR, "booking_payload.json"))
+
+
+def _collected(passenger, field, default):
+    """Value of a collected passenger field; fields saved as None or "" count as not collected."""
+    value = passenger.get(field)
+    return default if value in (None, "") else value
+
+
+def build_passenger_entry(pax_id, passenger):
+    """Builds one passenger entry of the update-travellers payload."""
+    dob = _collected(passenger, "dob", "1990-01-01")
+    return {
+        "pax_id": pax_id,  # ✅ pax_id starts from 1 and increments
+        "pax_type": calculate_pax_type(dob),
+        "title": _collected(passenger, "title", "N/A"),
+        "gender": _collected(passenger, "gender", "N/A"),
+        "first_name": _collected(passenger, "first_name", "N/A"),
+        "last_name": _collected(passenger, "last_name", "N/A"),
+        "email": _collected(passenger, "email", "N/A"),
+        "contact_number": _collected(passenger, "phone", "N/A"),
+        "dob": dob,
+        "doc_country": DEFAULT_DOC_COUNTRY,
+        # ✅ Document details only as collected from the caller
+        "doc_no": _collected(passenger, "passport_number", ""),
+        "doc_dateofexpiry": _collected(passenger, "date_of_expiry", ""),
+        "doc_dateofissue": _collected(passenger, "date_of_issue", ""),
+        "passport_copy": _collected(passenger, "passport_copy", ""),
     }
-    passenger_details_payload = []
-    # ✅ Assign pax_id starting from 1
-    for index, passenger in enumerate(passenger_data, start=1):
-        pax_type = calculate_pax_type(passenger.get("dob", "1990-01-01"))
-
-        # ✅ Extract document details if available
-        doc_no = passenger.get("passport_number", default_data["doc_no"])
-        doc_dateofexpiry = passenger.get("date_of_expiry", default_data["doc_dateofexpiry"])
-        doc_dateofissue = passenger.get("date_of_issue", default_data["doc_dateofissue"])
-        passport_copy = passenger.get("passport_copy", default_data["passport_copy"])
-
-        # ✅ Build passenger structure
-        complete_passenger_data = {
-            "pax_id": index,  # ✅ pax_id now starts from 1 and increments
-            "pax_type": pax_type,
-            "title": passenger.get("title", "N/A"),
-            "gender": passenger.get("gender", "N/A"),
-            "first_name": passenger.get("first_name", "N/A"),
-            "last_name": passenger.get("last_name", "N/A"),
-            "email": passenger.get("email", "N/A"),
-            "contact_number": passenger.get("phone", "N/A"),
-            "dob": passenger.get("dob", "1990-01-01"),
-            "doc_country": default_data["doc_country"],
-            "doc_no": doc_no,
-            "doc_dateofexpiry": doc_dateofexpiry,
-            "doc_dateofissue": doc_dateofissue,
-            "passport_copy": passport_copy
-        }
-
-        passenger_details_payload.append(complete_passenger_data)
 
-    # ✅ Build Final Booking Payload
-    final_payload = {
+
+def _final_payload(passenger_details_payload, booking_tracking_id, selected_flight_info):
+    return {
         "booking_tracking_id": booking_tracking_id,
         "member_id": "2",
         "save_pax": "yes",
         "flight_details": selected_flight_info,  # ✅ FIXED: Use Dictionary Instead of JSONMemory Object
         "passenger": passenger_details_payload
     }
-    return final_payload
+
+
+def get_passenger_details_payload(passenger_data, booking_tracking_id, selected_flight_info):
+    """
+    Generates a structured payload for booking confirmation,
+    including flight and passenger details.
+    """
+    passenger_details_payload = [
+        build_passenger_entry(index, passenger) for index, passenger in enumerate(passenger_data, start=1)
+    ]
+
+    # ✅ Build Final Booking Payload
+    return _final_payload(passenger_details_payload, booking_tracking_id, selected_flight_info)
+
+
+def update_booking_payload(passenger_index, total_passengers, fields):
+    """
+    Applies newly collected (already validated) passenger fields to the prebuilt
+    update-travellers entries, so the payload is ready when the caller confirms.
+    """
+    passengers = (booking_payload_memory.load_data() or {}).get("passenger", [])
+    passengers = passengers[:total_passengers] + [
+        build_passenger_entry(pax_id, {}) for pax_id in range(len(passengers) + 1, total_passengers + 1)
+    ]
+
+    # ✅ Same rules as build_passenger_entry, so both paths produce the same entry
+    entry = passengers[passenger_index]
+    for field, value in fields.items():
+        if field not in PAYLOAD_FIELD_MAP or value in (None, ""):
+            continue
+        entry[PAYLOAD_FIELD_MAP[field]] = value
+        if field == "dob":
+            entry["pax_type"] = calculate_pax_type(value)
+
+    booking_payload_memory.save_data({"passenger": passengers})
+
+
+def reset_booking_payload():
+    booking_payload_memory.save_data({})
+
+
+def get_booking_payload(passenger_data, booking_tracking_id, selected_flight_info):
+    """
+    Returns the payload maintained while the passenger details were collected; it is only
+    built from passenger_data when there is none (e.g. details saved by an older version).
+    """
+    passengers = (booking_payload_memory.load_data() or {}).get("passenger", [])
+    if passengers:
+        return _final_payload(passengers, booking_tracking_id, selected_flight_info)
+    logger.info("No prebuilt booking payload, building it from the passenger details")
+    return get_passenger_details_payload(passenger_data, booking_tracking_id, selected_flight_info)
 
 def update_travelers(passenger_details_payload):
-    print("Step 1: Updating traveler information...")
+    logger.info("Step 1: Updating traveler information...")
     url = "https://serviceapi.innotraveltech.com/flight/update-travellers"
     try:
-        response = requests.post(url, headers=headers, json=passenger_details_payload)
-        print(f"Update Travelers API Response: {response.status_code}, {response.text}")
+        response = deadline.post(url, "booking_update_travelers", cap=BOOKING_CALL_TIMEOUT, headers=headers, json=passenger_details_payload)
+        logger.debug("Update Travelers API Response: %s, %s", response.status_code, response.content)
         response.raise_for_status()
         data = response.json()
         if data.get("status") != "success":
             return data.get("reason", "An unknown error occurred while updating travelers.")
 
-        print("Traveler information updated successfully.")
+        logger.info("Traveler information updated successfully.")
         return None
+    except (deadline.BudgetExhausted, CircuitOpen):
+        raise
     except Exception as e:
-        print(f"Error during traveler update: {e}")
+        logger.error("Error during traveler update: %s", e)
         return "An error occurred while updating travelers. Please try again."
 
 def create_booking(passenger_details_payload, booking_tracking_id, email, contact):
-    print("Step 2: Creating booking...")
+    logger.info("Step 2: Creating booking...")
     create_booking_url = "https://serviceapi.innotraveltech.com/flight/create-booking"
     payload = {
         "booking_tracking_id": booking_tracking_id,
@@ -189,49 +464,75 @@ def create_booking(passenger_details_payload, booking_tracking_id, email, contac
     }
 
     try:
-        response = requests.post(create_booking_url, headers=headers, json=payload)
+        response = deadline.post(create_booking_url, "booking_create", cap=BOOKING_CALL_TIMEOUT, headers=headers, json=payload)
         response.raise_for_status()
         booking_data = response.json()
         if booking_data.get("status") != "success":
             return booking_data.get("reason", "An unknown error occurred while creating booking.")
 
-        print("Booking created successfully.")
+        logger.info("Booking created successfully.")
         return booking_data
-    except requests.exceptions.RequestException as e:
-        print(f"Create Booking API Error: {e}")
+    except requests.exceptions.ConnectTimeout as e:
+        logger.error("Create Booking API Error: %s", e)  # Never connected, so nothing was created
         return "An error occurred while creating booking. Please try again."
-
-def fetch_booking_details(booking_tracking_id):
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code < 500:
+            logger.error("Create Booking API Error: %s", e)
+            return "An error occurred while creating booking. Please try again."
+        logger.warning("⚠️ Create booking outcome unknown for %s: %s", booking_tracking_id, e)
+        raise BookingOutcomeUnknown(STILL_BOOKING_MESSAGE) from e
+    except (requests.exceptions.RequestException, ValueError) as e:
+        # ✅ Read timeout, dropped connection, unreadable answer: the supplier may have booked it
+        logger.warning("⚠️ Create booking outcome unknown for %s: %s", booking_tracking_id, e)
+        raise BookingOutcomeUnknown(STILL_BOOKING_MESSAGE) from e
+
+def lookup_booking(booking_tracking_id):
     """
-    Step 3: Fetch booking details.
+    Asks the supplier whether a booking exists for `booking_tracking_id` before creating it again.
+    Returns its booking details, None if there is none, and raises BookingOutcomeUnknown when the
+    supplier cannot tell (the booking must then not be created again yet).
     """
-    # booking_id = booking_data.get("booking_id", "")
-    booking_details = {}
-    print(booking_tracking_id)
-    booking_details_url = "https://serviceapi.innotraveltech.com/flight/booking-details"
+    try:
+        booking_details = _request_booking_details(booking_tracking_id)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.warning("⚠️ Booking status lookup failed for %s: %s", booking_tracking_id, e)
+        raise BookingOutcomeUnknown(STILL_BOOKING_MESSAGE) from e
+    return booking_details if booking_details.get("status") == "success" else None
+
+def _request_booking_details(booking_tracking_id):
     payload = {
         "tracking_id": booking_tracking_id,
         "booking_id": "",
         "member_id": "1"
     }
+    booking_details_url = "https://serviceapi.innotraveltech.com/flight/booking-details"
+    response = deadline.post(booking_details_url, "booking_details", cap=BOOKING_CALL_TIMEOUT, headers=headers, json=payload)
+    response.raise_for_status()
+    return response.json()
+
+def fetch_booking_details(booking_tracking_id):
+    """
+    Step 3: Fetch booking details.
+    """
+    # booking_id = booking_data.get("booking_id", "")
+    logger.debug("Booking tracking ID: %s", booking_tracking_id)
 
     try:
-        response = requests.post(booking_details_url, headers=headers, json=payload)
-        response.raise_for_status()
-        booking_details = response.json()
-        if response.status_code != 200:
-            raise Exception("Failed to fetch booking details.")
+        booking_details = _request_booking_details(booking_tracking_id)
         if booking_details.get("status") != "success":
             return booking_details.get("reason", "Failed to fetch booking details.")
 
-        print("Booking details fetched successfully.")
+        logger.info("Booking details fetched successfully.")
         return booking_details
     except requests.exceptions.RequestException as e:
-        print(f"Fetch Booking Details API Error: {e}")
+        logger.error("Fetch Booking Details API Error: %s", e)
         return "An error occurred while fetching booking details."
 
-def initiate_payment_request(passenger_details_payload, booking_details, booking_tracking_id, name, email, contact):
-    print("Step 4: Initiating payment request...")
+def initiate_payment_request(booking_tracking_id, name, email, contact):
+    """
+    Step 4: Requests the payment link for the booking.
+    """
+    logger.info("Step 4: Initiating payment request...")
     payment_request_url = "https://checkout.innotraveltech.com/request"
     payload = {
         "ftm_partner_id": "1",
@@ -251,39 +552,25 @@ def initiate_payment_request(passenger_details_payload, booking_details, booking
         "booking_data": {}
     }
 
-    print(f"Payment Request Payload: {payload}")
+    logger.debug("Payment Request Payload: %s", payload)
 
     try:
-        response = requests.post(payment_request_url, headers=headers, json=payload)
-        print(f"Payment Request Response: {response.status_code}, {response.text}")
+        response = deadline.post(payment_request_url, "payment_request", cap=BOOKING_CALL_TIMEOUT, headers=headers, json=payload)
+        logger.debug("Payment Request Response: %s, %s", response.status_code, response.content)
         response.raise_for_status()
 
         payment_data = response.json()
         if payment_data.get("status") != "success":
             raise Exception(f"Payment request failed: {payment_data.get('message', 'Unknown error')}")
 
-        payment_link = payment_data.get("payment_link")
-        ## Step 5: Generate Confirmation Message via OpenAI
-        extracted_info = generate_booking_confirmation_message(passenger_details_payload, booking_details, payment_link)
-        return extracted_info
+        return payment_data.get("payment_link")
     except requests.exceptions.RequestException as e:
         raise Exception(f"Payment Request API Error: {e}")
 
-def generate_booking_confirmation_message(passenger_details_payload, booking_details, payment_link):
-    """
-    Generates a professional flight booking confirmation message using OpenAI API.
-
-    Parameters:
-        passenger_details_payload (dict): Passenger details in JSON format.
-        booking_details (dict): Flight booking details.
-        payment_link (str): Link to complete the payment.
-
-    Returns:
-        str: A structured, friendly, and clear booking confirmation message.
-    """
-    client = openai.OpenAI(api_key=OPENAI_API_KEY)
-    # ✅ System message for context
-    system_message = """
+# ✅ Static instructions first; only the booking data is sent per call
+CONFIRMATION_PROMPT = register_prompt(
+    "booking_confirmation_message",
+    system="""
     You are a professional and friendly flight booking assistant. A flight reservation has been successfully completed,
     and you have received the booking details in JSON format.
 
@@ -297,11 +584,8 @@ def generate_booking_confirmation_message(passenger_details_payload, booking_det
     - A polite invitation to contact support if needed.
 
     Ensure the message is concise, professional, and easy to read. Avoid unnecessary complexity.
-    """
 
-    # ✅ User Prompt with Booking Details
-    user_prompt = f"""
-    Generate a professional, clear, and engaging **flight booking confirmation message** using the following data:
+    Generate a professional, clear, and engaging **flight booking confirmation message** using the data you receive:
 
     📌 **Passenger Information**
     Each passenger includes the following details:
@@ -312,11 +596,6 @@ def generate_booking_confirmation_message(passenger_details_payload, booking_det
     - **Contact Number**
     - **Date of Birth**
 
-    👤 **Passenger Data:**
-    ```json
-    {passenger_details_payload}
-    ```
-
     📋 **Booking Details**
     - **📌 Booking Reference**
     - **✈️ Flight Number**
@@ -325,14 +604,6 @@ def generate_booking_confirmation_message(passenger_details_payload, booking_det
     - **🌍 Departure City**
     - **🌍 Arrival City**
 
-    📜 **Booking Information:**
-    ```json
-    {booking_details}
-    ```
-
-    💳 **Payment Information**
-    👉 [Complete Your Payment Here]({payment_link})
-
     📢 **Instructions for the Confirmation Message:**
     - Clearly list **all passenger details** (Title, Gender, Full Name, Email, Contact Number, and Date of Birth).
     - Highlight **Booking Reference, Flight Details, and Payment Link** prominently.
@@ -346,27 +617,75 @@ def generate_booking_confirmation_message(passenger_details_payload, booking_det
 
     **Best regards,**
     ✈️ **AKIJ AIR** 🛫
+    """,
+    user="""
+    👤 **Passenger Data:**
+    ```json
+    {passenger_details_payload}
+    ```
+
+    📜 **Booking Information:**
+    ```json
+    {booking_details}
+    ```
+
+    💳 **Payment Information**
+    👉 [Complete Your Payment Here]({payment_link})
+    """,
+)
+
+
+def _confirmation_messages(passenger_details_payload, booking_details, payment_link):
+    """Builds the LLM messages for the booking confirmation message."""
+    return CONFIRMATION_PROMPT.messages(
+        passenger_details_payload=passenger_details_payload,
+        booking_details=booking_details,
+        payment_link=payment_link,
+    )
+
+
+def generate_booking_confirmation_message(passenger_details_payload, booking_details, payment_link):
     """
+    Generates a professional flight booking confirmation message using OpenAI API.
+
+    Parameters:
+        passenger_details_payload (dict): Passenger details in JSON format.
+        booking_details (dict): Flight booking details.
+        payment_link (str): Link to complete the payment.
 
+    Returns:
+        str: A structured, friendly, and clear booking confirmation message.
+    """
     # ✅ Generate response using OpenAI's latest API format
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_prompt}
-            ]
+        confirmation_message = chat_completion(
+            _confirmation_messages(passenger_details_payload, booking_details, payment_link),
+            call_site="booking_confirmation_message",
         )
-
-        # ✅ Extract response content
-        confirmation_message = response.choices[0].message.content.strip()
-        print("✅ Booking Confirmation Generated!")
-        print(confirmation_message)
+        logger.info("✅ Booking Confirmation Generated!")
+        logger.debug("Confirmation message: %s", confirmation_message)
         return confirmation_message
 
     except Exception as e:
-        print(f"❌ OpenAI API Error: {e}")
-        return "An error occurred while generating the confirmation message. Please try again."
+        # ✅ The booking itself succeeded, so fall back to a plain confirmation with the payment link
+        logger.error("❌ OpenAI API Error: %s", e)
+        return f"Your booking is reserved. You can complete the payment here: {payment_link}"
+
+
+async def generate_booking_confirmation_message_stream(passenger_details_payload, booking_details, payment_link):
+    """Streaming variant of generate_booking_confirmation_message: yields the message token by token."""
+    messages = _confirmation_messages(passenger_details_payload, booking_details, payment_link)
+    started = False
+    try:
+        async for token in stream_chat_completion(messages, call_site="booking_confirmation_message"):
+            started = True
+            yield token
+    except Exception as e:
+        logger.error("❌ OpenAI API Error: %s", e)
+        if not started:
+            # ✅ The booking itself succeeded, so fall back to a plain confirmation with the payment link
+            yield f"Your booking is reserved. You can complete the payment here: {payment_link}"
+
 
 # def generate_booking_confirmation_message(passenger_details_payload, booking_details, payment_link):
 #     """
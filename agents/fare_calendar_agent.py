@@ -0,0 +1,152 @@
+import logging
+import os
+import re
+from concurrent.futures import wait
+from datetime import datetime, timedelta
+from agents.flight_search_api_agent import (
+    SUPPLIERS,
+    search_flights,
+    search_key,
+    merge_search_responses,
+    flight_list_memory,
+    format_flight_results,
+)
+from agents.flight_selection_agent import offer_price, drop_failed_offers
+from tools.rate_limiter import RateLimiter
+from tools.speculative_search import SpeculativeSearchScheduler
+from tools import deadline
+
+# ✅ Fare calendar: searches ±FARE_CALENDAR_DAYS around the requested date
+FARE_CALENDAR_DAYS = int(os.getenv("FARE_CALENDAR_DAYS", "3"))
+FARE_CALENDAR_RATE = float(os.getenv("FARE_CALENDAR_RATE", "2"))  # Searches started per second
+FARE_CALENDAR_DEADLINE = float(os.getenv("FARE_CALENDAR_DEADLINE", "20"))
+FARE_CALENDAR_BEST_OFFERS = int(os.getenv("FARE_CALENDAR_BEST_OFFERS", "5"))
+FARE_CALENDAR_MAX_UNITS = int(os.getenv("FARE_CALENDAR_MAX_UNITS", "12"))  # Supplier requests per calendar (dates × suppliers)
+
+# ✅ "around" / "or so" only count next to a date, so "around 5pm" is not a flexible date
+_MONTH = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+_DAY = r"\d{1,2}(?:st|nd|rd|th)?"
+_DATE = (
+    rf"(?:{_DAY}(?:\s+of)?\s+{_MONTH}|{_MONTH}\s+{_DAY}|the\s+\d{{1,2}}(?:st|nd|rd|th)|\d{{4}}-\d{{2}}-\d{{2}}"
+    r"|(?:that|the) (?:date|day|week|weekend)|(?:this|next) (?:week|weekend|month)|(?:mon|tues|wednes|thurs|fri|satur|sun)day)"
+)
+FLEXIBLE_DATE_PATTERN = re.compile(
+    rf"\b(?:flexible|give or take (?:a|one|two|a few|a couple of) days?|plus or minus \d+ days?|nearby dates|any day"
+    rf"|a (?:few|couple of) days (?:either way|before or after)|around {_DATE}|{_DATE} or so)\b",
+    re.IGNORECASE,
+)
+
+logger = logging.getLogger("fare-calendar")
+
+_calendar_rate_limiter = RateLimiter(FARE_CALENDAR_RATE)
+
+
+def _calendar_probe(flight_details):
+    # ✅ Rate limited here, in the scheduler's worker, so cached and in-flight dates do not wait for a slot
+    _calendar_rate_limiter.acquire()
+    # ✅ A probe only needs the day's lowest fare: main airports only, no pre-validation of its offers
+    return search_flights(flight_details, multi_airport=False)
+
+
+# ✅ Probes are cached and single-flight per date, apart from the full searches of the booking flow
+calendar_scheduler = SpeculativeSearchScheduler(_calendar_probe, search_key)
+
+
+def is_flexible_date_request(user_input: str):
+    return bool(user_input and FLEXIBLE_DATE_PATTERN.search(user_input))
+
+
+def calendar_dates(date_of_travel, days=FARE_CALENDAR_DAYS):
+    """Dates of the window, nearest to the requested date first; past dates are skipped."""
+    requested = datetime.strptime(date_of_travel, "%Y-%m-%d").date()
+    today = datetime.now().date()
+    offsets = sorted(range(-days, days + 1), key=abs)
+    return [requested + timedelta(days=offset) for offset in offsets if requested + timedelta(days=offset) >= today]
+
+
+def _shifted_details(flight_details, travel_date):
+    details = dict(flight_details)
+    offset = travel_date - datetime.strptime(flight_details["date_of_travel"], "%Y-%m-%d").date()
+    details["date_of_travel"] = travel_date.strftime("%Y-%m-%d")
+    if details.get("return_date"):
+        # ✅ Keep the trip length when the outbound date moves
+        return_date = datetime.strptime(details["return_date"], "%Y-%m-%d").date() + offset
+        details["return_date"] = return_date.strftime("%Y-%m-%d")
+    return details
+
+
+def fare_calendar_search(flight_details, days=FARE_CALENDAR_DAYS):
+    """
+    Searches the dates of the ±`days` window concurrently (rate limited, cached and single-flight),
+    the nearest ones first and at most FARE_CALENDAR_MAX_UNITS supplier requests in total.
+    Returns ({date: lowest price or None}, {date: response}).
+    """
+    dates = calendar_dates(flight_details["date_of_travel"], days)
+    max_dates = max(1, FARE_CALENDAR_MAX_UNITS // max(len(SUPPLIERS), 1))
+    if len(dates) > max_dates:
+        logger.info("Fare calendar limited to %s of %s dates (%s suppliers)", max_dates, len(dates), len(SUPPLIERS))
+        dates = dates[:max_dates]
+
+    futures = {}
+    for travel_date in dates:
+        future = calendar_scheduler.schedule(_shifted_details(flight_details, travel_date), replace=False)
+        if future is not None:
+            futures[future] = travel_date.strftime("%Y-%m-%d")
+
+    # ✅ Dates still running when the turn budget runs out are left out (and stay cached for later)
+    timeout = min(FARE_CALENDAR_DEADLINE, deadline.remaining(FARE_CALENDAR_DEADLINE))
+    done, not_done = wait(futures, timeout=timeout)
+    calendar = {}
+    responses = {}
+    for future, travel_date in futures.items():
+        result = None
+        if future in done and not future.cancelled() and future.exception() is None:
+            result = future.result()
+        if isinstance(result, dict) and result.get("data"):
+            responses[travel_date] = result
+            lowest_price = min(offer_price(entry) for entry in result["data"])
+            calendar[travel_date] = lowest_price if lowest_price != float("inf") else None
+        else:
+            calendar[travel_date] = None
+
+    if not_done:
+        logger.warning("⚠️ Fare calendar dates timed out: %s", sorted(futures[f] for f in not_done))
+        if timeout < FARE_CALENDAR_DEADLINE:
+            deadline.record_exhausted("fare_calendar")
+    return dict(sorted(calendar.items())), responses
+
+
+def fare_calendar_agent(flight_details):
+    """
+    Answers a flexible-date request in one turn: lowest price per day plus the best offers across
+    the window. The best offers are saved as the flight list so the caller can pick one directly.
+    """
+    if not flight_details.get("date_of_travel"):
+        return "❌ Please tell me roughly when you would like to travel."
+    try:
+        datetime.strptime(flight_details["date_of_travel"], "%Y-%m-%d")
+        if flight_details.get("return_date"):
+            datetime.strptime(flight_details["return_date"], "%Y-%m-%d")
+    except (TypeError, ValueError):
+        # ✅ The extracted date is not always ISO ("next Friday"), ask again rather than fail the turn
+        logger.warning("Fare calendar got a non-ISO date: %s", flight_details.get("date_of_travel"))
+        return "❌ Please tell me roughly when you would like to travel."
+
+    calendar, responses = fare_calendar_search(flight_details)
+    if not responses:
+        return "❌ No flights available around that date. Please try other dates."
+
+    merged = drop_failed_offers(merge_search_responses(list(responses.values())))
+    merged["data"] = merged["data"][:FARE_CALENDAR_BEST_OFFERS]
+    if not merged["data"]:
+        return "❌ None of the flights around that date could be confirmed. Please try other dates."
+    flight_list_memory.save_data(merged)
+
+    return {
+        "fare_calendar": {
+            travel_date: price if price is not None else "no flights"
+            for travel_date, price in calendar.items()
+        },
+        "requested_date": flight_details["date_of_travel"],
+        "best_offers": format_flight_results(merged),
+    }
@@ -1,65 +1,42 @@
 import json
 import os
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
 from dotenv import load_dotenv
+from memory.json_memory import JSONMemory
+from tools.llm_client import chat_completion, stream_chat_completion
+from tools.prompt_registry import register_prompt
 
 # ✅ Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# ✅ Initialize LLM Model
-llm = ChatOpenAI(model="gpt-4o", openai_api_key=OPENAI_API_KEY)
-
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Moves one level up
 DATA_DIR = os.path.join(BASE_DIR, "data")
 
 FLIGHT_LIST_FILE = os.path.join(DATA_DIR, "flight_list.json")
+flight_list_memory = JSONMemory(FLIGHT_LIST_FILE)
 
-def flight_query_agent(user_message: str):
-    """
-    Uses LLM (GPT-4) to generate human-like answers for any flight-related query.
-    """
-
-    # ✅ Load flight list
-    try:
-        with open(FLIGHT_LIST_FILE, "r") as f:
-            flight_data = json.load(f)
-    except FileNotFoundError:
-        return "❌ No flight data available. Please try again later."
-
-    if isinstance(flight_data, list):
-        flight_list = flight_data
-    else:
-        flight_list = flight_data.get("data", [])
-    if not flight_list:
-        return "❌ No flights found."
-
-    # ✅ Prepare System Prompt & Context
-    system_prompt = "You are an expert travel assistant who answers flight-related questions in a natural, engaging manner."
-    context = f"""
+# ✅ Static answer rules first; the flight list (same for every turn of a search) before the query
+QUERY_PROMPT = register_prompt(
+    "flight_query",
+    system="""
+    You are an expert travel assistant who answers flight-related questions in a natural, engaging manner.
     You have access to real-time flight data. Your job is to **accurately answer any flight-related question** in a friendly, conversational way.
 
-    **User Query:** "{user_message}"
-
-    **Available Flight Data:**
-    {flight_list}
-
     **How You Should Respond:**
     - If the user asks for the **cheapest flight**, respond:  
-      "The cheapest flight available is {{airline}} for ${{price}}, departing on {{date}} at {{departure_time}}."
+      "The cheapest flight available is {airline} for ${price}, departing on {date} at {departure_time}."
     - If the user asks for **flight duration**, respond:  
-      "The flight from {{origin}} to {{destination}} takes approximately {{duration}}."
+      "The flight from {origin} to {destination} takes approximately {duration}."
     - If the user asks about **available airlines**, respond:  
-      "Flights are available from {{airline_list}}."
+      "Flights are available from {airline_list}."
     - If the user asks for **baggage information**, respond:  
-      "This flight includes {{baggage_allowance}} baggage allowance."
+      "This flight includes {baggage_allowance} baggage allowance."
     - If the user asks for **layovers**, respond:  
-      "This flight has a layover in {{layover_city}} for {{layover_time}}."
+      "This flight has a layover in {layover_city} for {layover_time}."
     - If the user asks about **business class or economy options**, respond:  
-      "Business class for this route costs around ${{business_class_price}}. Economy is available for ${{economy_price}}."
+      "Business class for this route costs around ${business_class_price}. Economy is available for ${economy_price}."
     - If the user asks for **flight options next week**, respond:  
-      "We have {{flight_count}} flights available for next week, starting from ${{lowest_price}}."
+      "We have {flight_count} flights available for next week, starting from ${lowest_price}."
     - If the user asks **general travel questions**, provide **helpful, friendly advice**.
 
     **Rules:**
@@ -67,10 +44,59 @@ def flight_query_agent(user_message: str):
     - Provide **full, human-like sentences** instead of raw data.
     - **DO NOT** return JSON data.
     - **DO NOT** say "I don't know" — always provide relevant travel insights.
+    """,
+    user="""
+    **Available Flight Data:**
+    {flight_data}
+
+    **User Query:** "{user_message}"
+    """,
+)
+
+def _flight_query_messages(user_message: str):
     """
+    Builds the LLM messages for a flight-related query.
+    Returns (messages, None), or (None, answer) when there is no flight data to answer from.
+    """
+
+    # ✅ Load flight list
+    flight_data = flight_list_memory.load_data(shared=True)
+    if not flight_data:
+        return None, "❌ No flight data available. Please try again later."
+
+    if isinstance(flight_data, list):
+        flight_list = flight_data
+    else:
+        flight_list = flight_data.get("data", [])
+    if not flight_list:
+        return None, "❌ No flights found."
+
+    return QUERY_PROMPT.messages(flight_data=flight_list, user_message=user_message), None
+
+
+def flight_query_agent(user_message: str):
+    """
+    Uses LLM (GPT-4) to generate human-like answers for any flight-related query.
+    """
+    messages, answer = _flight_query_messages(user_message)
+    if answer:
+        return answer
 
     # ✅ Generate response using LLM
-    response = llm.invoke([HumanMessage(content=context)])
+    response_text = chat_completion(messages, call_site="flight_query")
 
     # ✅ Return the natural language response
-    return response.content.strip()
+    return response_text
+
+
+async def flight_query_agent_stream(user_message: str):
+    """
+    Streaming variant of flight_query_agent for the voice pipeline: yields the answer token by token.
+    """
+    messages, answer = _flight_query_messages(user_message)
+    if answer:
+        yield answer
+        return
+
+    async for token in stream_chat_completion(messages, call_site="flight_query"):
+        yield token
@@ -1,15 +1,21 @@
+import logging
+import asyncio
 import json
-import openai
 from tools.utils import save_data
+from tools.async_steps import run_step_graph, run_step_graph_sync
+from tools.llm_client import chat_completion
+from tools.prompt_registry import register_prompt
 from memory.json_memory import JSONMemory
 from tools.location_extractor import extract_location, extract_date, extract_number, extract_return_date
-from agents.flight_search_api_agent import flight_search_api_agent
+from agents.flight_search_api_agent import flight_search_api_agent, start_speculative_search, NO_FLIGHTS_MESSAGE
+from agents.fare_calendar_agent import fare_calendar_agent, is_flexible_date_request
 
 import os
 from dotenv import load_dotenv
-import requests
 import json
 
+logger = logging.getLogger("flight-search")
+
 
 
 
@@ -26,11 +32,6 @@ FLIGHT_SEARCH_DATA_FILE = os.path.join(DATA_DIR, "flight_search_data.json")
 pending_flight_data = {}
 pending_passenger_data = {}
 
-deepseek_headers = {
-    "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-    "Content-Type": "application/json",
-}
-
 def save_flight_data(flight_details):
     """Ensures the flight search data file exists and saves flight details, overwriting previous data."""
     # ✅ Ensure the `data/` directory exists
@@ -38,13 +39,12 @@ def save_flight_data(flight_details):
 
     try:
         # ✅ Save new flight data, overwriting previous data
-        with open(FLIGHT_SEARCH_DATA_FILE, "w") as f:
-            json.dump(flight_details, f, indent=4)
+        flight_memory.save_data(flight_details)
 
-        print("✅ Flight data successfully saved!")
+        logger.debug("✅ Flight data successfully saved!")
 
     except Exception as e:
-        print(f"❌ Error saving flight data: {e}")
+        logger.error("❌ Error saving flight data: %s", e)
 
 def get_flight_type(origin, destination):
     """
@@ -62,7 +62,7 @@ def get_flight_type(origin, destination):
     }
 
     if not origin or not destination:  # If either is None, return unknown
-        print("⚠️ Missing origin or destination. Flight type undetermined.")
+        logger.warning("⚠️ Missing origin or destination. Flight type undetermined.")
         return "unknown"
 
     origin_lower = origin.lower().strip()
@@ -73,16 +73,49 @@ def get_flight_type(origin, destination):
 
     flight_type = "domestic" if is_origin_domestic and is_destination_domestic else "international"
 
-    print(f"🟢 [DEBUG] Flight Type Determined: {flight_type} (Origin: {origin}, Destination: {destination})")
+    logger.debug("Flight type determined: %s (origin: %s, destination: %s)", flight_type, origin, destination)
     return flight_type
 
 
+def flight_detail_steps(user_input: str):
+    """
+    Extraction steps for one utterance. They are independent of each other, so they run
+    concurrently; origin and destination share a single GPT call through the turn memo.
+    """
+    return {
+        "origin": (lambda results: extract_location(user_input, "from"), []),
+        "destination": (lambda results: extract_location(user_input, "to"), []),
+        "date_of_travel": (lambda results: extract_date(user_input), []),
+        "return_date": (lambda results: extract_return_date(user_input), []),
+        # ✅ Extract number of passengers (adults & children) correctly
+        "num_adults": (lambda results: extract_number(user_input, "adult") or extract_number(user_input, "adults"), []),
+        "num_children": (lambda results: extract_number(user_input, "child") or extract_number(user_input, "children"), []),
+        "journey_type": (lambda results: extract_journey_type(user_input), []),
+    }
+
+
 def extract_flight_details(user_input: str, user_id:str):
     """
     Extracts structured flight details dynamically using NLP while retaining previous values.
     """
-    global pending_flight_data
+    extracted = run_step_graph_sync(flight_detail_steps(user_input))
+    return _apply_flight_details(user_input, extracted)
+
+
+async def extract_flight_details_async(user_input: str, user_id: str):
+    """
+    Async variant of `extract_flight_details` for the voice pipeline; the turn takes as long
+    as the slowest extraction step instead of their sum.
+    """
+    extracted = await run_step_graph(flight_detail_steps(user_input))
+    return await asyncio.to_thread(_apply_flight_details, user_input, extracted)
+
 
+def merge_flight_details(extracted: dict):
+    """
+    Merges freshly extracted values into the saved flight details without saving them.
+    Returns (flight_details, flight_type).
+    """
     # ✅ Load existing flight data if available
     flight_details = flight_memory.load_data() or {}
 
@@ -99,22 +132,21 @@ def extract_flight_details(user_input: str, user_id:str):
     flight_details.setdefault("flight_type", None)
     flight_details.setdefault("return_date", None)
     flight_type = None
-    # ✅ Extract new flight details
-    origin = extract_location(user_input, "from")
-    destination = extract_location(user_input, "to")
-    date_of_travel = extract_date(user_input)
-    return_date = extract_return_date(user_input)
-    # ✅ Extract number of passengers (adults & children) correctly
-    num_adults = extract_number(user_input, "adult") or extract_number(user_input, "adults")
-    num_children = extract_number(user_input, "child") or extract_number(user_input, "children")
+    # ✅ Newly extracted flight details
+    origin = extracted["origin"]
+    destination = extracted["destination"]
+    date_of_travel = extracted["date_of_travel"]
+    return_date = extracted["return_date"]
+    num_adults = extracted["num_adults"]
+    num_children = extracted["num_children"]
 
     if num_adults > 0:
         flight_details["num_adults"] = num_adults
     if num_children > 0:
         flight_details["num_children"] = num_children
 
-    # ✅ Extract and update journey type
-    journey_type = extract_journey_type(user_input)
+    # ✅ Update journey type
+    journey_type = extracted["journey_type"]
     if journey_type:
         flight_details["journey_type"] = journey_type
 
@@ -138,48 +170,102 @@ def extract_flight_details(user_input: str, user_id:str):
     if journey_type and journey_type.lower() != "unknown" and journey_type != None:
         flight_details["journey_type"] = journey_type
 
-    print(flight_details)
+    return flight_details, flight_type
+
+
+def prefetch_flight_search(user_input: str):
+    """
+    Starts the flight search in the background as soon as this utterance completes the search
+    slots, before the LLM has decided to call the flight tool. Nothing is saved here; the tool
+    call later merges the same (turn-memoized) extraction and picks up the running search.
+    """
+    try:
+        extracted = run_step_graph_sync(flight_detail_steps(user_input))
+        flight_details, _ = merge_flight_details(extracted)
+        return start_speculative_search(flight_details)
+    except Exception as e:
+        logger.warning("⚠️ Speculative search skipped: %s", e)
+        return None
+
+
+def _apply_flight_details(user_input: str, extracted: dict):
+    """
+    Merges freshly extracted values into the saved flight details and searches once complete.
+    """
+    global pending_flight_data
+
+    flight_details, flight_type = merge_flight_details(extracted)
+
+    logger.debug("Merged flight details: %s", flight_details)
     # ✅ Identify missing fields AFTER merging new and old values
     missing_fields = [field for field in ["origin", "destination", "date_of_travel", "journey_type"] if not flight_details[field]]
 
+    if not missing_fields:
+        # ✅ Slots are complete: start the search before anything else so it overlaps the file writes
+        start_speculative_search(flight_details)
+
     # ✅ Save the updated flight details
     save_flight_data(flight_details)
 
     if not missing_fields:
-        print("🚀 Calling flight_search_api_agent() to fetch flight data...")
+        logger.info("🚀 Calling flight_search_api_agent() to fetch flight data...")
         if flight_type and flight_type.lower() != "unknown" and flight_type != None:
             if flight_details["origin"].lower() != "unknown" and flight_details["origin"].lower() != None and flight_details["origin"].lower() != 'null' and flight_details["destination"].lower() != "unknown" and flight_details["destination"].lower() != None and flight_details["destination"].lower() != 'null':
                 flight_type = get_flight_type(flight_details["origin"], flight_details["destination"])
                 flight_details["flight_type"] = flight_type
 
+        if is_flexible_date_request(user_input):
+            # ✅ "Around the 10th": search the whole date window in one turn
+            return fare_calendar_agent(flight_details)
+
         flight_list = flight_search_api_agent()
 
+        if flight_list == NO_FLIGHTS_MESSAGE:
+            # ✅ No seats on the requested date: offer the nearby dates right away
+            return fare_calendar_agent(flight_details)
+
         if isinstance(flight_list, str):  # If API returns an error
            # return f"📌 Flight List Data: \n{flight_list}"
            return flight_list
 
-        print(f"✅ Flight search details saved successfully: {flight_details}")
-        print(f"📌 Flight List Data: {flight_list}")
-        print("Flight details saved! Please ask about available flights.")
+        logger.debug("✅ Flight search details saved successfully: %s", flight_details)
+        logger.debug("📌 Flight List Data: %s", flight_list)
         return flight_list
     missing_response = ask_for_missing_details_gpt4(flight_details, missing_fields, user_input)
     return missing_response
     # return f"✈️ Almost done! Please provide: {', '.join(missing_fields)}."
 
+MISSING_DETAIL_LABELS = {
+    "origin": "departure city",
+    "destination": "destination city",
+    "date_of_travel": "travel date",
+    "journey_type": "trip type (one-way or round trip)",
+}
+
+
+MISSING_DETAILS_PROMPT = register_prompt(
+    "ask_for_missing_details",
+    system="""
+    You are a helpful, friendly AI travel assistant helping a user book a flight.
+    Create a **short, warm response** that acknowledges the known details and asks only for the
+    missing details in a **casual and natural way**. Please give very specific answer in one sentence.
+    """,
+    user="""
+    ### Known Details:
+    {known_details}
+
+    ### Missing Details: {missing_details}
+
+    ### User Message:
+    {user_message}
+    """,
+)
+
+
 def ask_for_missing_details_gpt4(flight_details, missing_details, user_message):
     """
     Uses GPT-4 to generate dynamic, human-like responses asking for missing flight details.
     """
-    client = openai.Client(api_key=OPENAI_API_KEY)
-    prompt = (
-        f"You are a friendly AI travel assistant helping a user book a flight."
-        f"\n\n### User Message:\n{user_message}"
-        f"\n\n### Known Details:\n{json.dumps(flight_details, indent=2)}"
-        f"\n\n### Missing Details: {', '.join(missing_details)}"
-        f"\n\nCreate a **short, warm response** that acknowledges the known details "
-        f"and asks only for the missing details in a **casual and natural way**."
-        f"Please give very specific answer in one sentence."
-    )
 
     # print(prompt)
     # # ✅ Use OpenAI v1.0.0+ API
@@ -198,26 +284,20 @@ def ask_for_missing_details_gpt4(flight_details, missing_details, user_message):
     # print(response_text)
     # return response_text
 
-    payload = {
-        "model": "deepseek-chat",  # Replace with the correct model name
-        "messages": [
-            {"role": "system", "content": "You are a helpful travel assistant."},
-            {"role": "user", "content": prompt},
-        ],
-        "max_tokens": 200,
-        "temperature": 0.8,
-    }
-    # Make the API request
-    response = requests.post(DEEPSEEK_API_URL, headers=deepseek_headers, json=payload)
-
-    # Check if the request was successful
-    if response.status_code == 200:
-        response_data = response.json()
-        response_text = response_data["choices"][0]["message"]["content"].strip()
-        print(response_text)
+    try:
+        messages = MISSING_DETAILS_PROMPT.messages(
+            known_details=json.dumps(flight_details, indent=2),
+            missing_details=", ".join(missing_details),
+            user_message=user_message,
+        )
+        response_text = chat_completion(messages, call_site="ask_for_missing_details")
+        logger.debug("Missing details prompt: %s", response_text)
         return response_text
-    else:
-        print(f"Error: {response.status_code}, {response.text}")
+    except Exception as e:
+        # ✅ LLM unavailable (error, open circuit or no time left): ask with a template instead
+        logger.error("Missing details prompt failed: %s", e)
+        labels = [MISSING_DETAIL_LABELS.get(field, field) for field in missing_details]
+        return f"Could you please tell me your {', '.join(labels)}?"
 
 
 def extract_journey_type(user_input: str) -> str:
@@ -1,14 +1,32 @@
+import itertools
 import json
+import logging
 import os
+import threading
+import time
+import uuid
 import openai
 import requests
 from tabulate import tabulate
 from memory.json_memory import JSONMemory
 from dotenv import load_dotenv
 from datetime import datetime
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait, TimeoutError as FutureTimeoutError
 from tools.utils import correct_airport_name
+from tools.turn_memo import turn_memoized
+from tools.speculative_search import SpeculativeSearchScheduler
+from tools.json_stream import stream_json_response
+from tools.audit_log import audit_log
+from tools.logging_config import call_context
+from tools import deadline
+from tools.circuit_breaker import CircuitOpen
+from tools.worker_metrics import counter_family, register_collector
+from agents.flight_selection_agent import prevalidate_offers, drop_failed_offers, offer_price
 
 
+logger = logging.getLogger("flight-search-api")
+
 # Load environment variables
 load_dotenv()
 DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL")
@@ -24,18 +42,19 @@ client = openai.OpenAI(api_key=OPENAI_API_KEY)
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Moves one level up
 DATA_DIR = os.path.join(BASE_DIR, "data")
-LOG_DIR = os.path.join(DATA_DIR, "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
-
-def save_log_file(filename, content):
-    with open(os.path.join(LOG_DIR, filename), "w", encoding="utf-8") as f:
-        f.write(content)
-
 FLIGHT_API_URL = os.getenv("FLIGHT_API_URL")
 flight_memory = JSONMemory(os.path.join(DATA_DIR, "flight_search_data.json"))
 flight_list_file = os.path.join(DATA_DIR, "flight_list.json")
+flight_list_memory = JSONMemory(flight_list_file, indent=None)  # Large; written compact
 passenger_memory = JSONMemory(os.path.join(DATA_DIR, "passenger_data.json"))
 
+# ✅ Search units (supplier x airport pair) run concurrently under one deadline
+FLIGHT_SUPPLIER_UIDS = os.getenv("FLIGHT_SUPPLIER_UIDS", "F1TT00041")
+MULTI_AIRPORT_SEARCH = os.getenv("MULTI_AIRPORT_SEARCH", "true").lower() == "true"
+MAX_AIRPORT_PAIRS = int(os.getenv("MAX_AIRPORT_PAIRS", "6"))
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "12"))
+SUPPLIER_GRACE = float(os.getenv("SUPPLIER_GRACE", "2"))  # Extra seconds for slower units once offers are in
+
 headers = {
     "Accept": "application/json",
     "Content-Type": "application/json",
@@ -240,43 +259,377 @@ airlines_dict = {
             "WN": "Southwest Airlines"
         }
 
-# Flight Search API Agent
-def flight_search_api_agent():
-    flight_details = flight_memory.load_data() or {}
-    if not flight_details.get("origin") or not flight_details.get("destination"):
-        return "❌ Missing flight details. Please provide origin and destination."
+NO_FLIGHTS_MESSAGE = "❌ No flights available. Please try again later."
+SEARCH_UNAVAILABLE_MESSAGE = "Our flight search is temporarily unavailable. Please try again in a minute."
+STILL_SEARCHING_MESSAGE = "I'm still searching for flights, it is taking a little longer than usual. Please ask me again in a moment."
+SEARCH_KEY_FIELDS = ["origin", "destination", "date_of_travel", "journey_type", "return_date", "num_adults", "num_children"]
+
+
+def search_key(flight_details):
+    """Identifies a search by its slots; None while the slots are incomplete."""
+    if any(not flight_details.get(field) for field in ["origin", "destination", "date_of_travel", "journey_type"]):
+        return None
+    return json.dumps({field: flight_details.get(field) for field in SEARCH_KEY_FIELDS}, sort_keys=True)
+
+
+def airport_pairs(flight_details, multi_airport=MULTI_AIRPORT_SEARCH):
+    """(origin code, destination code) pairs to search; one per airport combination of the two cities."""
+    origin_codes = get_airport_codes(flight_details.get("origin")) or [None]
+    destination_codes = get_airport_codes(flight_details.get("destination")) or [None]
+    if not multi_airport:
+        return [(origin_codes[0], destination_codes[0])]
+    return list(itertools.product(origin_codes, destination_codes))[:MAX_AIRPORT_PAIRS]
+
+
+class SupplierStats:
+    """Rolling latency and error counters of one supplier."""
+
+    def __init__(self, window=200):
+        self.latencies_ms = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.first_offer_ms = deque(maxlen=window)
+        self.peak_buffer_chars = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms, ok):
+        with self._lock:
+            self.calls += 1
+            self.latencies_ms.append(latency_ms)
+            if not ok:
+                self.errors += 1
+
+    def record_stream(self, metrics):
+        with self._lock:
+            if metrics["time_to_first_entry_ms"] is not None:
+                self.first_offer_ms.append(metrics["time_to_first_entry_ms"])
+            self.peak_buffer_chars = max(self.peak_buffer_chars, metrics["peak_buffer_chars"])
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def summary(self):
+        with self._lock:
+            latencies = sorted(self.latencies_ms)
+            first_offer = sorted(self.first_offer_ms)
+        p50 = latencies[len(latencies) // 2] if latencies else None
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "error_rate": round(self.errors / self.calls, 3) if self.calls else None,
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "first_offer_p50_ms": first_offer[len(first_offer) // 2] if first_offer else None,
+            "peak_buffer_chars": self.peak_buffer_chars,
+        }
 
-    payload = create_payload(flight_details)
-    payload = payload.replace("None", "null")
-    search_payload = json.loads(payload)
-    save_log_file("flight_search_payload.json", json.dumps(search_payload, indent=4))
 
-    response = requests.post("https://serviceapi.innotraveltech.com/flight/search",json=search_payload, headers=headers)
-    print(f"Flight API Response Status Code: {response.status_code}")
-    if response.status_code == 200:
-        flights = response.json()
-        save_log_file("flight_search_response.json", json.dumps(flights, indent=4))
+class SupplierAdapter:
+    """
+    One search supplier behind the /flight/search API. Subclasses can override `build_payload`
+    and `normalize` for suppliers that need different request fields or return other shapes.
+    """
 
+    def __init__(self, supplier_uid):
+        self.supplier_uid = supplier_uid
+        self.stats = SupplierStats()
 
-        if "data" not in flights or not flights["data"]:
-            print("❌ API response does not contain valid flight data!")
-            return "❌ No flights available. Please try again later."
+    def build_payload(self, flight_details, origin_code, destination_code):
+        payload = json.loads(create_payload(flight_details, origin_code, destination_code).replace("None", "null"))
+        payload["supplier_uid"] = self.supplier_uid
+        return payload
 
-        with open(flight_list_file, "w") as f:
-            json.dump(flights, f, indent=4)
-            
+    def normalize_entry(self, entry, response_tracking_id=None):
+        """Tags an offer with its supplier and its own tracking_id."""
+        return {
+            **entry,
+            "tracking_id": entry.get("tracking_id") or response_tracking_id,
+            "supplier_uid": entry.get("supplier_uid") or self.supplier_uid,
+        }
 
-        print("✅ Flight list successfully saved!")
-        flight_list = _format_results(flights)
-        return flight_list
-    else:
-        print(f"❌ Flight API Error: {response.status_code}, Response: {response.text}")
-        error_content = f"Status Code: {response.status_code}\n\nResponse Text:\n{response.text}"
-        save_log_file("flight_search_error.txt", error_content)
-        return f"❌ Flight search failed. Error: {response.status_code}"
+    def search(self, flight_details, origin_code=None, destination_code=None, on_entry=None):
+        """
+        Searches one airport pair. Offers are decoded while the body streams in and passed to
+        `on_entry(entry)` one by one. Returns the response, or an error message string.
+        """
+        started = time.perf_counter()
+        result = None
+        try:
+            result = self._search(flight_details, origin_code, destination_code, on_entry, started)
+            return result
+        finally:
+            ok = isinstance(result, dict) or result == NO_FLIGHTS_MESSAGE  # An empty date is not a supplier error
+            self.stats.record(round((time.perf_counter() - started) * 1000), ok)
+
+    def _search(self, flight_details, origin_code, destination_code, on_entry, started):
+        search_payload = self.build_payload(flight_details, origin_code, destination_code)
+        audit_meta = {"call_id": call_context["call_id"], "request_id": uuid.uuid4().hex[:12], "supplier_uid": self.supplier_uid, "route": f"{origin_code}-{destination_code}"}
+        audit_log.log("flight_search_payload", search_payload, **audit_meta)
+
+        # ✅ Searches may outlive the turn (speculative), so they are capped by the search deadline only
+        response = deadline.post(
+            "https://serviceapi.innotraveltech.com/flight/search", "flight_search",
+            cap=SEARCH_DEADLINE, bound_to_turn=False, breaker=f"flight_search:{self.supplier_uid}",
+            json=search_payload, headers=headers, stream=True,
+        )
+        logger.debug("Flight API response status %s (%s)", response.status_code, self.supplier_uid)
+        try:
+            if response.status_code != 200:
+                logger.error("❌ Flight API Error: %s, Response: %s", response.status_code, response.text)
+                audit_log.log("flight_search_error", response.text, status_code=response.status_code, **audit_meta)
+                return f"❌ Flight search failed. Error: {response.status_code}"
+
+            first_tracking_id = []
+
+            def normalize(entry):
+                if not first_tracking_id:
+                    first_tracking_id.append(entry.get("tracking_id"))
+                entry = self.normalize_entry(entry, first_tracking_id[0])
+                if on_entry:
+                    on_entry(entry)
+                return entry
+
+            # ✅ Offers are decoded entry by entry while the body is still arriving; the raw body
+            # is only kept for calls whose requests are audited
+            raw_chunks = [] if audit_log.sampled(audit_meta["call_id"]) else None
+            flights, metrics = stream_json_response(response, on_entry=normalize, started_at=started, raw_chunks=raw_chunks)
+            self.stats.record_stream(metrics)
+            logger.debug("📶 Search stream (%s): %s", self.supplier_uid, metrics)
+            if raw_chunks is not None:
+                audit_log.log("flight_search_response", raw_chunks, **audit_meta)
+
+            if "data" not in flights or not flights["data"]:
+                logger.info("❌ API response does not contain valid flight data!")
+                return NO_FLIGHTS_MESSAGE
+            return flights
+        finally:
+            response.close()  # ✅ Also when parsing failed half-way, so the connection is released
+
+
+# ✅ Configured suppliers, queried concurrently (FLIGHT_SUPPLIER_UIDS="F1TT00041,...")
+SUPPLIERS = [SupplierAdapter(uid.strip()) for uid in FLIGHT_SUPPLIER_UIDS.split(",") if uid.strip()]
+_search_executor = ThreadPoolExecutor(max_workers=MAX_AIRPORT_PAIRS * max(len(SUPPLIERS), 1), thread_name_prefix="flight-search-unit")
+
+
+def supplier_stats_summary():
+    return {supplier.supplier_uid: supplier.stats.summary() for supplier in SUPPLIERS}
+
+
+def _itinerary_key(entry):
+    flight_filter = entry.get("filter", {})
+    flight_numbers = [
+        (route.get("operating", {}).get("carrier"), route.get("operating", {}).get("flight_number"))
+        for group in entry.get("flight_group", []) or []
+        for route in group.get("routes", []) or []
+    ]
+    return json.dumps([
+        flight_filter.get("carrier_operating"),
+        flight_filter.get("departure_departure_time"),
+        flight_filter.get("arrival_departure_time"),
+        flight_filter.get("cabin_class"),
+        flight_numbers,
+    ], default=str)
+
+
+class OfferSet:
+    """
+    Merged, deduplicated offers that grow as search responses arrive. Each entry keeps its own
+    tracking_id, duplicate itineraries keep the cheapest offer, and offers are ranked by price.
+    """
+
+    def __init__(self):
+        self._best = {}
+        self._template = None
+        self._lock = threading.Lock()
+
+    def add(self, response):
+        data = response.get("data") or []
+        response_tracking_id = data[0].get("tracking_id") if data else None
+        with self._lock:
+            if self._template is None:
+                self._template = {key: value for key, value in response.items() if key != "data"}
+        for entry in data:
+            self.add_entry({**entry, "tracking_id": entry.get("tracking_id") or response_tracking_id})
+
+    def add_entry(self, entry):
+        """Adds one offer; returns True if it is new or cheaper than the known duplicate."""
+        key = _itinerary_key(entry)
+        with self._lock:
+            if key not in self._best or offer_price(entry) < offer_price(self._best[key]):
+                self._best[key] = entry
+                return True
+        return False
+
+    def __len__(self):
+        return len(self._best)
+
+    def to_response(self):
+        with self._lock:
+            return {**(self._template or {}), "data": sorted(self._best.values(), key=offer_price)}
+
+
+def merge_search_responses(responses):
+    """Merges several search responses into one ranked, deduplicated offer set."""
+    offers = OfferSet()
+    for response in responses:
+        offers.add(response)
+    return offers.to_response()
+
+
+def search_flights(flight_details, on_offers=None, multi_airport=MULTI_AIRPORT_SEARCH):
+    """
+    Runs the supplier search for `flight_details` without touching the saved flight list.
+    Every configured supplier and, for cities with several airports (unless `multi_airport`
+    is off), every airport pair is queried concurrently. `on_offers(response)` is called with
+    the merged offers each time a search unit returns results.
+
+    Returns the merged API response, or an error message string.
+    """
+    units = [
+        (supplier, origin_code, destination_code)
+        for supplier in SUPPLIERS
+        for origin_code, destination_code in airport_pairs(flight_details, multi_airport)
+    ]
+    single_unit = len(units) == 1
+    offers = OfferSet()
+    first_offer_shared = threading.Event()
+    first_offer_lock = threading.Lock()
+
+    def on_entry(entry):
+        offers.add_entry(entry)
+        # ✅ The first decoded offer is shared right away, before any body has fully arrived
+        if on_offers and not first_offer_shared.is_set():
+            with first_offer_lock:
+                if first_offer_shared.is_set():
+                    return
+                first_offer_shared.set()
+            on_offers(offers.to_response())
+
+    futures = {
+        _search_executor.submit(supplier.search, flight_details, origin_code, destination_code, on_entry): (supplier, origin_code, destination_code)
+        for supplier, origin_code, destination_code in units
+    }
+
+    # ✅ Wait for all units until the shared deadline, but once offers are in, slower units only
+    # get SUPPLIER_GRACE more seconds so an extra supplier cannot hold back the first results
+    errors = []
+    pending = set(futures)
+    search_deadline = time.monotonic() + SEARCH_DEADLINE
+    first_offers_at = None
+    while pending:
+        now = time.monotonic()
+        timeout = search_deadline - now
+        if first_offers_at is not None:
+            timeout = min(timeout, first_offers_at + SUPPLIER_GRACE - now)
+        if timeout <= 0:
+            break
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except CircuitOpen:
+                result = SEARCH_UNAVAILABLE_MESSAGE  # Supplier is failing, no request was sent
+            except Exception as e:
+                result = f"❌ Flight search failed. Error: {e}"
+            if isinstance(result, str):
+                errors.append(result)
+                continue
+            offers.add(result)
+            if first_offers_at is None:
+                first_offers_at = time.monotonic()
+            if on_offers:
+                on_offers(offers.to_response())
+
+    for future in pending:
+        # ✅ Units still queued behind the pool never start; a running one finishes in its thread
+        future.cancel()
+        supplier, origin_code, destination_code = futures[future]
+        supplier.stats.record_timeout()
+        logger.warning("⚠️ Search timed out for %s %s->%s", supplier.supplier_uid, origin_code, destination_code)
+
+    if not len(offers):
+        if not errors:
+            return "❌ Flight search timed out. Please try again."
+        return NO_FLIGHTS_MESSAGE if NO_FLIGHTS_MESSAGE in errors else errors[0]
+
+    if not single_unit:
+        logger.info("✅ Merged %s offers from %s/%s searches", len(offers), len(units) - len(pending) - len(errors), len(units))
+    return offers.to_response()
+
+
+# ✅ Offers merged so far by searches still running, served when the turn budget runs out
+partial_offers = {}
+
+
+def _search_and_prevalidate(flight_details):
+    key = search_key(flight_details)
+
+    def on_offers(response):
+        partial_offers[key] = response
+        # ✅ Validation of the top offers starts with the first results and overlaps the rest of the turn
+        prevalidate_offers(response)
+
+    try:
+        return search_flights(flight_details, on_offers=on_offers)
+    finally:
+        partial_offers.pop(key, None)
+
+
+# ✅ Searches start in the background as soon as the slots are complete (see start_speculative_search)
+search_scheduler = SpeculativeSearchScheduler(_search_and_prevalidate, search_key)
+register_collector(lambda: [counter_family(
+    "speculative_search_events_total", "Speculative search outcomes (reused vs direct is the hit ratio)",
+    search_scheduler.stats, "event",
+)])
+
+
+def start_speculative_search(flight_details):
+    """Starts the search for `flight_details` in the background if its slots are complete."""
+    return search_scheduler.schedule(flight_details)
+
+
+# Flight Search API Agent
+def flight_search_api_agent():
+    flight_details = flight_memory.load_data() or {}
+    if not flight_details.get("origin") or not flight_details.get("destination"):
+        return "❌ Missing flight details. Please provide origin and destination."
+
+    # ✅ Picks up the speculative search for these slots if one is running or done
+    try:
+        flights = search_scheduler.get(flight_details, timeout=deadline.call_timeout("flight_search_wait", cap=SEARCH_DEADLINE + SUPPLIER_GRACE))
+    except deadline.BudgetExhausted:
+        flights = None
+    except FutureTimeoutError:
+        deadline.record_exhausted("flight_search_wait")
+        flights = None
+    if flights is None:
+        # ✅ Out of time for this turn: answer with the offers that have arrived, the search keeps running
+        flights = partial_offers.get(search_key(flight_details))
+        if not flights:
+            return STILL_SEARCHING_MESSAGE
+    if flights == SEARCH_UNAVAILABLE_MESSAGE:
+        # ✅ Suppliers are failing fast: fall back to an earlier result for the same search
+        flights = search_scheduler.stale(flight_details) or flights
+    if isinstance(flights, str):
+        return flights
+
+    # ✅ Offers that already failed validation are not presented
+    flights = drop_failed_offers(flights)
+    if not flights["data"]:
+        return "❌ None of the available flights could be confirmed. Please try another date."
+
+    flight_list_memory.save_data(flights)
+
+    logger.debug("✅ Flight list successfully saved!")
+    flight_list = format_flight_results(flights)
+    return flight_list
         
 
-def _format_results(response_data):
+def format_flight_results(response_data):
     if "data" in response_data:
         data = response_data["data"]
         tracking_id = data[0].get("tracking_id", None)
@@ -335,14 +688,14 @@ def _format_results(response_data):
                 "arrival_date": extract_date_time(entry.get("filter", {}).get("arrival_departure_time", "N/A"))[0],
                 "arrival_time": extract_date_time(entry.get("filter", {}).get("arrival_departure_time", "N/A"))[1],
 
-                "tracking_id": tracking_id,
+                "tracking_id": entry.get("tracking_id") or tracking_id,
                 "id": entry.get("filter", {}).get("id", "N/A"),
             }
             for entry in data  # Ensure we loop over a list
         ]
 
         flight_list = clean_data(filtered_data)
-        print(flight_list)
+        logger.debug("Formatted flight list: %s", flight_list)
         return flight_list
 
     return "No data found in the response."
@@ -408,16 +761,18 @@ def clean_data(flights_data):
             flight['carrier_operating'] = airlines_dict[flight['carrier_operating']]
     return flights_data
 
-def create_payload(flight_details):
+def create_payload(flight_details, origin_code=None, destination_code=None):
+    origin_code = origin_code or get_airport_code(flight_details["origin"])
+    destination_code = destination_code or get_airport_code(flight_details["destination"])
     payload = {
         "journey_type": flight_details.get("journey_type", "OneWay"),
         "segment": [
             {
                 "departure_airport_type": "AIRPORT",
-                "departure_airport": get_airport_code(flight_details["origin"]),
+                "departure_airport": origin_code,
                 # Use IATA code if available
                 "arrival_airport_type": "AIRPORT",
-                "arrival_airport": get_airport_code(flight_details["destination"]),
+                "arrival_airport": destination_code,
                 # Use IATA code if available
                 "departure_date": flight_details["date_of_travel"],
             }
@@ -436,7 +791,7 @@ def create_payload(flight_details):
         "non_stop_flight": "any",
         "baggage_option": "any",
         "booking_class": "Economy",
-        "supplier_uid": "F1TT00041",  # Replace with actual supplier UID if dynamic
+        "supplier_uid": SUPPLIERS[0].supplier_uid if SUPPLIERS else None,  # Set per supplier by SupplierAdapter
         "partner_id": "78",  # Replace with actual partner ID if dynamic
         "language": "en",
         "short_ref": "12121212121",  # Replace with a dynamic reference if needed
@@ -445,8 +800,8 @@ def create_payload(flight_details):
 
     if flight_details["journey_type"] == "RoundTrip" and flight_details["return_date"]:
         payload["segment"].append({
-            "departure_airport": get_airport_code(flight_details["destination"]),
-            "arrival_airport": get_airport_code(flight_details["origin"]),
+            "departure_airport": destination_code,
+            "arrival_airport": origin_code,
             "departure_date": flight_details["return_date"],
         })
     else:
@@ -468,149 +823,161 @@ def create_payload(flight_details):
     # print(f"payload: {json.dumps(payload)}")
     return json.dumps(payload)
 
-def get_airport_code(city):
-    airports = {
-        "Dhaka": {"Shahjalal International Airport": "DAC"},
-        "Kathmandu": {"Tribhuvan International Airport": "KTM"},
-        "Kolkata": {"Netaji Subhas Chandra Bose International Airport": "CCU"},
-        "Chennai": {"Chennai International Airport": "MAA"},
-        "Bangkok": {
-            "Suvarnabhumi Airport": "BKK",
-            "Don Mueang International Airport": "DMK"
-        },
-        "Phuket": {"Phuket International Airport": "HKT"},
-        "Singapore": {"Singapore Changi Airport": "SIN"},
-        "Kuala Lumpur": {"Kuala Lumpur International Airport": "KUL"},
-        "Langkawi": {"Langkawi International Airport": "LGK"},
-        "Dubai": {
-            "Dubai International Airport": "DXB",
-            "Al Maktoum International Airport": "DWC"
-        },
-        "London": {
-            "Heathrow Airport": "LHR",
-            "Gatwick Airport": "LGW",
-            "London City Airport": "LCY",
-            "Luton Airport": "LTN",
-            "Stansted Airport": "STN"
-        },
-        "Manchester": {"Manchester Airport": "MAN"},
-        "Tokyo (Narita)": {"Narita International Airport": "NRT"},
-        "Doha": {"Hamad International Airport": "DOH"},
-        "Maldives": {
-            "Velana International Airport (Male)": "MLE",
-            "Gan International Airport": "GAN"
-        },
-        "Muscat": {"Muscat International Airport": "MCT"},
-        "Rome": {
-            "Leonardo da Vinci–Fiumicino Airport": "FCO",
-            "Ciampino–G. B. Pastine International Airport": "CIA"
-        },
-        "New York": {
-            "John F. Kennedy International Airport": "JFK",
-            "LaGuardia Airport": "LGA",
-            "Newark Liberty International Airport": "EWR"
-        },
-        "Washington": {
-            "Washington Dulles International Airport": "IAD",
-            "Ronald Reagan Washington National Airport": "DCA",
-            "Baltimore/Washington International Thurgood Marshall Airport": "BWI"
-        },
-        "Orlando, Florida": {
-            "Orlando International Airport": "MCO",
-            "Orlando Sanford International Airport": "SFB"
-        },
-        "Miami": {
-            "Miami International Airport": "MIA",
-            "Fort Lauderdale-Hollywood International Airport": "FLL"
-        },
-        "Bali": {"Ngurah Rai International Airport (Denpasar)": "DPS"},
-        "Jakarta": {
-            "Soekarno-Hatta International Airport": "CGK",
-            "Halim Perdanakusuma International Airport": "HLP"
-        },
-        "Hanoi": {"Noi Bai International Airport": "HAN"},
-        "Ho Chi Minh City": {"Tan Son Nhat International Airport": "SGN"},
-        "Philippines": {
-            "Ninoy Aquino International Airport (Manila)": "MNL",
-            "Mactan-Cebu International Airport": "CEB",
-            "Clark International Airport": "CRK"
-        },
-        "Guangzhou": {"Guangzhou Baiyun International Airport": "CAN"},
-        "Kunming": {"Kunming Changshui International Airport": "KMG"},
-        "Shanghai": {
-            "Shanghai Pudong International Airport": "PVG",
-            "Shanghai Hongqiao International Airport": "SHA"
-        },
-        "Chengdu": {
-            "Chengdu Shuangliu International Airport": "CTU",
-            "Chengdu Tianfu International Airport": "TFU"
-        },
-        "Hong Kong": {"Hong Kong International Airport": "HKG"},
-        "Sydney": {"Sydney Kingsford Smith Airport": "SYD"},
-        "Melbourne": {
-            "Melbourne Airport (Tullamarine)": "MEL",
-            "Avalon Airport": "AVV"
-        },
-        "Brisbane": {"Brisbane Airport": "BNE"},
-        "Adelaide": {"Adelaide Airport": "ADL"},
-        "Perth": {"Perth Airport": "PER"},
-        "Wellington": {"Wellington International Airport": "WLG"},
-        "Rio de Janeiro": {
-            "Rio de Janeiro–Galeão International Airport": "GIG",
-            "Santos Dumont Airport": "SDU"
-        },
-        "Buenos Aires": {
-            "Ministro Pistarini International Airport (Ezeiza)": "EZE",
-            "Jorge Newbery Airfield": "AEP"
-        },
-        "Mexico City": {"Mexico City International Airport": "MEX"},
-        "Nairobi": {"Jomo Kenyatta International Airport": "NBO"},
-        "Alexandria": {"Borg El Arab Airport": "HBE"},
-        "Cairo": {"Cairo International Airport": "CAI"},
-        "Moscow": {
-            "Sheremetyevo International Airport": "SVO",
-            "Domodedovo International Airport": "DME",
-            "Vnukovo International Airport": "VKO"
-        },
-        "Tashkent": {"Tashkent International Airport": "TAS"},
-        "Tbilisi": {"Tbilisi International Airport": "TBS"},
-        "Ethiopia": {"Addis Ababa Bole International Airport": "ADD"},
-        "Amsterdam": {"Amsterdam Airport Schiphol": "AMS"},
-        "Paris": {
-            "Charles de Gaulle Airport": "CDG",
-            "Orly Airport": "ORY"
-        },
-        "Venice": {
-            "Venice Marco Polo Airport": "VCE",
-            "Treviso Airport": "TSF"
-        },
-        "Naples": {"Naples International Airport": "NAP"},
-        "Barcelona": {"Barcelona–El Prat Airport": "BCN"},
-        "Madrid": {"Adolfo Suárez Madrid–Barajas Airport": "MAD"},
-        "Lisbon": {"Humberto Delgado Airport (Lisbon Airport)": "LIS"},
-        "Malaga": {"Málaga-Costa del Sol Airport": "AGP"},
-        "Toronto": {
-            "Toronto Pearson International Airport": "YYZ",
-            "Billy Bishop Toronto City Airport": "YTZ"
-        },
-        "Montreal": {"Montréal–Pierre Elliott Trudeau International Airport": "YUL"},
-        "Zurich": {"Zurich Airport": "ZRH"},
-        "Warsaw": {"Warsaw Chopin Airport": "WAW"},
-        "Lagos": {"Murtala Muhammed International Airport": "LOS"},
-        "Addis Ababa": {"Addis Ababa Bole International Airport": "ADD"},
-        "Barishal": {"Barisal Airport": "BZL"},
-        "Chittagong": {"Shah Amanat International Airport": "CGP"},
-        "Saidpur": {"Saidpur Airport": "SPD"},
-        "Rajshahi": {"Shah Makhdum Airport": "RJH"},
-        "Sylhet": {"Osmani International Airport": "ZYL"},
-        "Cox's Bazar": {"Cox's Bazar Airport": "CXB"},
-        "Jessore": {"Jessore Airport": "JSR"}
-    }
+# ✅ City -> {airport name: IATA code}; cities with several airports are searched across all of them
+CITY_AIRPORTS = {
+    "Dhaka": {"Shahjalal International Airport": "DAC"},
+    "Kathmandu": {"Tribhuvan International Airport": "KTM"},
+    "Kolkata": {"Netaji Subhas Chandra Bose International Airport": "CCU"},
+    "Chennai": {"Chennai International Airport": "MAA"},
+    "Bangkok": {
+        "Suvarnabhumi Airport": "BKK",
+        "Don Mueang International Airport": "DMK"
+    },
+    "Phuket": {"Phuket International Airport": "HKT"},
+    "Singapore": {"Singapore Changi Airport": "SIN"},
+    "Kuala Lumpur": {"Kuala Lumpur International Airport": "KUL"},
+    "Langkawi": {"Langkawi International Airport": "LGK"},
+    "Dubai": {
+        "Dubai International Airport": "DXB",
+        "Al Maktoum International Airport": "DWC"
+    },
+    "London": {
+        "Heathrow Airport": "LHR",
+        "Gatwick Airport": "LGW",
+        "London City Airport": "LCY",
+        "Luton Airport": "LTN",
+        "Stansted Airport": "STN"
+    },
+    "Manchester": {"Manchester Airport": "MAN"},
+    "Tokyo (Narita)": {"Narita International Airport": "NRT"},
+    "Doha": {"Hamad International Airport": "DOH"},
+    "Maldives": {
+        "Velana International Airport (Male)": "MLE",
+        "Gan International Airport": "GAN"
+    },
+    "Muscat": {"Muscat International Airport": "MCT"},
+    "Rome": {
+        "Leonardo da Vinci–Fiumicino Airport": "FCO",
+        "Ciampino–G. B. Pastine International Airport": "CIA"
+    },
+    "New York": {
+        "John F. Kennedy International Airport": "JFK",
+        "LaGuardia Airport": "LGA",
+        "Newark Liberty International Airport": "EWR"
+    },
+    "Washington": {
+        "Washington Dulles International Airport": "IAD",
+        "Ronald Reagan Washington National Airport": "DCA",
+        "Baltimore/Washington International Thurgood Marshall Airport": "BWI"
+    },
+    "Orlando, Florida": {
+        "Orlando International Airport": "MCO",
+        "Orlando Sanford International Airport": "SFB"
+    },
+    "Miami": {
+        "Miami International Airport": "MIA",
+        "Fort Lauderdale-Hollywood International Airport": "FLL"
+    },
+    "Bali": {"Ngurah Rai International Airport (Denpasar)": "DPS"},
+    "Jakarta": {
+        "Soekarno-Hatta International Airport": "CGK",
+        "Halim Perdanakusuma International Airport": "HLP"
+    },
+    "Hanoi": {"Noi Bai International Airport": "HAN"},
+    "Ho Chi Minh City": {"Tan Son Nhat International Airport": "SGN"},
+    "Philippines": {
+        "Ninoy Aquino International Airport (Manila)": "MNL",
+        "Mactan-Cebu International Airport": "CEB",
+        "Clark International Airport": "CRK"
+    },
+    "Guangzhou": {"Guangzhou Baiyun International Airport": "CAN"},
+    "Kunming": {"Kunming Changshui International Airport": "KMG"},
+    "Shanghai": {
+        "Shanghai Pudong International Airport": "PVG",
+        "Shanghai Hongqiao International Airport": "SHA"
+    },
+    "Chengdu": {
+        "Chengdu Shuangliu International Airport": "CTU",
+        "Chengdu Tianfu International Airport": "TFU"
+    },
+    "Hong Kong": {"Hong Kong International Airport": "HKG"},
+    "Sydney": {"Sydney Kingsford Smith Airport": "SYD"},
+    "Melbourne": {
+        "Melbourne Airport (Tullamarine)": "MEL",
+        "Avalon Airport": "AVV"
+    },
+    "Brisbane": {"Brisbane Airport": "BNE"},
+    "Adelaide": {"Adelaide Airport": "ADL"},
+    "Perth": {"Perth Airport": "PER"},
+    "Wellington": {"Wellington International Airport": "WLG"},
+    "Rio de Janeiro": {
+        "Rio de Janeiro–Galeão International Airport": "GIG",
+        "Santos Dumont Airport": "SDU"
+    },
+    "Buenos Aires": {
+        "Ministro Pistarini International Airport (Ezeiza)": "EZE",
+        "Jorge Newbery Airfield": "AEP"
+    },
+    "Mexico City": {"Mexico City International Airport": "MEX"},
+    "Nairobi": {"Jomo Kenyatta International Airport": "NBO"},
+    "Alexandria": {"Borg El Arab Airport": "HBE"},
+    "Cairo": {"Cairo International Airport": "CAI"},
+    "Moscow": {
+        "Sheremetyevo International Airport": "SVO",
+        "Domodedovo International Airport": "DME",
+        "Vnukovo International Airport": "VKO"
+    },
+    "Tashkent": {"Tashkent International Airport": "TAS"},
+    "Tbilisi": {"Tbilisi International Airport": "TBS"},
+    "Ethiopia": {"Addis Ababa Bole International Airport": "ADD"},
+    "Amsterdam": {"Amsterdam Airport Schiphol": "AMS"},
+    "Paris": {
+        "Charles de Gaulle Airport": "CDG",
+        "Orly Airport": "ORY"
+    },
+    "Venice": {
+        "Venice Marco Polo Airport": "VCE",
+        "Treviso Airport": "TSF"
+    },
+    "Naples": {"Naples International Airport": "NAP"},
+    "Barcelona": {"Barcelona–El Prat Airport": "BCN"},
+    "Madrid": {"Adolfo Suárez Madrid–Barajas Airport": "MAD"},
+    "Lisbon": {"Humberto Delgado Airport (Lisbon Airport)": "LIS"},
+    "Malaga": {"Málaga-Costa del Sol Airport": "AGP"},
+    "Toronto": {
+        "Toronto Pearson International Airport": "YYZ",
+        "Billy Bishop Toronto City Airport": "YTZ"
+    },
+    "Montreal": {"Montréal–Pierre Elliott Trudeau International Airport": "YUL"},
+    "Zurich": {"Zurich Airport": "ZRH"},
+    "Warsaw": {"Warsaw Chopin Airport": "WAW"},
+    "Lagos": {"Murtala Muhammed International Airport": "LOS"},
+    "Addis Ababa": {"Addis Ababa Bole International Airport": "ADD"},
+    "Barishal": {"Barisal Airport": "BZL"},
+    "Chittagong": {"Shah Amanat International Airport": "CGP"},
+    "Saidpur": {"Saidpur Airport": "SPD"},
+    "Rajshahi": {"Shah Makhdum Airport": "RJH"},
+    "Sylhet": {"Osmani International Airport": "ZYL"},
+    "Cox's Bazar": {"Cox's Bazar Airport": "CXB"},
+    "Jessore": {"Jessore Airport": "JSR"}
+}
+
+
+@turn_memoized("airport_codes")
+def get_airport_codes(city):
+    """Returns every airport code of `city` (main airport first), or [] if the city is unknown."""
+    if not city:
+        return []
     city = city.lower()  # Convert input city name to lowercase
-    for location, airports in airports.items():
+    for location, airports in CITY_AIRPORTS.items():
         if location.lower() == city:  # Compare in lowercase
-            return list(airports.values())[0]  # Return the first airport code found
-    return None
+            return list(airports.values())
+    return []
+
+
+def get_airport_code(city):
+    codes = get_airport_codes(city)
+    return codes[0] if codes else None  # Return the first airport code found
 
 def extract_date_time(datetime_str):
     dt_obj = datetime.fromisoformat(datetime_str[:-6])  # Remove timezone offset
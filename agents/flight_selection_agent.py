@@ -1,25 +1,32 @@
 import json
+import logging
 import os
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, TimeoutError as FutureTimeoutError
 from memory.json_memory import JSONMemory
 from dotenv import load_dotenv
-import requests
+from tools.llm_client import chat_completion
+from tools.prompt_registry import register_prompt
+from tools import deadline
+from tools.circuit_breaker import CircuitOpen
+from tools.worker_metrics import counter_family, register_collector
+
+logger = logging.getLogger("flight-selection")
 
 
 # ✅ Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# ✅ Initialize LLM Model
-llm = ChatOpenAI(model="gpt-4o", openai_api_key=OPENAI_API_KEY)
-
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Moves one level up
 DATA_DIR = os.path.join(BASE_DIR, "data")
 
 SELECTED_FLIGHT_FILE = os.path.join(DATA_DIR, "selected_flight.json")
 FLIGHT_LIST_FILE = os.path.join(DATA_DIR, "flight_list.json")
 flight_memory = JSONMemory(os.path.join(DATA_DIR, "flight_search_data.json"))
+flight_list_memory = JSONMemory(FLIGHT_LIST_FILE)
+selected_flight_memory = JSONMemory(SELECTED_FLIGHT_FILE)
 headers = {
     "Accept": "application/json",
     "Content-Type": "application/json",
@@ -27,39 +34,51 @@ headers = {
     "secretecode": os.getenv("SECRET_CODE")
 }
 
-def flight_selection_agent(user_message: str):
-    """
-    Uses LLM (GPT-4) to intelligently select a flight based on user input.
-    Saves selected flight details in `selected_flight.json`.
-    Returns the flight_key and tracking_id.
-    """
+# ✅ Pre-validation of the top-ranked offers right after search
+PREVALIDATE_TOP_N = int(os.getenv("PREVALIDATE_TOP_N", "5"))
+PREVALIDATE_CONCURRENCY = int(os.getenv("PREVALIDATE_CONCURRENCY", "3"))
+PREVALIDATION_TTL = float(os.getenv("PREVALIDATION_TTL", "120"))  # Seconds a validation result stays usable
+PREVALIDATION_WAIT = float(os.getenv("PREVALIDATION_WAIT", "1.5"))  # Max seconds the result list waits for validations
+VALIDATE_TIMEOUT = float(os.getenv("VALIDATE_TIMEOUT", "10"))
+VALIDATION_UNAVAILABLE_MESSAGE = "I can't confirm flight availability right now. Please choose your flight again in a minute."
+STILL_VALIDATING_MESSAGE = "I'm still checking the availability of that flight. Please choose it again in a moment."
 
-    # ✅ Load flight list
-    try:
-        with open(FLIGHT_LIST_FILE, "r") as f:
-            flight_data = json.load(f)
-    except FileNotFoundError:
-        return "❌ No flight data available. Please search for flights first."
+_prevalidation_executor = ThreadPoolExecutor(max_workers=PREVALIDATE_CONCURRENCY, thread_name_prefix="prevalidate")
+_validation_cache = {}  # (flight_key, tracking_id) -> (future of validate_flight(), started_at)
+_validation_lock = threading.Lock()
+prevalidation_stats = {"started": 0, "cache_hits": 0, "cache_misses": 0, "dropped_offers": 0}
 
-    flight_list = flight_data.get("data", [])
-    if not flight_list:
-        return "❌ No flights found."
 
-    # ✅ Extract tracking ID for fallback
-    correct_tracking_id = flight_list[0]["tracking_id"] if flight_list else "UNKNOWN_TRACKING_ID"
+def _count_prevalidation(event, amount=1):
+    # ✅ Updated from the turn thread and the tool threads alike, so under the cache lock
+    with _validation_lock:
+        prevalidation_stats[event] += amount
 
-    # ✅ Prepare System Prompt & Context
-    system_prompt = "You are a flight assistant that selects the best flight based on user queries."
-    context = f"""
-    You are given a list of flights. Select the best flight based on the user’s query.
 
-    **User Query:** "{user_message}"
+def prevalidation_summary():
+    """Returns a consistent copy of the pre-validation counters."""
+    with _validation_lock:
+        return dict(prevalidation_stats)
 
-    **Flight Data:**
-    {json.dumps(flight_list, indent=2)}
+
+def _prevalidation_metrics():
+    return [counter_family(
+        "prevalidation_events_total", "Offer pre-validation events (cache_hits vs cache_misses is the hit ratio)",
+        prevalidation_summary(), "event",
+    )]
+
+
+register_collector(_prevalidation_metrics)
+
+# ✅ Static rules first; the flight list (same for every turn of a search) before the caller's words
+SELECTION_PROMPT = register_prompt(
+    "flight_selection",
+    system="""
+    You are a flight assistant that selects the best flight based on user queries.
+    You are given a list of flights. Select the best flight based on the user’s query.
 
     Your task is to select a flight and return **ONLY a valid JSON** in this format:
-    {{
+    {
         "flight_id": "<selected_flight_id>",
         "tracking_id": "<tracking_id>",
         "flight_key": "<flight_key>",
@@ -69,7 +88,7 @@ def flight_selection_agent(user_message: str):
         "cabin_class": "<cabin_class>",
         "carrier_operating": "<carrier>",
         "connecting_airport": <connecting_airport_list>
-    }}
+    }
 
     **Rules:**
     - If the user says **"first option"**, return the **first flight**.
@@ -78,18 +97,85 @@ def flight_selection_agent(user_message: str):
     - If the user asks for **shortest duration**, return the **fastest flight**.
     - If the user specifies an **airline**, return the flight from that airline.
     - Always return **valid JSON** only. No extra text.
+    """,
+    user="""
+    **Flight Data:**
+    {flight_data}
+
+    **User Query:** "{user_message}"
+    """,
+)
+
+def flight_selection_agent(user_message: str):
+    """
+    Uses LLM (GPT-4) to intelligently select a flight based on user input.
+    Saves selected flight details in `selected_flight.json`.
+    Returns the flight_key and tracking_id.
     """
 
+    # ✅ Load flight list
+    flight_data = flight_list_memory.load_data(shared=True)
+    if not flight_data:
+        return "❌ No flight data available. Please search for flights first."
+
+    flight_list = flight_data.get("data", []) if isinstance(flight_data, dict) else []
+    if not flight_list:
+        return "❌ No flights found."
+
+    # ✅ Extract tracking ID for fallback
+    correct_tracking_id = flight_list[0]["tracking_id"] if flight_list else "UNKNOWN_TRACKING_ID"
+
     # ✅ Generate response using LLM
-    response = llm.invoke([HumanMessage(content=context)])
+    messages = SELECTION_PROMPT.messages(flight_data=json.dumps(flight_list, indent=2), user_message=user_message)
+    response_text = chat_completion(messages, call_site="flight_selection")
     # ✅ Debug: Print raw response to check if it's valid JSON
-    # print("🔍 RAW RESPONSE FROM LLM:", response.content.strip().strip("```json").strip("```"))
+    # print("🔍 RAW RESPONSE FROM LLM:", response_text.strip("```json").strip("```"))
     # ✅ Validate JSON response
     try:
-        selected_flight = json.loads(response.content.strip().strip("```json").strip("```"))
+        selected_flight = json.loads(response_text.strip("```json").strip("```"))
+    except json.JSONDecodeError:
+        return "❌ Error processing flight selection. Invalid JSON format."
+
+    return _finalize_selection(selected_flight)
+
+def select_flight_by_index(index: int):
+    """
+    Selects the flight at `index` (0-based) of the presented list without asking the LLM.
+    Used by the booking flow for ordinal answers like "the second option".
+    """
+    flight_data = flight_list_memory.load_data(shared=True)
+    if not flight_data:
+        return "❌ No flight data available. Please search for flights first."
+
+    flight_list = flight_data.get("data", []) if isinstance(flight_data, dict) else []
+    if not flight_list:
+        return "❌ No flights found."
+    if index < 0 or index >= len(flight_list):
+        return f"❌ There are only {len(flight_list)} flight options. Please choose one of them."
+
+    entry = flight_list[index]
+    flight_filter = entry.get("filter", {})
+    selected_flight = {
+        "flight_id": flight_filter.get("id", entry.get("flight_key")),
+        "tracking_id": entry.get("tracking_id"),
+        "flight_key": entry.get("flight_key"),
+        "price": flight_filter.get("price"),
+        "departure_departure_time": flight_filter.get("departure_departure_time"),
+        "arrival_departure_time": flight_filter.get("arrival_departure_time"),
+        "cabin_class": flight_filter.get("cabin_class"),
+        "carrier_operating": flight_filter.get("carrier_operating"),
+        "connecting_airport": flight_filter.get("connecting_airport") or [],
+    }
+    return _finalize_selection(selected_flight)
+
+def _finalize_selection(selected_flight):
+    """
+    Validates the selected flight, saves it to `selected_flight.json` and formats the answer.
+    """
+    try:
         flight_key = selected_flight.get("flight_key")
         tracking_id = selected_flight.get("tracking_id")
-        validate_flight_response = json.loads(validate_flight(flight_key, tracking_id))
+        validate_flight_response = json.loads(take_validation(flight_key, tracking_id))
         booking_tracking_id = validate_flight_response.get("booking_tracking_id")
         if booking_tracking_id:
             selected_flight["booking_tracking_id"] = booking_tracking_id
@@ -98,12 +184,14 @@ def flight_selection_agent(user_message: str):
             return f"Please select another flight. Reason: {reason}"
     except json.JSONDecodeError:
         return "❌ Error processing flight selection. Invalid JSON format."
+    except deadline.BudgetExhausted:
+        return STILL_VALIDATING_MESSAGE
+    except CircuitOpen:
+        return VALIDATION_UNAVAILABLE_MESSAGE
 
     # ✅ Save selected flight to file
-    os.makedirs(os.path.dirname(SELECTED_FLIGHT_FILE), exist_ok=True)
     if validate_flight_response.get("status") == "success":
-        with open(SELECTED_FLIGHT_FILE, "w") as f:
-            json.dump(selected_flight, f, indent=4)
+        selected_flight_memory.save_data(selected_flight)
 
     return format_flight_details(selected_flight)
 
@@ -133,9 +221,10 @@ def format_flight_details(flight):
     {user_message}
     """
 
-def validate_flight(flight_key, tracking_id):
+def validate_flight(flight_key, tracking_id, bound_to_turn=True):
     """
     Validate the selected flight with the backend system.
+    Pre-validation runs in the background with `bound_to_turn=False`.
     """
     try:
         validate_url = "https://serviceapi.innotraveltech.com/flight/validate"
@@ -150,13 +239,122 @@ def validate_flight(flight_key, tracking_id):
                 }
             ]
         }
-        response = requests.post(validate_url, headers=headers, json=validate_payload)
+        response = deadline.post(
+            validate_url, "flight_validate", cap=VALIDATE_TIMEOUT, bound_to_turn=bound_to_turn,
+            headers=headers, json=validate_payload,
+        )
         response.raise_for_status()
         validate_data = response.json()
 
         return json.dumps(validate_data)
 
+    except (deadline.BudgetExhausted, CircuitOpen):
+        raise
     except Exception as ex:
-        print(f"❌ Exception in validate_flight: {ex}")
+        logger.error("❌ Exception in validate_flight: %s", ex)
         return f"Please select another flight"
 
+
+
+def offer_price(entry):
+    try:
+        return float(entry.get("filter", {}).get("price"))
+    except (TypeError, ValueError):
+        return float("inf")
+
+
+def _offer_key(entry, default_tracking_id=None):
+    return entry.get("flight_key"), entry.get("tracking_id") or default_tracking_id
+
+
+def _is_valid(validate_flight_result):
+    try:
+        return bool(json.loads(validate_flight_result).get("booking_tracking_id"))
+    except (json.JSONDecodeError, AttributeError):
+        return False
+
+
+def _fresh_validation(key):
+    entry = _validation_cache.get(key)
+    if entry is None:
+        return None
+    future, started_at = entry
+    if time.monotonic() - started_at > PREVALIDATION_TTL or (future.done() and future.exception() is not None):
+        del _validation_cache[key]
+        return None
+    return future
+
+
+def prevalidate_offers(flights, top_n=PREVALIDATE_TOP_N):
+    """
+    Starts `/flight/validate` for the `top_n` cheapest offers of a search response in the background.
+    Returns {(flight_key, tracking_id): future}.
+    """
+    data = (flights.get("data") or []) if isinstance(flights, dict) else []
+    default_tracking_id = data[0].get("tracking_id") if data else None
+    futures = {}
+    with _validation_lock:
+        for key in list(_validation_cache):
+            _fresh_validation(key)  # ✅ Drops expired validations of offers nobody asked for again
+        for entry in sorted(data, key=offer_price)[:top_n]:
+            key = _offer_key(entry, default_tracking_id)
+            if not key[0] or not key[1]:
+                continue
+            future = _fresh_validation(key)
+            if future is None:
+                future = _prevalidation_executor.submit(validate_flight, *key, bound_to_turn=False)
+                _validation_cache[key] = (future, time.monotonic())
+                prevalidation_stats["started"] += 1
+            futures[key] = future
+    return futures
+
+
+def drop_failed_offers(flights, timeout=PREVALIDATION_WAIT):
+    """
+    Waits up to `timeout` seconds for the pre-validation of the top offers and returns a copy of
+    `flights` without the offers that failed. Validations still running keep filling the cache.
+    """
+    futures = prevalidate_offers(flights)
+    wait(list(futures.values()), timeout=min(timeout, deadline.remaining(timeout)))
+    # ✅ Offers whose validation could not run (open circuit) are kept, they did not fail
+    failed = {
+        key for key, future in futures.items()
+        if future.done() and future.exception() is None and not _is_valid(future.result())
+    }
+    if not failed:
+        return flights
+
+    data = flights.get("data") or []
+    default_tracking_id = data[0].get("tracking_id") if data else None
+    kept = [entry for entry in data if _offer_key(entry, default_tracking_id) not in failed]
+    _count_prevalidation("dropped_offers", len(data) - len(kept))
+    logger.info("⚠️ Dropped %s offers that failed validation", len(data) - len(kept))
+    return {**flights, "data": kept}
+
+
+def take_validation(flight_key, tracking_id):
+    """
+    Returns the `validate_flight` result for the selected offer, from the pre-validation cache
+    when possible. A cached booking_tracking_id is handed out only once.
+    Raises BudgetExhausted when the turn has no time left to wait for it.
+    """
+    timeout = deadline.call_timeout("flight_validate_wait", cap=VALIDATE_TIMEOUT)
+    with _validation_lock:
+        future = _fresh_validation((flight_key, tracking_id))
+        _validation_cache.pop((flight_key, tracking_id), None)
+
+    if future is not None:
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # ✅ Keep the running validation for the next attempt
+            with _validation_lock:
+                _validation_cache[(flight_key, tracking_id)] = (future, time.monotonic())
+            deadline.record_exhausted("flight_validate_wait")
+            raise deadline.BudgetExhausted("flight_validate_wait")
+        if _is_valid(result):
+            _count_prevalidation("cache_hits")
+            return result
+
+    _count_prevalidation("cache_misses")
+    return validate_flight(flight_key, tracking_id)
@@ -1,11 +1,15 @@
 import json
+import logging
 
 import requests
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
 from memory.json_memory import JSONMemory
 import os
 from dotenv import load_dotenv
+from tools.llm_client import chat_completion
+from tools.prompt_registry import register_prompt
+
+logger = logging.getLogger("language-detection")
+
 load_dotenv()
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Moves one level up
@@ -14,7 +18,11 @@ USER_LOCATION_DATA_FILE = os.path.join(DATA_DIR, "user_location_data.json")
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-llm = ChatOpenAI(model="gpt-4o", openai_api_key=OPENAI_API_KEY)  # OpenAI LLM for validation
+COUNTRY_PROMPT = register_prompt(
+    "get_country_from_text",
+    system="Extract the country name from the location text you are given. Return only the country name.",
+    user="Location text: '{location_text}'",
+)
 
 def get_country_from_text(location_text):
     """
@@ -22,9 +30,7 @@ def get_country_from_text(location_text):
     Uses OpenAI for validation if needed.
     """
     try:
-        prompt = f"Extract the country name from the following location text: '{location_text}'. Return only the country name."
-        response = llm.invoke([HumanMessage(content=prompt)])
-        country_name = response.content.strip()
+        country_name = chat_completion(COUNTRY_PROMPT.messages(location_text=location_text), call_site="get_country_from_text")
         return country_name if country_name else "Unknown"
     except Exception as e:
         return f"Error detecting country: {e}"
@@ -228,17 +234,17 @@ def detect_language_from_text(location_text):
         "country": country,
         "language": language,
     }
-    print(user_location_language)
+    logger.debug("User location and language: %s", user_location_language)
 
     try:
         # ✅ Save new flight data, overwriting previous data
         with open(USER_LOCATION_DATA_FILE, "w") as f:
             json.dump(user_location_language, f, indent=4)
 
-        print("✅ User Location and Language saved!")
+        logger.debug("✅ User Location and Language saved!")
 
     except Exception as e:
-        print(f"❌ Error saving flight data: {e}")
+        logger.error("❌ Error saving flight data: %s", e)
 
     return language
 
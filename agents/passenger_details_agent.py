@@ -1,12 +1,18 @@
 import json
+import logging
 import re
 from memory.json_memory import JSONMemory
 from typing import Optional
-import openai
 import os
 from dotenv import load_dotenv
-import requests
 from datetime import datetime
+from tools.llm_client import chat_completion
+from tools.prompt_registry import register_prompt
+from tools.async_steps import run_step_graph, run_step_graph_sync
+from agents.confirm_booking_agent import update_booking_payload, reset_booking_payload
+
+logger = logging.getLogger("passenger-details")
+
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -39,8 +45,6 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 passenger_memory = JSONMemory(os.path.join(DATA_DIR, "passenger_data.json"))
 flight_memory = JSONMemory(os.path.join(DATA_DIR, "flight_search_data.json"))  # Load flight search data
 
-client = openai.OpenAI()
-
 def get_total_passengers():
     """Retrieves total number of passengers (adults + children) from flight search data."""
     flight_details = flight_memory.load_data() or {}
@@ -48,6 +52,12 @@ def get_total_passengers():
     num_children = flight_details.get("num_children", 0)
     return num_adults + num_children  # Total passengers
 
+def get_required_fields(flight_type: str):
+    """Returns the passenger fields required for the given flight type."""
+    if flight_type == "domestic":
+        return ["title", "gender", "first_name", "last_name", "email", "phone", "dob"]
+    return ["title", "gender", "first_name", "last_name", "email", "phone", "dob", "passport_number", "nationality", "date_of_issue", "date_of_expiry"]
+
 def initialize_passenger_data(total_passengers: int, flight_type: str):
     """
     Initializes the passenger data with `null` or `None` values for all fields.
@@ -84,6 +94,7 @@ def collect_passenger_details(passenger_index: int, flight_type: str, **kwargs):
     total_passengers = get_total_passengers()
     if len(passenger_details.get("passengers", [])) < total_passengers:
         passenger_details["passengers"] = [{} for _ in range(total_passengers)]
+        reset_booking_payload()
 
     # ✅ Ensure passenger_index is within the range
     if passenger_index >= total_passengers:
@@ -93,30 +104,81 @@ def collect_passenger_details(passenger_index: int, flight_type: str, **kwargs):
     passenger_data = passenger_details["passengers"][passenger_index]
 
     # ✅ Define required fields based on flight type
-    if flight_type == "domestic":
-        required_fields = ["title", "gender", "first_name", "last_name", "email", "phone", "dob"]
-    else:
-        required_fields = ["title", "gender", "first_name", "last_name", "email", "phone", "dob", "passport_number", "nationality", "date_of_issue", "date_of_expiry"]
+    required_fields = get_required_fields(flight_type)
 
-    # ✅ Update fields only if new values are provided
+    # ✅ Update fields only if new values are provided and valid
+    accepted_fields = {}
+    invalid_messages = []
     for field in required_fields:
         if kwargs.get(field):
+            error = validate_passenger_field(field, kwargs[field])
+            if error:
+                invalid_messages.append(error)
+                continue
             passenger_data[field] = kwargs[field]
+            accepted_fields[field] = kwargs[field]
 
-    # ✅ Save the updated passenger details
+    # ✅ Save the updated passenger details and keep the booking payload in step
     passenger_memory.save_data(passenger_details)
+    update_booking_payload(passenger_index, total_passengers, accepted_fields)
 
     # ✅ Identify missing fields
     missing_fields = [field for field in required_fields if not passenger_data.get(field)]
+    invalid_note = f"⚠️ {' '.join(invalid_messages)}\n" if invalid_messages else ""
 
     if not missing_fields:
         passenger_summary = _get_summary(passenger_data)
-        return f"🛂 {passenger_summary}"
+        return f"{invalid_note}🛂 {passenger_summary}"
+
+    return f"{invalid_note}📝 Almost done! Please provide: {', '.join(missing_fields)} for Passenger {passenger_index + 1}."
 
-    return f"📝 Almost done! Please provide: {', '.join(missing_fields)} for Passenger {passenger_index + 1}."
+def _parse_date(value):
+    try:
+        return datetime.strptime(str(value).strip(), "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+def validate_passenger_field(field, value):
+    """Returns a short message when `value` is not acceptable for `field`, otherwise None."""
+    value = str(value).strip()
+    today = datetime.now().date()
+
+    if field == "email" and not re.fullmatch(EMAIL_PATTERN, value):
+        return f"The email address {value} does not look valid."
+    if field == "phone" and not 7 <= len(re.sub(r"[\s+()-]", "", value)) <= 15:
+        return f"The phone number {value} does not look valid."
+    if field == "title" and value.rstrip(".").lower() not in ("mr", "mrs", "ms", "miss", "mstr", "dr"):
+        return f"The title {value} is not supported, please say Mr or Ms."
+    if field == "gender" and value.lower() not in ("male", "female", "other"):
+        return f"The gender {value} is not recognised."
+    if field in ("dob", "date_of_issue", "date_of_expiry"):
+        date_value = _parse_date(value)
+        if date_value is None:
+            return f"The {field.replace('_', ' ')} must be in YYYY-MM-DD format."
+        if field in ("dob", "date_of_issue") and date_value > today:
+            return f"The {field.replace('_', ' ')} cannot be in the future."
+        if field == "date_of_expiry" and date_value <= today:
+            return "The passport has expired, please provide a valid passport."
+    if field == "passport_number" and not re.fullmatch(r"[A-Za-z0-9]{5,20}", value):
+        return f"The passport number {value} does not look valid."
+    return None
 
 def extract_passenger_details(text):
     """Extracts passenger details (name, email, phone, passport number, etc.) from text."""
+    details = _extract_passenger_fields(text)
+    steps, cancel_rules = _name_analysis_steps(details)
+    results = run_step_graph_sync(steps, cancel_rules) if steps else {}
+    return _complete_title_and_gender(details, results)
+
+async def extract_passenger_details_async(text):
+    """Async variant of `extract_passenger_details`; title and gender lookups run concurrently."""
+    details = _extract_passenger_fields(text)
+    steps, cancel_rules = _name_analysis_steps(details)
+    results = await run_step_graph(steps, cancel_rules) if steps else {}
+    return _complete_title_and_gender(details, results)
+
+def _extract_passenger_fields(text):
+    """Regex-only part of the extraction; title and gender may still be missing afterwards."""
     first_name, last_name, email, phone, passport = None, None, None, None, None
     title, gender, dob, nationality, date_of_issue, date_of_expiry = None, None, None, None, None, None
 
@@ -134,11 +196,6 @@ def extract_passenger_details(text):
         first_name = name_match.group(2).strip()
         last_name = name_match.group(3).strip()
 
-    if title is None or title == "" or title == "null" or title == "Unknown":
-        title = _analyze_title(first_name)
-
-
-
     # Extract email
     email_match = re.search(EMAIL_PATTERN, text)
     if email_match:
@@ -163,9 +220,6 @@ def extract_passenger_details(text):
     if gender_match:
         gender = gender_match.group(0)
 
-    if gender is None or gender == "" or gender == "null" or gender == "Unknown":
-        gender = _analyze_gender(first_name)
-
     # Extract date of birth (dob) in YYYY-MM-DD format
     dob_match = re.search(r"\b(\d{4}-\d{2}-\d{2})\b", text)
     if dob_match:
@@ -180,8 +234,8 @@ def extract_passenger_details(text):
     return {
         "title": title,
         "gender": gender,
-        "first_name": clean_text(first_name),
-        "last_name": clean_text(last_name),
+        "first_name": first_name,
+        "last_name": last_name,
         "email": email,
         "phone": phone,
         "dob": dob,
@@ -191,66 +245,122 @@ def extract_passenger_details(text):
         "date_of_expiry": date_of_expiry
     }
 
-def _analyze_title(first_name):
+def _is_missing(value):
+    return value is None or value == "" or value == "null" or value == "Unknown"
+
+def _name_analysis_steps(details):
     """
-    Determines the title (Mr./Ms.) based on the first name using GPT-4.
+    GPT lookups still needed for title and gender. Either answer implies the other,
+    so whichever finishes first cancels the remaining one.
     """
-    if not first_name or first_name.strip() == "":
-        return "Mr."  # Default to Mr. if name is missing or blank
-
-    prompt = (
-        f"Determine whether the following first name belongs to a male or female: {first_name}.\n"
-        "Respond only with 'Mr.' for male names and 'Ms.' for female names. "
-        "If uncertain, respond with 'Mr.'."
-    )
-
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "system", "content": prompt}],
-            max_tokens=5,
-            temperature=0.5,
-        )
-        title = response.choices[0].message.content.strip()
-        return title if title in {"Mr.", "Ms."} else "Mr."  # Default to Mr. if uncertain
-    except Exception as e:
-        print(f"Error in _analyze_title: {e}")
-        return "Mr."  # Fallback to Mr. if GPT fails
-
-def _analyze_gender(name):
-    prompt = f"""
+    first_name = details["first_name"]
+    title_missing = _is_missing(details["title"]) and _is_missing(_title_from_gender(details["gender"]))
+    gender_missing = _is_missing(details["gender"]) and _is_missing(_gender_from_title(details["title"]))
+
+    steps = {}
+    if title_missing:
+        steps["title"] = (lambda results: _analyze_title(first_name), [])
+    if gender_missing:
+        steps["gender"] = (lambda results: _analyze_gender(first_name), [])
+    cancel_rules = {
+        "title": lambda results: ["gender"],
+        "gender": lambda results: ["title"],
+    }
+    return steps, cancel_rules
+
+def _complete_title_and_gender(details, results):
+    title = details["title"] if not _is_missing(details["title"]) else results.get("title")
+    gender = details["gender"] if not _is_missing(details["gender"]) else results.get("gender")
+    if _is_missing(title):
+        title = _title_from_gender(gender) or "Mr."
+    if _is_missing(gender):
+        gender = _gender_from_title(title) or "male"
+
+    details = dict(details)
+    details.update({
+        "title": title,
+        "gender": gender,
+        "first_name": clean_text(details["first_name"]),
+        "last_name": clean_text(details["last_name"]),
+    })
+    return details
+
+def _title_from_gender(gender):
+    return {"male": "Mr.", "female": "Ms."}.get((gender or "").lower())
+
+def _gender_from_title(title):
+    return {"mr": "male", "ms": "female", "mrs": "female"}.get((title or "").lower().rstrip("."))
+
+TITLE_PROMPT = register_prompt(
+    "analyze_title",
+    system="""
+    Determine whether the first name you are given belongs to a male or female.
+    Respond only with 'Mr.' for male names and 'Ms.' for female names. If uncertain, respond with 'Mr.'.
+    """,
+    user="First name: {first_name}",
+)
+
+GENDER_PROMPT = register_prompt(
+    "analyze_gender",
+    system="""
+    You analyze names and return gender as structured JSON.
     You are an expert in name-based gender identification.
 
-    - Determine the gender of the given name: '{name}'.
+    - Determine the gender of the given name.
     - If the name is commonly associated with males, return `"male"`.
     - If the name is commonly associated with females, return `"female"`.
     - If the name is gender-neutral or ambiguous, **still choose either "male" or "female"** based on the closest match.
     - **Never return "unknown".**
     - **Strictly return only JSON, no explanations.**
 
-    **Output must be a strict JSON object:**  
+    **Output must be a strict JSON object:**
     Example:
-    {{"gender": "male"}}
+    {"gender": "male"}
+    """,
+    user="Name: '{name}'",
+)
+
+SUMMARY_PROMPT = register_prompt(
+    "passenger_summary",
+    system="""
+    You generate structured passenger summaries in a professional format.
+    Given the passenger details, generate a structured and concise summary.
+    Format the summary professionally, including the title, full name, gender, email, phone number, date of birth,
+    and age (calculated based on the current year). The output should be clear and readable.
+    End with: ✅  To confirm the booking please write 'Confirm my flight ticket'
+    """,
+    user="""
+    Passenger Data:
+    {passenger_data}
+    """,
+)
+
+def _analyze_title(first_name):
+    """
+    Determines the title (Mr./Ms.) based on the first name using GPT-4.
     """
+    if not first_name or first_name.strip() == "":
+        return "Mr."  # Default to Mr. if name is missing or blank
+
+    try:
+        title = chat_completion(TITLE_PROMPT.messages(first_name=first_name), call_site="analyze_title")
+        return title if title in {"Mr.", "Ms."} else "Mr."  # Default to Mr. if uncertain
+    except Exception as e:
+        logger.error("Error in _analyze_title: %s", e)
+        return "Mr."  # Fallback to Mr. if GPT fails
 
+def _analyze_gender(name):
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You analyze names and return gender as structured JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=10,
-            temperature=0.5,
+        response_data = chat_completion(
+            GENDER_PROMPT.messages(name=name),
+            call_site="analyze_gender",
             # response_format={"type": "json_object"},  # ✅ Fixed: Changed "json" to "json_object"
         )
-
-        response_data = response.choices[0].message.content  # Since response_format is JSON, it's already a dict
         response_data = json.loads(response_data)
         return response_data.get("gender", "male")  # Default fallback is "male" if anything goes wrong
 
-    except openai.OpenAIError as e:
-        print(f"OpenAI API Error: {e}")
+    except Exception as e:
+        logger.error("OpenAI API Error: %s", e)
         return "male"  # Fallback for API errors
 
 def clean_text(text):
@@ -338,30 +448,11 @@ def _get_summary(passenger_data):
     #     print(f"Error: {response.status_code}, {response.text}")
     #     return None
 
-    prompt = f"""Given the following passenger details, generate a structured and concise summary.
-    Format the summary professionally, including the title, full name, gender, email, phone number, date of birth,
-    and age (calculated based on the current year). The output should be clear and readable.
-
-    Passenger Data:
-    {passenger_data}
-    
-    ✅  To confirm the booking please write 'Confirm my flight ticket'
-    """
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You generate structured passenger summaries in a professional format."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=150,  # Adjusted for complete output
-        temperature=0.5
-    )
-
     try:
-        response_data = response.choices[0].message.content.strip()
+        response_data = chat_completion(SUMMARY_PROMPT.messages(passenger_data=passenger_data), call_site="passenger_summary")
         return response_data
     except Exception as e:
-        print(f"Error generating summary: {e}")
+        logger.error("Error generating summary: %s", e)
         return None
 
 def main():
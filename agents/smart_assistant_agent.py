@@ -52,34 +52,30 @@
 ################################ Version 2 ######################################
 import json
 import os
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from langchain.memory import ChatMessageHistory  # 🧠 Adding memory for context retention
 from dotenv import load_dotenv
+from tools.llm_client import chat_completion, stream_chat_completion
+from tools.prompt_registry import register_prompt
 
 # ✅ Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+SMART_ASSISTANT_HISTORY = int(os.getenv("SMART_ASSISTANT_HISTORY", "20"))  # Messages kept (and sent to the LLM)
 
-# ✅ Initialize LLM Model & Memory
-llm = ChatOpenAI(model="gpt-4o", openai_api_key=OPENAI_API_KEY)
+# ✅ Initialize Memory (one caller per worker process: reset at the start of every call)
 memory = ChatMessageHistory()
 
 
-def smart_assistant_agent(user_message: str, user_id: str, previous_fallback: bool = False):
-    """
-    An intelligent assistant that remembers past conversations, provides refined responses,
-    and helps users with both general and travel-related queries.
+def reset_memory():
+    """Forgets the previous caller's session."""
+    memory.clear()
 
-    - Uses memory to track session history.
-    - Provides better responses based on previous interactions.
-    """
 
-    # ✅ Retrieve past conversation history (if any)
-    past_conversations = memory.messages
-
-    # ✅ Construct System Prompt with Memory Awareness
-    system_prompt = f"""
+# ✅ Static instructions first; the session history only grows at its end, then the new input
+SMART_ASSISTANT_PROMPT = register_prompt(
+    "smart_assistant",
+    system="""
     You are a highly intelligent AI assistant that remembers user interactions.
     Your responses should be informative, engaging, and personalized.
 
@@ -94,30 +90,72 @@ def smart_assistant_agent(user_message: str, user_id: str, previous_fallback: bo
     - If the user has received a fallback before, refine the answer with more details.
     - If the user seems confused, reassure them and guide them towards possible questions.
 
-    **Past Conversation History:**
-    {past_conversations}
-
     **Guidelines:**
     - Keep responses natural, friendly, and engaging.
     - If you don't understand, ask for clarification while suggesting related topics.
     - If discussing travel, recall past preferences (e.g., user mentioned "Japan" before, so suggest Japanese destinations).
     - Provide refined answers if the user previously received a fallback response.
-    """
+    """,
+    user="""
+    **Past Conversation History:**
+    {past_conversations}
 
-    # ✅ User Prompt with Context Awareness
-    user_prompt = f"""
     **User Input:** "{user_message}"
-    {"(The user previously encountered a fallback, so provide a better response.)" if previous_fallback else ""}
-    """
+    {fallback_note}
+    """,
+)
 
-    # ✅ Generate AI response using LLM
-    response = llm.invoke([HumanMessage(content=system_prompt + "\n\n" + user_prompt)])
 
+def _smart_assistant_messages(user_message: str, previous_fallback: bool = False):
+    """Builds the LLM messages for `user_message`, including the session history."""
+
+    # ✅ Retrieve past conversation history (if any)
+    past_conversations = memory.messages
+
+    return SMART_ASSISTANT_PROMPT.messages(
+        past_conversations=past_conversations,
+        user_message=user_message,
+        fallback_note="(The user previously encountered a fallback, so provide a better response.)" if previous_fallback else "",
+    )
+
+
+def _remember(user_message: str, response_text: str):
     # ✅ Save user interaction into memory
     # memory.save_context({"user_id": user_id}, {"chat_history": response.content.strip()})
     # ✅ Save user interaction into memory (FIXED)
     memory.add_message(HumanMessage(content=user_message))  # ✅ Save user input
-    memory.add_message(HumanMessage(content=response.content.strip()))  # ✅ Save bot response
+    memory.add_message(HumanMessage(content=response_text))  # ✅ Save bot response
+    del memory.messages[:-SMART_ASSISTANT_HISTORY]  # ✅ Bounded, also within a long call
+
+
+def smart_assistant_agent(user_message: str, user_id: str, previous_fallback: bool = False):
+    """
+    An intelligent assistant that remembers past conversations, provides refined responses,
+    and helps users with both general and travel-related queries.
+
+    - Uses memory to track session history.
+    - Provides better responses based on previous interactions.
+    """
+
+    # ✅ Generate AI response using LLM
+    response_text = chat_completion(_smart_assistant_messages(user_message, previous_fallback), call_site="smart_assistant")
+
+    _remember(user_message, response_text)
     # ✅ Return AI-generated response
-    return response.content.strip()
+    return response_text
+
+
+async def smart_assistant_agent_stream(user_message: str, user_id: str, previous_fallback: bool = False):
+    """
+    Streaming variant of smart_assistant_agent for the voice pipeline: yields the answer token by token.
+    What was generated is remembered, also when the caller interrupts the answer.
+    """
+    tokens = []
+    try:
+        async for token in stream_chat_completion(_smart_assistant_messages(user_message, previous_fallback), call_site="smart_assistant"):
+            tokens.append(token)
+            yield token
+    finally:
+        if tokens:
+            _remember(user_message, "".join(tokens).strip())
 
@@ -1,8 +1,13 @@
+import logging
 import os
 import json
+import time
 import chromadb
 import numpy as np
 from langchain_community.embeddings import OpenAIEmbeddings
+from tools.turn_memo import memoize, invalidate
+
+logger = logging.getLogger("json-memory")
 # from db_driver import DatabaseDriver, PassengerDetails  # Import DB Driver
 # from vector_db import store_in_vector_db  # Import VectorDB Storage
 
@@ -10,6 +15,7 @@ from langchain_community.embeddings import OpenAIEmbeddings
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Moves one level up
 DATA_DIR = os.path.join(BASE_DIR, "data")  # Ensure JSON memory & ChromaDB store here
 CHROMA_DB_PATH = os.path.join(DATA_DIR, "chromadb_store")  # Store ChromaDB inside "data"
+CHAT_HISTORY_MAX_DOCS = int(os.getenv("CHAT_HISTORY_MAX_DOCS", "5000"))  # Oldest conversations are pruned beyond this
 
 # ✅ Ensure 'data' directory exists
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -22,8 +28,9 @@ collection = chroma_client.get_or_create_collection(name="chat_history")
 class JSONMemory:
     """Handles JSON storage for chatbot conversation and tasks."""
 
-    def __init__(self, filename):
+    def __init__(self, filename, indent=4):
         self.filename = os.path.join(DATA_DIR, filename)  # Save JSON inside "data"
+        self.indent = indent  # None writes compact JSON (large files such as the flight list)
         self.ensure_directory_exists()
         # self.db = DatabaseDriver()
 
@@ -31,23 +38,33 @@ class JSONMemory:
         """Ensures the directory of the file exists."""
         os.makedirs(DATA_DIR, exist_ok=True)
 
-    def load_data(self):
-        """Loads JSON data from file."""
+    def load_data(self, shared=False):
+        """
+        Loads JSON data from file, at most once per caller turn.
+        `shared=True` skips the defensive copy for read-only callers of large files.
+        """
+        return memoize(self._memo_namespace(), (), self._read_file, copy_result=not shared)
+
+    def _memo_namespace(self):
+        return f"json_file:{self.filename}"
+
+    def _read_file(self):
         if os.path.exists(self.filename):
             try:
                 with open(self.filename, "r", encoding="utf-8") as f:
                     return json.load(f)
             except json.JSONDecodeError:
-                print("⚠️ Warning: JSON file is corrupted or empty. Resetting data.")
+                logger.warning("⚠️ Warning: JSON file is corrupted or empty. Resetting data.")
                 return {}
         return {}
 
     def save_data(self, data):
         """Saves data to JSON file."""
+        invalidate(self._memo_namespace())
         try:
             with open(self.filename, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4)
-            print(f"✅ Data successfully saved to {self.filename}")
+                json.dump(data, f, indent=self.indent)
+            logger.debug("✅ Data successfully saved to %s", self.filename)
 
             # # ✅ Corrected: Use `self.filename` instead of `self.file_path`
             # if "flight_search" in self.filename:
@@ -62,7 +79,7 @@ class JSONMemory:
             # print(f"✅ Data saved to VectorDB.")
 
         except Exception as e:
-            print(f"❌ Error saving data: {e}")
+            logger.error("❌ Error saving data: %s", e)
 
     def save_necessary_data(self, new_data):
         """Merges new data with existing data and saves to JSON file."""
@@ -80,7 +97,7 @@ class JSONMemory:
     def clear_data(self):
         """Clears the JSON file content."""
         self.save_data({})
-        print(f"🗑️ Data in {self.filename} has been cleared.")
+        logger.debug("🗑️ Data in %s has been cleared.", self.filename)
 
 
 def store_in_vector_db(user_id, user_message, bot_response):
@@ -92,12 +109,28 @@ def store_in_vector_db(user_id, user_message, bot_response):
 
     conversation_text = f"User: {user_message} | Bot: {bot_response}"
 
+    # ✅ Time-based IDs: numbering by the collection size loaded every stored document on each call
     collection.add(
         documents=[conversation_text],
-        metadatas=[{"user_id": user_id}],
-        ids=[str(user_id) + "_" + str(len(collection.get()["ids"]))]
+        metadatas=[{"user_id": user_id, "ts": time.time()}],
+        ids=[f"{user_id}_{time.time_ns()}"]
     )
-    print(f"✅ Conversation stored in ChromaDB at {CHROMA_DB_PATH}")
+    logger.debug("✅ Conversation stored in ChromaDB at %s", CHROMA_DB_PATH)
+    if collection.count() > CHAT_HISTORY_MAX_DOCS:
+        prune_vector_db()
+
+
+def prune_vector_db(max_docs=CHAT_HISTORY_MAX_DOCS):
+    """
+    Deletes the oldest conversations down to 90% of `max_docs`, so pruning (which loads the
+    metadata of the whole collection) runs once per 10% of growth, not on every insert.
+    """
+    existing = collection.get(include=["metadatas"])
+    ordered = sorted(zip(existing["ids"], existing["metadatas"]), key=lambda item: (item[1] or {}).get("ts", 0))
+    excess = len(ordered) - int(max_docs * 0.9)
+    if excess > 0:
+        collection.delete(ids=[doc_id for doc_id, _ in ordered[:excess]])
+        logger.info("🧹 Pruned %s old conversations from ChromaDB", excess)
 
 
 def search_conversation(query):
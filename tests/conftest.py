@@ -0,0 +1,27 @@
+import os
+import sys
+import pytest
+
+# ✅ Tests import the agents the way agent.py does, from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeMemory:
+    """In-memory stand-in for JSONMemory."""
+
+    def __init__(self, data=None):
+        self.data = data or {}
+        self.saves = 0
+
+    def load_data(self, shared=False):
+        return self.data
+
+    def save_data(self, data):
+        self.data = data
+        self.saves += 1
+
+
+@pytest.fixture
+def fake_memory():
+    """Factory for FakeMemory instances, to monkeypatch over a module's JSONMemory."""
+    return FakeMemory
@@ -0,0 +1,145 @@
+import pytest
+from agents import booking_flow_agent as flow
+from agents.booking_flow_agent import (
+    STAGE_SEARCH_SLOTS,
+    STAGE_RESULTS,
+    STAGE_SELECTION,
+    STAGE_PASSENGER_DETAILS,
+    STAGE_CONFIRM,
+    STAGE_PAYMENT,
+)
+
+SLOTS = {"origin": "Dhaka", "destination": "Cox's Bazar", "date_of_travel": "2030-01-10", "journey_type": "one_way"}
+PASSENGER = {
+    "title": "Mr.", "gender": "male", "first_name": "Rahim", "last_name": "Uddin",
+    "email": "rahim@example.com", "phone": "01712345678", "dob": "1990-05-01",
+}
+
+
+@pytest.fixture
+def memories(monkeypatch, fake_memory):
+    fakes = {
+        "flight_memory": fake_memory(),
+        "flight_list_memory": fake_memory(),
+        "passenger_memory": fake_memory(),
+        "selected_flight_memory": fake_memory(),
+        "booking_status_memory": fake_memory(),
+    }
+    for name, fake in fakes.items():
+        monkeypatch.setattr(flow, name, fake)
+    monkeypatch.setattr(flow, "flow_stats", {"deterministic_turns": 0, "llm_routed_turns": 0, "completed_bookings": 0})
+    monkeypatch.setattr(flow, "_completed_booking_ids", set())
+    return fakes
+
+
+def _set_state(memories, flight_details=None, flight_list=None, passengers=None, selected=None, status=None):
+    memories["flight_memory"].data = flight_details or {}
+    memories["flight_list_memory"].data = {"data": flight_list} if flight_list else {}
+    memories["passenger_memory"].data = {"passengers": passengers} if passengers is not None else {}
+    memories["selected_flight_memory"].data = selected or {}
+    memories["booking_status_memory"].data = status or {}
+
+
+@pytest.mark.parametrize("state, expected", [
+    ({}, STAGE_SEARCH_SLOTS),
+    ({"flight_details": {**SLOTS, "destination": None}}, STAGE_SEARCH_SLOTS),
+    ({"flight_details": SLOTS}, STAGE_RESULTS),
+    ({"flight_details": SLOTS, "flight_list": [{"id": 1}]}, STAGE_SELECTION),
+    ({"flight_details": SLOTS, "flight_list": [{"id": 1}], "selected": {"booking_tracking_id": "T1"}}, STAGE_PASSENGER_DETAILS),
+    (
+        {"flight_details": SLOTS, "flight_list": [{"id": 1}], "selected": {"booking_tracking_id": "T1"},
+         "passengers": [{**PASSENGER, "email": None}]},
+        STAGE_PASSENGER_DETAILS,
+    ),
+    (
+        {"flight_details": {**SLOTS, "num_adults": 2}, "flight_list": [{"id": 1}], "selected": {"booking_tracking_id": "T1"},
+         "passengers": [PASSENGER]},
+        STAGE_PASSENGER_DETAILS,
+    ),
+    (
+        {"flight_details": SLOTS, "flight_list": [{"id": 1}], "selected": {"booking_tracking_id": "T1"},
+         "passengers": [PASSENGER]},
+        STAGE_CONFIRM,
+    ),
+    (
+        {"flight_details": SLOTS, "flight_list": [{"id": 1}], "selected": {"booking_tracking_id": "T1"},
+         "passengers": [PASSENGER], "status": {"booking_tracking_id": "OLD"}},
+        STAGE_CONFIRM,
+    ),
+    (
+        {"flight_details": SLOTS, "flight_list": [{"id": 1}], "selected": {"booking_tracking_id": "T1"},
+         "passengers": [PASSENGER], "status": {"booking_tracking_id": "T1", "payment_link": "https://pay"}},
+        STAGE_PAYMENT,
+    ),
+])
+def test_booking_stage(memories, state, expected):
+    _set_state(memories, **state)
+    assert flow.get_booking_stage() == expected
+
+
+def test_booking_stage_does_not_count_bookings(memories):
+    _set_state(
+        memories, flight_details=SLOTS, flight_list=[{"id": 1}], selected={"booking_tracking_id": "T1"},
+        passengers=[PASSENGER], status={"booking_tracking_id": "T1"},
+    )
+    for _ in range(3):
+        assert flow.get_booking_stage() == STAGE_PAYMENT
+    assert flow.flow_stats["completed_bookings"] == 0
+
+
+def test_completed_booking_counted_once_per_booking(memories):
+    flow._record_completed_booking("T1")
+    flow._record_completed_booking("T1")
+    flow._record_completed_booking("T2")
+    assert flow.flow_stats["completed_bookings"] == 2
+
+
+@pytest.mark.parametrize("user_input, confirms", [
+    ("yes", True),
+    ("Yes please, go ahead", True),
+    ("confirm", True),
+    ("book it", True),
+    ("yes, no changes, confirm", True),
+    ("confirm, I can't wait", True),
+    ("sure, do not wait for me", True),
+    ("no", False),
+    ("No, don't book it", False),
+    ("not yet", False),
+    ("wait, yes", False),
+    ("hold on, confirm later", False),
+    ("um, no thanks", False),
+    ("I don't want to confirm", False),
+    ("cancel it, yes", False),
+    ("change the date, then confirm", False),
+    ("what is the baggage allowance?", False),
+])
+def test_confirm_patterns(monkeypatch, user_input, confirms):
+    monkeypatch.setattr(flow, "confirm_booking_agent", lambda: "confirmed")
+    assert (flow._handle_confirm(user_input) == "confirmed") is confirms
+
+
+@pytest.mark.parametrize("user_input, index", [
+    ("the first one", 0),
+    ("second option please", 1),
+    ("I'll take the 3rd flight", 2),
+    ("option two", 1),
+    ("flight number 4", 3),
+    ("flight 5", 4),
+    ("the cheapest one", None),
+    ("one adult", None),
+])
+def test_selection_pattern(monkeypatch, user_input, index):
+    monkeypatch.setattr(flow, "select_flight_by_index", lambda position: position)
+    assert flow._handle_selection(user_input) == index
+
+
+@pytest.mark.parametrize("user_input, asks_for_payment", [
+    ("send me the payment link", True),
+    ("how do I pay?", True),
+    ("link please", True),
+    ("thank you", False),
+])
+def test_payment_pattern(memories, user_input, asks_for_payment):
+    memories["booking_status_memory"].data = {"booking_tracking_id": "T1", "payment_link": "https://pay"}
+    response = flow._handle_payment(user_input)
+    assert (response is not None and "https://pay" in response) is asks_for_payment
@@ -0,0 +1,145 @@
+import pytest
+import requests
+from tools import circuit_breaker, deadline
+from tools.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+class FakeClock:
+    """Replaces the `time` module of circuit_breaker so the window and open period can be stepped."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("supplier", window=30, min_calls=4, error_rate=0.5, slow_call=8, slow_rate=0.8, open_seconds=15)
+
+
+def run(breaker, ok, duration=0.1):
+    breaker.before_call()
+    breaker.record(ok, duration)
+
+
+def _raise(error):
+    raise error
+
+
+def trip(breaker):
+    for ok in (True, True, False, False):
+        run(breaker, ok)
+
+
+def test_failures_below_min_calls_keep_it_closed(breaker):
+    for _ in range(3):
+        run(breaker, False)
+    assert breaker.state == CLOSED
+
+
+def test_error_rate_opens_it_and_calls_fail_fast(breaker):
+    trip(breaker)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    assert breaker.snapshot()["rejected"] == 1
+
+
+def test_slow_successes_open_it(breaker):
+    for _ in range(4):
+        run(breaker, True, duration=9)
+    assert breaker.state == OPEN
+
+
+def test_failures_outside_the_window_are_forgotten(breaker, clock):
+    run(breaker, False)
+    run(breaker, False)
+    clock.now += 31
+    for ok in (True, False, True, True):
+        run(breaker, ok)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_a_single_probe_through(breaker, clock):
+    trip(breaker)
+    clock.now += 14
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    clock.now += 1
+    breaker.before_call()  # The probe
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()  # Everyone else still fails fast while the probe runs
+
+
+def test_successful_probe_closes_it_with_a_fresh_window(breaker, clock):
+    trip(breaker)
+    clock.now += 15
+    run(breaker, True)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["window_calls"] == 0
+    run(breaker, False)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_it_for_another_period(breaker, clock):
+    trip(breaker)
+    clock.now += 15
+    run(breaker, False)
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["opened"] == 2
+    clock.now += 14
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+
+def test_call_counts_failed_results_and_exceptions(breaker):
+    breaker.call(lambda: 503, is_failure=lambda status: status >= 500)
+    with pytest.raises(ConnectionError):
+        breaker.call(_raise, ConnectionError("reset"))
+    assert breaker.snapshot()["failures"] == 2
+    assert breaker.call(lambda: 200, is_failure=lambda status: status >= 500) == 200
+    assert breaker.snapshot()["failures"] == 2
+
+
+def test_exceptions_excluded_by_is_error_release_the_probe(breaker, clock):
+    trip(breaker)
+    clock.now += 15
+    with pytest.raises(TimeoutError):
+        breaker.call(_raise, TimeoutError("cut short"), is_error=lambda e: False)
+    assert breaker.state == HALF_OPEN
+    assert breaker.snapshot()["failures"] == 2
+    assert breaker.call(lambda: "ok") == "ok"  # The probe may be retried
+    assert breaker.state == CLOSED
+
+
+def test_timeouts_shortened_by_the_turn_budget_are_not_breaker_failures(monkeypatch):
+    def timed_out(url, timeout, **kwargs):
+        raise requests.Timeout("read timed out")
+
+    monkeypatch.setattr(deadline.requests, "post", timed_out)
+    breaker = circuit_breaker.get_breaker("test_budget_timeout")
+    deadline.start_deadline(budget=5)
+    try:
+        with pytest.raises(requests.Timeout):
+            deadline.post("https://supplier.test", "test_budget_timeout", cap=30)
+    finally:
+        deadline.clear_deadline()
+    assert breaker.snapshot()["failures"] == 0
+
+    with pytest.raises(requests.Timeout):
+        deadline.post("https://supplier.test", "test_budget_timeout", cap=30)  # No turn: the full cap
+    assert breaker.snapshot()["failures"] == 1
@@ -0,0 +1,119 @@
+import pytest
+from agents import confirm_booking_agent as confirm
+from agents.confirm_booking_agent import BookingOutcomeUnknown, BookingStepError, STILL_BOOKING_MESSAGE
+
+CONTEXT = {
+    "booking_tracking_id": "T1",
+    "passenger_data": [],
+    "selected_flight_info": {"booking_tracking_id": "T1"},
+    "name": "Rahim Uddin",
+    "email": "rahim@example.com",
+    "contact": "01712345678",
+}
+RESULTS = {"payload": {"passengers": []}, "update_travelers": "success"}
+BOOKING = {"status": "success", "booking_id": "B-100"}
+
+
+class Supplier:
+    """Scripted create-booking and booking-lookup endpoints that record their calls."""
+
+    def __init__(self):
+        self.create_outcomes = []
+        self.lookup_outcomes = []
+        self.calls = []
+
+    def create_booking(self, payload, booking_tracking_id, email, contact):
+        self.calls.append("create")
+        return self._next(self.create_outcomes)
+
+    def lookup_booking(self, booking_tracking_id):
+        self.calls.append("lookup")
+        return self._next(self.lookup_outcomes)
+
+    @staticmethod
+    def _next(outcomes):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def supplier(monkeypatch, fake_memory):
+    scripted = Supplier()
+    monkeypatch.setattr(confirm, "booking_workflow_memory", fake_memory())
+    monkeypatch.setattr(confirm, "create_booking", scripted.create_booking)
+    monkeypatch.setattr(confirm, "lookup_booking", scripted.lookup_booking)
+    return scripted
+
+
+def create_step():
+    step, _ = confirm.booking_workflow_steps(CONTEXT)["create_booking"]
+    return step
+
+
+def unknown_outcome():
+    return BookingOutcomeUnknown(STILL_BOOKING_MESSAGE)
+
+
+def test_created_booking_is_reused_on_the_next_attempt(supplier):
+    supplier.create_outcomes = [BOOKING]
+    assert create_step()(RESULTS) == BOOKING
+    assert create_step()(RESULTS) == BOOKING
+    assert supplier.calls == ["create"]
+
+
+def test_unknown_outcome_is_resolved_by_lookup_not_by_creating_again(supplier):
+    supplier.create_outcomes = [unknown_outcome()]
+    supplier.lookup_outcomes = [BOOKING]
+    with pytest.raises(BookingOutcomeUnknown):
+        create_step()(RESULTS)
+    assert confirm._is_pending("T1", "create_booking")
+
+    assert create_step()(RESULTS) == BOOKING
+    assert supplier.calls == ["create", "lookup"]
+    assert not confirm._is_pending("T1", "create_booking")
+
+    assert create_step()(RESULTS) == BOOKING  # Checkpointed now, no further supplier calls
+    assert supplier.calls == ["create", "lookup"]
+
+
+def test_unknown_outcome_without_a_booking_creates_it_once_more(supplier):
+    supplier.create_outcomes = [unknown_outcome(), BOOKING]
+    supplier.lookup_outcomes = [None]
+    with pytest.raises(BookingOutcomeUnknown):
+        create_step()(RESULTS)
+    assert create_step()(RESULTS) == BOOKING
+    assert supplier.calls == ["create", "lookup", "create"]
+
+
+def test_failed_lookup_never_creates_the_booking_again(supplier):
+    supplier.create_outcomes = [unknown_outcome()]
+    supplier.lookup_outcomes = [unknown_outcome(), unknown_outcome()]
+    with pytest.raises(BookingOutcomeUnknown):
+        create_step()(RESULTS)
+    for _ in range(2):
+        with pytest.raises(BookingOutcomeUnknown):
+            create_step()(RESULTS)
+    assert supplier.calls == ["create", "lookup", "lookup"]
+    assert confirm._is_pending("T1", "create_booking")
+
+
+def test_rejected_booking_is_not_pending(supplier):
+    supplier.create_outcomes = ["Fare no longer available.", BOOKING]
+    with pytest.raises(BookingStepError, match="Fare no longer available"):
+        create_step()(RESULTS)
+    assert not confirm._is_pending("T1", "create_booking")
+
+    assert create_step()(RESULTS) == BOOKING
+    assert supplier.calls == ["create", "create"]
+
+
+def test_checkpoint_of_another_booking_is_ignored(supplier):
+    confirm.booking_workflow_memory.save_data({
+        "booking_tracking_id": "T0", "steps": {"create_booking": {"status": "success", "booking_id": "OLD"}},
+        "fingerprints": {"create_booking": None}, "pending": {"create_booking": 1.0}, "timings_ms": {},
+    })
+    supplier.create_outcomes = [BOOKING]
+    assert create_step()(RESULTS) == BOOKING
+    assert supplier.calls == ["create"]
@@ -0,0 +1,104 @@
+import json
+import pytest
+from tools.json_stream import StreamingArrayParser, stream_json_response
+
+ENTRIES = [
+    {"id": 1, "airline": "Biman \"BG\"", "note": "path C:\\temp\\", "fare": 4500},
+    {"id": 2, "airline": "Nov\u00f4Air", "note": "brackets ] } [ { and a comma, inside", "fare": 5200.5},
+    {"id": 3, "airline": "US-Bangla \u2708", "note": "", "refundable": True, "baggage": None},
+]
+BODY = json.dumps({"status": "success", "data": ENTRIES, "count": 3, "meta": {"currency": "BDT"}})
+
+
+def parse_in_chunks(text, chunk_size):
+    parser = StreamingArrayParser()
+    entries = []
+    for start in range(0, len(text), chunk_size):
+        entries.extend(parser.feed(text[start:start + chunk_size]))
+    parser.close()
+    return entries, parser.fields
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, len(BODY)])
+def test_chunk_size_does_not_change_the_result(chunk_size):
+    entries, fields = parse_in_chunks(BODY, chunk_size)
+    assert entries == ENTRIES
+    assert fields == {"status": "success", "count": 3, "meta": {"currency": "BDT"}}
+
+
+@pytest.mark.parametrize("raw", [
+    r'"quote \" inside"',
+    r'"backslash at the end \\"',
+    r'"escaped \\\" both"',
+    r'"unicode \u00e9\u2708 escapes"',
+    r'"surrogate pair \ud83d\ude80"',
+    '12345.678e-2',
+    'true',
+    'null',
+])
+def test_split_at_every_position_inside_a_value(raw):
+    text = '{"data": [{"value": %s}], "tail": %s}' % (raw, raw)
+    expected = json.loads(text)
+    for split in range(1, len(text)):
+        parser = StreamingArrayParser()
+        entries = parser.feed(text[:split]) + parser.feed(text[split:])
+        parser.close()
+        assert entries == expected["data"], f"split at {split}"
+        assert parser.fields == {"tail": expected["tail"]}, f"split at {split}"
+
+
+def test_entries_are_returned_as_soon_as_they_are_complete():
+    parser = StreamingArrayParser()
+    first_entry_end = BODY.index("}, {") + 1
+    assert parser.feed(BODY[:first_entry_end - 1]) == []
+    assert parser.feed(BODY[first_entry_end - 1:first_entry_end + 2]) == [ENTRIES[0]]
+    # ✅ Consumed entries are dropped from the buffer
+    assert parser.peak_buffer_chars < len(BODY)
+
+
+def test_response_without_the_array():
+    entries, fields = parse_in_chunks('{"status": "fail", "reason": "No flights"}', 5)
+    assert entries == []
+    assert fields == {"status": "fail", "reason": "No flights"}
+
+
+def test_not_an_object_is_rejected():
+    with pytest.raises(ValueError):
+        StreamingArrayParser().feed('["data"]')
+
+
+def test_truncated_body_is_rejected_on_close():
+    parser = StreamingArrayParser()
+    parser.feed(BODY[:len(BODY) // 2])
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+class ChunkedResponse:
+    """Stands in for a streamed `requests` response."""
+
+    def __init__(self, body, chunk_size):
+        self.body = body
+        self.chunk_size = chunk_size
+
+    def iter_content(self, chunk_size=None):
+        for start in range(0, len(self.body), self.chunk_size):
+            yield self.body[start:start + self.chunk_size]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5])
+def test_stream_json_response_decodes_multibyte_characters_split_across_chunks(chunk_size):
+    body = json.dumps({"data": ENTRIES, "count": 3}, ensure_ascii=False).encode("utf-8")
+    raw_chunks = []
+    parsed, metrics = stream_json_response(ChunkedResponse(body, chunk_size), raw_chunks=raw_chunks)
+    assert parsed == {"data": ENTRIES, "count": 3}
+    assert metrics["entries"] == 3
+    assert metrics["time_to_first_entry_ms"] is not None
+    assert b"".join(raw_chunks) == body
+
+
+def test_on_entry_result_replaces_the_entry():
+    body = BODY.encode("utf-8")
+    parsed, _ = stream_json_response(ChunkedResponse(body, 16), on_entry=lambda entry: entry["id"])
+    assert parsed["data"] == [1, 2, 3]
+    assert parsed["status"] == "success"
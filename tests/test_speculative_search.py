@@ -0,0 +1,120 @@
+import threading
+import pytest
+from tools.speculative_search import SpeculativeSearchScheduler
+
+
+class BlockingSearch:
+    """Search function whose calls block until released; records the requests it ran."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.requests = []
+        self.results = {}
+
+    def __call__(self, request):
+        self.requests.append(request["key"])
+        self.started.set()
+        self.release.wait(5)
+        result = self.results.get(request["key"], {"data": [request["key"]]})
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture
+def search():
+    blocking = BlockingSearch()
+    yield blocking
+    blocking.release.set()
+
+
+def make_scheduler(search, **kwargs):
+    return SpeculativeSearchScheduler(search, lambda request: request.get("key"), **kwargs)
+
+
+def settled(future):
+    """Event set once the scheduler's own done callback (registered first) has run for `future`."""
+    done = threading.Event()
+    future.add_done_callback(lambda _: done.set())
+    return done
+
+
+def test_incomplete_slots_are_not_scheduled(search):
+    scheduler = make_scheduler(search)
+    assert scheduler.schedule({"key": None}) is None
+    assert scheduler.stats["scheduled"] == 0
+
+
+def test_same_slots_reuse_the_running_search(search):
+    scheduler = make_scheduler(search)
+    first = scheduler.schedule({"key": "DAC-CXB"})
+    assert scheduler.schedule({"key": "DAC-CXB"}) is first
+    search.release.set()
+    assert scheduler.get({"key": "DAC-CXB"}, timeout=5) == {"data": ["DAC-CXB"]}
+    assert search.requests == ["DAC-CXB"]
+    assert scheduler.stats["reused"] == 1
+
+
+def test_changed_slots_replace_unfinished_searches(search):
+    scheduler = make_scheduler(search, max_workers=1)
+    running = scheduler.schedule({"key": "DAC-CXB"})
+    assert search.started.wait(5)
+    queued = scheduler.schedule({"key": "DAC-CGP"}, replace=False)
+    latest = scheduler.schedule({"key": "DAC-ZYL"})
+
+    assert queued.cancelled()  # Still queued behind the running one, so it never starts
+    assert not running.cancelled()  # Running searches cannot be cancelled, they are just dropped
+    assert scheduler.stats["discarded"] == 2
+    search.release.set()
+    assert latest.result(timeout=5) == {"data": ["DAC-ZYL"]}
+    assert search.requests == ["DAC-CXB", "DAC-ZYL"]
+    assert scheduler.peek({"key": "DAC-CXB"}) is None
+
+
+def test_replace_false_keeps_other_searches(search):
+    scheduler = make_scheduler(search)
+    first = scheduler.schedule({"key": "DAC-CXB"})
+    scheduler.schedule({"key": "DAC-CGP"}, replace=False)
+    search.release.set()
+    assert first.result(timeout=5) == {"data": ["DAC-CXB"]}
+    assert scheduler.stats["discarded"] == 0
+
+
+@pytest.mark.parametrize("failure", ["❌ No flights found.", RuntimeError("supplier down")])
+def test_failures_are_not_cached(search, failure):
+    scheduler = make_scheduler(search)
+    search.results["DAC-CXB"] = failure
+    failed = settled(scheduler.schedule({"key": "DAC-CXB"}))
+    search.release.set()
+    assert failed.wait(5)
+    assert scheduler.peek({"key": "DAC-CXB"}) is None
+    assert scheduler.stale({"key": "DAC-CXB"}) is None
+
+    del search.results["DAC-CXB"]
+    retried = scheduler.schedule({"key": "DAC-CXB"})
+    assert settled(retried).wait(5)
+    assert scheduler.get({"key": "DAC-CXB"}, timeout=5) == {"data": ["DAC-CXB"]}
+    assert search.requests == ["DAC-CXB", "DAC-CXB"]
+
+
+def test_stale_serves_the_last_good_result_after_it_expired(search):
+    scheduler = make_scheduler(search, ttl=0)
+    done = settled(scheduler.schedule({"key": "DAC-CXB"}))
+    search.release.set()
+    assert done.wait(5)
+
+    assert scheduler.peek({"key": "DAC-CXB"}) is None  # Past the TTL for reuse
+    assert scheduler.stale({"key": "DAC-CXB"}) == {"data": ["DAC-CXB"]}
+    assert scheduler.stale({"key": "DAC-CXB"}, max_age=-1) is None
+    assert scheduler.stale({"key": "DAC-CGP"}) is None
+    assert scheduler.stats["stale_served"] == 1
+
+
+def test_last_good_result_survives_a_later_failure(search):
+    scheduler = make_scheduler(search, ttl=0)
+    search.release.set()
+    assert settled(scheduler.schedule({"key": "DAC-CXB"})).wait(5)
+    search.results["DAC-CXB"] = RuntimeError("supplier down")
+    assert settled(scheduler.schedule({"key": "DAC-CXB"})).wait(5)
+    assert scheduler.stale({"key": "DAC-CXB"}) == {"data": ["DAC-CXB"]}
@@ -0,0 +1,115 @@
+import threading
+import pytest
+from tools import turn_memo
+from tools.turn_memo import begin_turn, end_turn, invalidate, memoize
+
+
+@pytest.fixture
+def turn():
+    active = begin_turn("test")
+    yield active
+    end_turn()
+
+
+def test_outside_a_turn_every_call_computes():
+    end_turn()
+    calls = []
+    for _ in range(2):
+        memoize("ns", ("a",), lambda: calls.append(1) or len(calls))
+    assert len(calls) == 2
+
+
+def test_same_key_is_computed_once_per_turn(turn):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"value": len(calls)}
+
+    assert memoize("ns", ("a", 1), compute) == {"value": 1}
+    assert memoize("ns", ("a", 1), compute) == {"value": 1}
+    assert memoize("ns", ("a", 2), compute) == {"value": 2}
+    assert len(calls) == 2
+    assert turn.summary()["hits"] == 1
+    assert turn.summary()["hits_by_namespace"] == {"ns": 1}
+
+
+def test_a_new_turn_starts_with_an_empty_memo(turn):
+    memoize("ns", (), lambda: "first")
+    begin_turn("next")
+    assert memoize("ns", (), lambda: "second") == "second"
+
+
+def test_concurrent_callers_wait_for_the_first_computation(turn):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow_compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    owner = threading.Thread(target=lambda: results.append(memoize("ns", ("k",), slow_compute)))
+    owner.start()
+    assert started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(memoize("ns", ("k",), slow_compute)))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()  # Blocked on the owner's computation, not computing itself
+
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert results == ["value", "value"]
+    assert len(calls) == 1
+
+
+def test_failures_are_not_memoized(turn):
+    def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        memoize("ns", (), fail)
+    assert memoize("ns", (), lambda: "retried") == "retried"
+
+
+def test_copy_result_hands_out_independent_copies(turn):
+    first = memoize("ns", (), lambda: {"items": [1]}, copy_result=True)
+    first["items"].append(2)
+    assert memoize("ns", (), lambda: None, copy_result=True) == {"items": [1]}
+
+
+def test_invalidate_drops_only_its_namespace(turn):
+    memoize("file:a", (), lambda: "a1")
+    memoize("file:b", (), lambda: "b1")
+    invalidate("file:a")
+    assert memoize("file:a", (), lambda: "a2") == "a2"
+    assert memoize("file:b", (), lambda: "b2") == "b1"
+
+
+def test_json_memory_save_data_invalidates_the_memoized_read(turn, tmp_path, monkeypatch):
+    json_memory = pytest.importorskip("memory.json_memory")
+    monkeypatch.setattr(json_memory, "DATA_DIR", str(tmp_path))
+    memory = json_memory.JSONMemory("state.json")
+    memory.save_data({"stage": "results"})
+    assert memory.load_data() == {"stage": "results"}
+
+    # ✅ Within the turn the file is read once; a write through save_data is seen by the next load
+    (tmp_path / "state.json").write_text('{"stage": "edited outside"}', encoding="utf-8")
+    assert memory.load_data() == {"stage": "results"}
+    memory.save_data({"stage": "selection"})
+    assert memory.load_data() == {"stage": "selection"}
+
+
+def test_end_turn_records_the_summary():
+    begin_turn("summary")
+    memoize("ns", (), lambda: 1)
+    memoize("ns", (), lambda: 1)
+    summary = end_turn()
+    assert summary["label"] == "summary"
+    assert (summary["calls"], summary["hits"]) == (2, 1)
+    assert turn_memo.turn_memo_stats[-1] == summary
+    assert turn_memo.current_turn() is None
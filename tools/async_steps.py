@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("async-steps")
+
+
+async def run_step_graph(steps, cancel_rules=None):
+    """
+    Runs a dependency graph of blocking steps concurrently.
+
+    - `steps`: {name: (func, [dependency names])}. `func(results)` runs in a worker thread
+      as soon as all its dependencies have finished, and gets the results collected so far.
+    - `cancel_rules`: {name: func(results) -> [step names]}. Checked whenever a step has
+      finished and before any step starts; the returned steps are no longer needed. Steps that
+      have not started never start; a step already running in its thread cannot be stopped,
+      its result is only dropped.
+
+    Returns {name: result} for every step that ran to completion and was still wanted.
+    """
+    cancel_rules = cancel_rules or {}
+    pending = dict(steps)
+    running = {}  # task -> name
+    results = {}
+    cancelled = set()
+    abandoned = set()  # Cancelled while their thread was running: no time saved
+    durations = {}
+    started_at = {}
+    graph_start = time.perf_counter()
+
+    def cancel(name):
+        cancelled.add(name)
+        pending.pop(name, None)
+        for task, task_name in running.items():
+            if task_name == name:
+                abandoned.add(name)
+                task.cancel()
+
+    def apply_cancel_rules():
+        for name, rule in cancel_rules.items():
+            if name not in results:
+                continue
+            for other in rule(results) or []:
+                if other not in results and other not in cancelled:
+                    cancel(other)
+
+    try:
+        while pending or running:
+            apply_cancel_rules()
+            for name, (func, depends_on) in list(pending.items()):
+                if any(dep in cancelled for dep in depends_on):
+                    cancel(name)
+                elif all(dep in results for dep in depends_on):
+                    del pending[name]
+                    started_at[name] = time.perf_counter()
+                    running[asyncio.create_task(asyncio.to_thread(func, dict(results)))] = name
+
+            if not running:
+                break  # Remaining steps depend on something that never ran
+
+            done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                if task.cancelled() or name in cancelled:
+                    continue
+                results[name] = task.result()
+                durations[name] = time.perf_counter() - started_at[name]
+                apply_cancel_rules()
+    finally:
+        for task in running:
+            task.cancel()
+
+    wall_time = time.perf_counter() - graph_start
+    logger.debug(
+        "Step graph done in %.0f ms (sum of steps %.0f ms, skipped %s, abandoned while running %s)",
+        wall_time * 1000, sum(durations.values()) * 1000, sorted(cancelled - abandoned), sorted(abandoned),
+    )
+    return results
+
+
+def run_step_graph_sync(steps, cancel_rules=None):
+    """
+    Blocking wrapper around `run_step_graph` for synchronous callers in worker threads.
+    Code running on an event loop must `await run_step_graph(...)` instead.
+    """
+    return run_coroutine_sync(run_step_graph(steps, cancel_rules))
+
+
+def run_coroutine_sync(coro):
+    """
+    Runs `coro` to completion on a private event loop. Only for threads without a running
+    loop: blocking the loop thread until the coroutine is done would stall every other task.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        coro.close()
+        raise RuntimeError("run_coroutine_sync called from a running event loop; await the coroutine instead")
+
+    # ✅ Unlike asyncio.run, closing this loop does not wait for threads of cancelled steps
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
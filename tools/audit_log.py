@@ -0,0 +1,179 @@
+import atexit
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from datetime import datetime
+
+try:
+    import zstandard  # Optional: better ratio and speed than gzip
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger("audit-log")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Moves one level up
+AUDIT_LOG_DIR = os.path.join(BASE_DIR, "data", "logs")
+
+AUDIT_LOG_SAMPLE_RATE = float(os.getenv("AUDIT_LOG_SAMPLE_RATE", "1.0"))  # Share of calls whose requests are logged
+AUDIT_LOG_MAX_BYTES = int(os.getenv("AUDIT_LOG_MAX_BYTES", str(20 * 1024 * 1024)))  # Uncompressed bytes per file
+AUDIT_LOG_MAX_AGE = float(os.getenv("AUDIT_LOG_MAX_AGE", "3600"))  # Seconds before a file is rotated
+AUDIT_LOG_MAX_FILES = int(os.getenv("AUDIT_LOG_MAX_FILES", "20"))
+AUDIT_LOG_QUEUE_SIZE = int(os.getenv("AUDIT_LOG_QUEUE_SIZE", "1000"))
+
+
+class AuditLogWriter:
+    """
+    Background sink for request/response records.
+
+    `log()` only puts a reference to the caller's data on a bounded queue (it never blocks and
+    drops records when the queue is full). A writer thread serializes each record as one compact
+    JSON line into a zstd (if installed) or gzip file, rotated by size and age.
+    """
+
+    def __init__(self, directory=AUDIT_LOG_DIR, prefix="audit", sample_rate=AUDIT_LOG_SAMPLE_RATE,
+                 max_bytes=AUDIT_LOG_MAX_BYTES, max_age=AUDIT_LOG_MAX_AGE, max_files=AUDIT_LOG_MAX_FILES,
+                 queue_size=AUDIT_LOG_QUEUE_SIZE):
+        self.directory = directory
+        self.prefix = prefix
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_files = max_files
+        self.extension = ".jsonl.zst" if zstandard else ".jsonl.gz"
+        self.stats = {"queued": 0, "written": 0, "dropped": 0, "sampled_out": 0, "rotations": 0}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._raw_file = None
+        self._opened_at = 0.0
+        self._bytes_written = 0
+        self._thread = None
+        self._start_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def sampled(self, call_id):
+        """Deterministic per call, so either all or none of a call's records are kept."""
+        if self.sample_rate >= 1.0:
+            return True
+        return zlib.crc32(str(call_id).encode()) % 10000 < self.sample_rate * 10000
+
+    def log(self, kind, body, call_id=None, **meta):
+        """
+        Queues one record. `body` may be bytes, a list of byte chunks, str (kept as a string) or a
+        JSON-serializable object; it is serialized on the writer thread, so it must not be mutated afterwards.
+        Error records are kept regardless of sampling.
+        """
+        if "error" not in kind and not self.sampled(call_id):
+            self.stats["sampled_out"] += 1
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((time.time(), kind, call_id, meta, body))
+            self.stats["queued"] += 1
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                self._close_file()
+                self._queue.task_done()
+                return
+            try:
+                self._write(record)
+            except Exception as e:
+                logger.warning("Audit log write failed: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, record):
+        timestamp, kind, call_id, meta, body = record
+        line = json.dumps({
+            "ts": round(timestamp, 3),
+            "kind": kind,
+            "call_id": call_id,
+            **meta,
+            "body": _decode_body(body),
+        }, separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+
+        if self._file is None or self._bytes_written >= self.max_bytes or time.time() - self._opened_at >= self.max_age:
+            self._rotate()
+        self._file.write(line)
+        self._bytes_written += len(line)
+        self.stats["written"] += 1
+        if self._queue.empty():
+            self._file.flush()
+
+    def _rotate(self):
+        if self._file is not None:
+            self._close_file()
+            self.stats["rotations"] += 1
+        path = os.path.join(
+            self.directory, f"{self.prefix}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}{self.extension}"
+        )
+        if zstandard:
+            self._raw_file = open(path, "wb")
+            self._file = zstandard.ZstdCompressor().stream_writer(self._raw_file)
+        else:
+            self._file = gzip.open(path, "wb", compresslevel=5)
+        self._opened_at = time.time()
+        self._bytes_written = 0
+        self._prune()
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        self._file.close()
+        if self._raw_file is not None and not self._raw_file.closed:
+            self._raw_file.close()
+        self._file = None
+        self._raw_file = None
+
+    def _prune(self):
+        files = sorted(glob.glob(os.path.join(self.directory, f"{self.prefix}-*.jsonl.*")))
+        for old_file in files[:-self.max_files]:
+            try:
+                os.remove(old_file)
+            except OSError:
+                pass
+
+    def flush(self, timeout=5.0):
+        """Waits (up to `timeout`) until queued records are written."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5.0)
+
+
+def _decode_body(body):
+    """
+    Turns the queued reference into a JSON value. Raw bodies (bytes, chunks, text) are embedded
+    as one string, never parsed and re-serialized: `json.loads(record["body"])` restores them.
+    """
+    if isinstance(body, list) and body and all(isinstance(chunk, (bytes, bytearray)) for chunk in body):
+        body = b"".join(body)
+    if isinstance(body, (bytes, bytearray)):
+        return body.decode("utf-8", errors="replace")
+    return body
+
+
+audit_log = AuditLogWriter()
+atexit.register(audit_log.close)
@@ -0,0 +1,206 @@
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from tools.audit_log import AUDIT_LOG_DIR
+
+logger = logging.getLogger("call-profiler")
+
+PROFILING = os.getenv("PROFILING", "off") == "on"  # Profile every call; otherwise only rooms with {"profile": true} metadata
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.01"))  # Seconds between two stack samples
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "2"))  # Profiled calls at once on this host
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "900"))  # Sampling stops after this, the call goes on
+PROFILE_INCLUDE_IDLE = os.getenv("PROFILE_INCLUDE_IDLE", "off") == "on"
+MAX_STACK_DEPTH = 128
+
+# ✅ Frames that only mean "waiting for work": an idle loop or pool thread, not a hot path.
+# Event.wait and Condition.wait_for end in Condition.wait; an idle ThreadPoolExecutor thread
+# blocks in the C SimpleQueue.get, so its innermost Python frame is the pool's _worker loop
+IDLE_FRAMES = {
+    "selectors.select",
+    "queue.get",
+    "threading.wait",
+    "threading.wait_for",
+    "threading._wait_for_tstate_lock",
+    "concurrent.futures.thread._worker",
+}
+# ✅ Our own background threads, always idle or irrelevant to the call
+SKIPPED_THREADS = ("call-profiler", "loop-watchdog", "metrics-server", "otlp-exporter", "audit-log-writer")
+
+
+def _frame_name(frame):
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+
+def _thread_group(name):
+    """`flight-search-unit_3` and `flight-search-unit_7` are one root of the flame graph."""
+    return re.sub(r"[_-]\d+$", "", name)
+
+
+class CallProfiler:
+    """
+    Sampling profiler for one call: a daemon thread reads the stacks of all threads every
+    `interval` seconds (sys._current_frames, no tracing hooks) and counts them as collapsed
+    stacks, the input format of flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, call_id, interval=PROFILE_INTERVAL, max_seconds=PROFILE_MAX_SECONDS):
+        self.call_id = call_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.label = None  # Tool being executed, the root of the samples taken meanwhile
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="call-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if time.monotonic() - self._started > self.max_seconds:
+                logger.warning("Profiling of call %s stopped after %.0f s", self.call_id, self.max_seconds)
+                return
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            label = self.label
+            for thread_id, frame in sys._current_frames().items():
+                name = names.get(thread_id, "unknown")
+                if thread_id == own_id or name.startswith(SKIPPED_THREADS):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if not stack or (not PROFILE_INCLUDE_IDLE and stack[0] in IDLE_FRAMES):
+                    continue
+                stack.append(_thread_group(name))
+                if label:
+                    stack.append(f"tool:{label}")
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        """Stops sampling and writes data/logs/profile-<call_id>-<time>.folded. Returns its path."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        os.makedirs(AUDIT_LOG_DIR, exist_ok=True)
+        path = os.path.join(AUDIT_LOG_DIR, f"profile-{self.call_id}-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+def _slot_path(slot):
+    return os.path.join(AUDIT_LOG_DIR, f".profile-slot-{slot}")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _acquire_slot():
+    """
+    Takes one of PROFILE_MAX_CONCURRENT host-wide slots (job processes run side by side),
+    reclaiming slots of processes that died while profiling. Returns the slot or None.
+    """
+    os.makedirs(AUDIT_LOG_DIR, exist_ok=True)
+    for slot in range(PROFILE_MAX_CONCURRENT):
+        path = _slot_path(slot)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        owner = int(f.read().strip() or 0)
+                except (OSError, ValueError):
+                    owner = 0
+                if owner and _pid_alive(owner):
+                    break
+                try:
+                    os.remove(path)  # Stale slot, try once more
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(str(os.getpid()))
+            return slot
+    return None
+
+
+def _release_slot(slot):
+    try:
+        os.remove(_slot_path(slot))
+    except FileNotFoundError:
+        pass
+
+
+def profiling_requested(room_metadata=None):
+    """True if PROFILING=on or the room metadata (JSON) asks for it with "profile": true."""
+    if PROFILING:
+        return True
+    if not room_metadata:
+        return False
+    try:
+        metadata = json.loads(room_metadata)
+    except (TypeError, ValueError):
+        return False
+    return isinstance(metadata, dict) and metadata.get("profile") is True
+
+
+# ✅ One caller per worker process, so the profiler of the active call is process-wide state
+_active = None
+_active_slot = None
+
+
+def start_call_profile(call_id, room_metadata=None):
+    """Starts profiling the current call if requested and a slot is free. Returns the profiler or None."""
+    global _active, _active_slot
+    if _active is not None or not profiling_requested(room_metadata):
+        return None
+    slot = _acquire_slot()
+    if slot is None:
+        logger.info("Profiling of call %s skipped: %s calls already profiled", call_id, PROFILE_MAX_CONCURRENT)
+        return None
+    _active, _active_slot = CallProfiler(call_id), slot
+    _active.start()
+    logger.info("Profiling call %s every %.0f ms", call_id, _active.interval * 1000)
+    return _active
+
+
+def stop_call_profile():
+    """Stops the active profile, writes it and frees its slot. Returns the output path or None."""
+    global _active, _active_slot
+    profiler, slot = _active, _active_slot
+    _active = _active_slot = None
+    if profiler is None:
+        return None
+    try:
+        path = profiler.stop()
+    finally:
+        _release_slot(slot)
+    logger.info("Profile of call %s: %s samples, %s distinct stacks -> %s", profiler.call_id, profiler.samples, len(profiler.stacks), path)
+    return path
+
+
+def set_profile_label(label):
+    """Roots the samples taken from now on under `label` (a tool name); free when not profiling."""
+    if _active is not None:
+        _active.label = label
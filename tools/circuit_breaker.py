@@ -0,0 +1,177 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from tools.worker_metrics import counter_family, register_collector
+
+logger = logging.getLogger("circuit-breaker")
+
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "30"))  # Seconds of calls the rates are computed over
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))  # Calls in the window before the breaker may open
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_CALL = float(os.getenv("BREAKER_SLOW_CALL", "8"))  # Seconds after which a successful call counts as slow
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", "0.8"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "15"))  # Fast-fail period before a probe is let through
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+    def __init__(self, name):
+        super().__init__(f"{name} is temporarily unavailable")
+        self.name = name
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint breaker over a rolling time window.
+
+    - closed: calls go through; the breaker opens when, with at least `min_calls` in the window,
+      the error rate or the slow-call rate reaches its threshold.
+    - open: calls fail fast with CircuitOpen for `open_seconds`.
+    - half_open: one probe call is let through; success closes the breaker, failure reopens it.
+    """
+
+    def __init__(self, name, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS, error_rate=BREAKER_ERROR_RATE,
+                 slow_call=BREAKER_SLOW_CALL, slow_rate=BREAKER_SLOW_RATE, open_seconds=BREAKER_OPEN_SECONDS):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+        self._calls = deque()  # (finished_at, ok, slow)
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raises CircuitOpen when the call must not be made."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == OPEN or (self.state == HALF_OPEN and self._probe_in_flight):
+                self.stats["rejected"] += 1
+                raise CircuitOpen(self.name)
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = True
+            self.stats["calls"] += 1
+
+    def record(self, ok, duration):
+        now = time.monotonic()
+        with self._lock:
+            if not ok:
+                self.stats["failures"] += 1
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                self._transition(CLOSED if ok else OPEN)
+                return
+            self._calls.append((now, ok, ok and duration >= self.slow_call))
+            while self._calls and now - self._calls[0][0] > self.window:
+                self._calls.popleft()
+            if self.state == CLOSED and len(self._calls) >= self.min_calls:
+                error_rate, slow_rate = self._rates()
+                if error_rate >= self.error_rate or slow_rate >= self.slow_rate:
+                    self._transition(OPEN)
+
+    def release(self):
+        """Ends a call without an outcome (the caller cut it short): a half-open probe may be retried."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def call(self, func, *args, is_failure=None, is_error=None, **kwargs):
+        """
+        Runs `func(*args, **kwargs)` through the breaker. Exceptions count as failures unless
+        `is_error(exception)` is false, and so do results for which `is_failure(result)` is true
+        (e.g. HTTP 5xx).
+        """
+        self.before_call()
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            if is_error is None or is_error(e):
+                self.record(False, time.perf_counter() - started)
+            else:
+                self.release()
+            raise
+        self.record(not (is_failure and is_failure(result)), time.perf_counter() - started)
+        return result
+
+    def _rates(self):
+        total = len(self._calls)
+        if not total:
+            return 0.0, 0.0
+        errors = sum(1 for _, ok, _ in self._calls if not ok)
+        slow = sum(1 for _, _, is_slow in self._calls if is_slow)
+        return errors / total, slow / total
+
+    def _transition(self, state):
+        if state == self.state:
+            return
+        logger.warning("⚡ Circuit %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.stats["opened"] += 1
+        if state == CLOSED:
+            self._calls.clear()
+
+    def snapshot(self):
+        with self._lock:
+            error_rate, slow_rate = self._rates()
+            return {
+                "state": self.state,
+                "window_calls": len(self._calls),
+                "error_rate": round(error_rate, 3),
+                "slow_rate": round(slow_rate, 3),
+                **self.stats,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Returns the process-wide breaker for endpoint `name`, creating it on first use."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def is_open(name):
+    """True while calls to `name` fail fast (a probe may still be allowed)."""
+    breaker = _breakers.get(name)
+    return breaker is not None and breaker.state != CLOSED
+
+
+def breaker_snapshot():
+    """Returns {endpoint: state and counters} for every breaker."""
+    return {name: breaker.snapshot() for name, breaker in list(_breakers.items())}
+
+
+def _breaker_metrics():
+    snapshot = breaker_snapshot()
+    families = [(
+        "circuit_breaker_state", "gauge", "1 for the current state of each endpoint's breaker",
+        [({"endpoint": name, "state": state}, int(stats["state"] == state))
+         for name, stats in snapshot.items() for state in (CLOSED, OPEN, HALF_OPEN)],
+    )]
+    for field in ("calls", "failures", "rejected", "opened"):
+        families.append(counter_family(f"circuit_breaker_{field}_total", f"Circuit breaker {field} per endpoint",
+                                       {name: stats[field] for name, stats in snapshot.items()}, "endpoint"))
+    return families
+
+
+register_collector(_breaker_metrics)
@@ -13,9 +13,16 @@ json_files = [
     os.path.join(DATA_DIR, "flight_search_data.json"),
     os.path.join(DATA_DIR, "passenger_data.json"),
     os.path.join(DATA_DIR, "flight_list.json"),
-    os.path.join(DATA_DIR, "user_location_data.json")
+    os.path.join(DATA_DIR, "user_location_data.json"),
+    os.path.join(DATA_DIR, "selected_flight.json"),
+    os.path.join(DATA_DIR, "booking_status.json"),
+    os.path.join(DATA_DIR, "booking_workflow.json"),
+    os.path.join(DATA_DIR, "booking_payload.json")
 ]
 
+# ✅ Files that store an object `{}` (all others store a list `[]`)
+OBJECT_FILES = {"passenger_data.json", "flight_search_data.json", "selected_flight.json", "booking_status.json", "booking_workflow.json", "booking_payload.json"}
+
 def clear_json_files():
     """Clears all stored JSON files by overwriting them with appropriate empty structures."""
     # ✅ Ensure the `data/` directory exists before writing files
@@ -24,7 +31,7 @@ def clear_json_files():
     for file in json_files:
         try:
             # ✅ Determine whether the file stores an object `{}` or a list `[]`
-            empty_data = {} if "passenger_data.json" in file or "flight_search_data.json" in file else []
+            empty_data = {} if os.path.basename(file) in OBJECT_FILES else []
 
             # ✅ Overwrite file with an empty JSON structure
             with open(file, "w", encoding="utf-8") as f:
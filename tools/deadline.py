@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import time
+import requests
+from tools.circuit_breaker import get_breaker
+from tools.tracing import span
+from tools.worker_metrics import counter, counter_family, histogram, register_collector
+
+logger = logging.getLogger("deadline")
+
+TURN_BUDGET = float(os.getenv("TURN_BUDGET", "20"))  # Seconds one caller turn may spend waiting on upstreams
+MIN_CALL_BUDGET = float(os.getenv("MIN_CALL_BUDGET", "0.5"))  # A call is not started with less time left
+DEFAULT_CALL_TIMEOUT = float(os.getenv("DEFAULT_CALL_TIMEOUT", "30"))  # Cap per call, also outside a turn
+CONNECT_TIMEOUT = float(os.getenv("CONNECT_TIMEOUT", "3.05"))
+
+# ✅ One caller per worker process, so the active turn deadline is process-wide state
+_current_deadline = None
+_stats_lock = threading.Lock()
+budget_stats = {}  # call_site -> {"calls": n, "exhausted": n, "timeouts": n}
+
+UPSTREAM_DURATION = histogram("upstream_request_duration_seconds", "Duration of an upstream HTTP call", ["call_site"])
+UPSTREAM_ERRORS = counter("upstream_errors_total", "Failed upstream HTTP calls", ["call_site", "reason"])
+
+
+class BudgetExhausted(TimeoutError):
+    """Raised instead of starting an upstream call when the turn has no time left for it."""
+
+    def __init__(self, call_site):
+        super().__init__(f"Latency budget of the turn exhausted before {call_site}")
+        self.call_site = call_site
+
+
+class Deadline:
+    """Absolute point in time by which the current caller turn should be answered."""
+
+    def __init__(self, budget=TURN_BUDGET, label=""):
+        self.budget = budget
+        self.label = label
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+def start_deadline(budget=TURN_BUDGET, label=""):
+    """Starts the deadline of a new caller turn, replacing the previous one."""
+    global _current_deadline
+    _current_deadline = Deadline(budget, label)
+    return _current_deadline
+
+
+def clear_deadline():
+    global _current_deadline
+    _current_deadline = None
+
+
+def current_deadline():
+    return _current_deadline
+
+
+def remaining(default=None):
+    """Seconds left in the current turn, or `default` outside a turn."""
+    deadline = _current_deadline
+    return deadline.remaining() if deadline is not None else default
+
+
+def _count(call_site, field):
+    with _stats_lock:
+        stats = budget_stats.setdefault(call_site, {"calls": 0, "exhausted": 0, "timeouts": 0})
+        stats[field] += 1
+
+
+def record_exhausted(call_site):
+    """Counts a wait that was cut short by the turn budget (the caller degrades gracefully)."""
+    _count(call_site, "exhausted")
+    logger.warning("⏳ Turn budget exhausted at %s", call_site)
+
+
+def record_timeout(call_site):
+    """Counts an upstream call that ran into its timeout."""
+    _count(call_site, "timeouts")
+
+
+def call_timeout(call_site, cap=DEFAULT_CALL_TIMEOUT, bound_to_turn=True):
+    """
+    Returns the timeout for one upstream call: `cap`, shortened to what is left of the turn.
+    Background work that outlives the turn (speculative searches, pre-validation) passes
+    `bound_to_turn=False` and only gets `cap`.
+
+    Raises BudgetExhausted when less than MIN_CALL_BUDGET seconds are left.
+    """
+    _count(call_site, "calls")
+    deadline = _current_deadline
+    if not bound_to_turn or deadline is None:
+        return cap
+    left = deadline.remaining()
+    if left < MIN_CALL_BUDGET:
+        record_exhausted(call_site)
+        raise BudgetExhausted(call_site)
+    return min(cap, left)
+
+
+def post(url, call_site, cap=DEFAULT_CALL_TIMEOUT, bound_to_turn=True, breaker=None, **kwargs):
+    """
+    `requests.post` with connect/read timeouts taken from the turn budget, through the circuit
+    breaker of the endpoint (`breaker`, default `call_site`). Timeouts are counted per call site
+    and re-raised; an open breaker raises CircuitOpen without sending the request.
+
+    A timeout shortened by the turn budget says nothing about the upstream's health, so only
+    timeouts of the full `cap` count as breaker failures.
+    """
+    timeout = call_timeout(call_site, cap, bound_to_turn)
+    shortened = timeout < cap
+    started = time.monotonic()
+    with span(f"http.{call_site}", timeout_s=round(timeout, 2)) as current:
+        try:
+            response = get_breaker(breaker or call_site).call(
+                requests.post, url, timeout=(min(CONNECT_TIMEOUT, timeout), timeout),
+                is_failure=lambda response: response.status_code >= 500,
+                is_error=lambda e: not (shortened and isinstance(e, requests.Timeout)), **kwargs
+            )
+        except requests.Timeout:
+            record_timeout(call_site)
+            UPSTREAM_ERRORS.inc(call_site=call_site, reason="timeout")
+            raise
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(call_site=call_site, reason=type(e).__name__)
+            raise
+        finally:
+            UPSTREAM_DURATION.observe(time.monotonic() - started, call_site=call_site)
+        if response.status_code >= 500:
+            UPSTREAM_ERRORS.inc(call_site=call_site, reason="status_5xx")
+        current.set(status_code=response.status_code)
+        return response
+
+
+def budget_stats_summary():
+    """Returns {call_site: {"calls", "exhausted", "timeouts"}}."""
+    with _stats_lock:
+        return {call_site: dict(stats) for call_site, stats in budget_stats.items()}
+
+
+def _budget_metrics():
+    stats = budget_stats_summary()
+    return [
+        counter_family(f"latency_budget_{field}_total", f"Upstream calls per call site: {field}",
+                       {call_site: counts[field] for call_site, counts in stats.items()}, "call_site")
+        for field in ("calls", "exhausted", "timeouts")
+    ]
+
+
+register_collector(_budget_metrics)
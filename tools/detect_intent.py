@@ -1,18 +1,18 @@
 import json
+import logging
 import os
 import re
 
-from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
+from tools.llm_client import chat_completion
+from tools.prompt_registry import register_prompt
+
+logger = logging.getLogger("detect-intent")
 
 # ✅ Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# ✅ Initialize GPT-4 Model
-llm = ChatOpenAI(model="gpt-4o", openai_api_key=OPENAI_API_KEY)
-
 # ✅ Predefined Examples for Classification
 examples = {
     "greeting": [
@@ -171,6 +171,42 @@ examples = {
 }
 
 
+# ✅ Static classifier prompt, compiled once; only the user input is sent per call
+INTENT_PROMPT = register_prompt(
+    "detect_intent",
+    system=f"""
+    You are an AI classifier. Your task is to categorize user input into one of these categories:
+
+    - 'greeting': When the user greets (e.g., {json.dumps(examples["greeting"])}).
+    - 'flight_booking': When the user asks to book a flight (e.g., {json.dumps(examples["flight_booking"])}).
+    - 'providing_date': When the user provides a travel date (e.g., {json.dumps(examples["providing_date"])}).
+    - 'providing_location': When the user provides a location (e.g., {json.dumps(examples["providing_location"])}).
+    - 'flight_query': When the user provides a location (e.g., {json.dumps(examples["flight_query"])}).
+    - 'flight_selection': When the user provides a location (e.g., {json.dumps(examples["flight_selection"])}).
+    - 'booking_confirmation': When the user provides a location (e.g., {json.dumps(examples["booking_confirmation"])}).
+    - 'file_upload': When the user mentions uploading a passport, NID, or other files (e.g., {json.dumps(examples["file_upload"])}).
+    - 'passenger_info_manual_entry': When the user requests to enter their details manually instead of uploading files (e.g., {json.dumps(examples["passenger_info_manual_entry"])}).
+    - 'other': When none of the above applies (e.g., {json.dumps(examples["other"])}).
+
+    Additional Rules:
+    - If the user mentions **both origin and destination**, classify as 'flight_booking'.
+    - If the user mentions **only one location**, classify as 'providing_location'.
+    - If the user provides **only a date**, classify as 'providing_date'.
+    - If the user provides **name, email, phone, or passport**, classify as 'passenger_details'.
+    - If the user is asking about **flight details, ticket prices, flight duration, airline options, or availability**, classify as 'flight_query'.
+    - If the user is selecting a flight from a provided list, classify as 'flight_selection'.
+    - If the user confirms their booking, classify as 'booking_confirmation'.
+    - If the user mentions **uploading passport, NID, or other files**, classify as 'file_upload'.
+    - If the user says **they want to enter details manually**, classify as 'passenger_info_manual_entry'.
+    - If unsure, classify as 'other'.
+
+    Format your response strictly as JSON:
+    {{"intent": "<category>"}}
+    """,
+    user='User Input: "{user_input}"',
+)
+
+
 def clean_json_response(response_text):
     """
     Cleans and extracts valid JSON from GPT-4 responses.
@@ -184,7 +220,7 @@ def clean_json_response(response_text):
         parsed_json = json.loads(response_text)
         return parsed_json if isinstance(parsed_json, dict) else {"intent": "other"}
     except json.JSONDecodeError:
-        print(f"❌ JSON Parse Error: {response_text}")
+        logger.error("❌ JSON Parse Error: %s", response_text)
         return {"intent": "other"}  # Fallback in case of invalid JSON
 
 
@@ -193,46 +229,9 @@ def detect_intent(user_input):
     Uses GPT-4 to classify user input into predefined categories with strict JSON formatting.
     """
     try:
-        response = llm.invoke([
-            HumanMessage(
-                content=f"""
-                You are an AI classifier. Your task is to categorize user input into one of these categories:
-
-                - 'greeting': When the user greets (e.g., {json.dumps(examples["greeting"])}).
-                - 'flight_booking': When the user asks to book a flight (e.g., {json.dumps(examples["flight_booking"])}).
-                - 'providing_date': When the user provides a travel date (e.g., {json.dumps(examples["providing_date"])}).
-                - 'providing_location': When the user provides a location (e.g., {json.dumps(examples["providing_location"])}).
-                - 'flight_query': When the user provides a location (e.g., {json.dumps(examples["flight_query"])}).
-                - 'flight_selection': When the user provides a location (e.g., {json.dumps(examples["flight_selection"])}).
-                - 'booking_confirmation': When the user provides a location (e.g., {json.dumps(examples["booking_confirmation"])}).
-                - 'file_upload': When the user mentions uploading a passport, NID, or other files (e.g., {json.dumps(examples["file_upload"])}).
-                - 'passenger_info_manual_entry': When the user requests to enter their details manually instead of uploading files (e.g., {json.dumps(examples["passenger_info_manual_entry"])}).
-                - 'other': When none of the above applies (e.g., {json.dumps(examples["other"])}).
-                
-
-                Additional Rules:
-                - If the user mentions **both origin and destination**, classify as 'flight_booking'.
-                - If the user mentions **only one location**, classify as 'providing_location'.
-                - If the user provides **only a date**, classify as 'providing_date'.
-                - If the user provides **name, email, phone, or passport**, classify as 'passenger_details'.
-                - If the user is asking about **flight details, ticket prices, flight duration, airline options, or availability**, classify as 'flight_query'.
-                - If the user is selecting a flight from a provided list, classify as 'flight_selection'.
-                - If the user confirms their booking, classify as 'booking_confirmation'.
-                - If the user mentions **uploading passport, NID, or other files**, classify as 'file_upload'.
-                - If the user says **they want to enter details manually**, classify as 'passenger_info_manual_entry'.
-                - If unsure, classify as 'other'.
-
-                Format your response strictly as JSON:
-                {{"intent": "<category>"}}
-
-                User Input: "{user_input}"
-                """
-            )
-        ])
-
-        if response and hasattr(response, "content"):
-            response_text = response.content.strip()
+        response_text = chat_completion(INTENT_PROMPT.messages(user_input=user_input), call_site="detect_intent")
 
+        if response_text:
             # ✅ Ensure response is valid JSON
             try:
                 intent_data = clean_json_response(response_text)
@@ -246,13 +245,13 @@ def detect_intent(user_input):
                 return intent if intent in valid_intents else "other"
 
             except json.JSONDecodeError:
-                print(f"❌ Invalid JSON Response: {response_text}")
+                logger.error("❌ Invalid JSON Response: %s", response_text)
                 return "other"
 
         else:
-            print("❌ GPT-4 Response is Empty")
+            logger.error("❌ GPT-4 Response is Empty")
             return "other"
 
     except Exception as e:
-        print(f"❌ GPT-4 Intent Extraction Failed: {e}")
+        logger.error("❌ GPT-4 Intent Extraction Failed: %s", e)
         return "other"
@@ -0,0 +1,156 @@
+import codecs
+import json
+import time
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+class StreamingArrayParser:
+    """
+    Incrementally decodes a JSON object of the form {..., "<array_key>": [entry, entry, ...], ...}.
+
+    Entries of `array_key` are returned by `feed()` as soon as each one is complete, and consumed
+    text is dropped from the buffer, so only one entry needs to be held at a time. Other top-level
+    fields are collected in `fields`.
+    """
+
+    def __init__(self, array_key="data"):
+        self.array_key = array_key
+        self.fields = {}
+        self.entries_seen = 0
+        self.array_found = False
+        self.peak_buffer_chars = 0
+        self._buffer = ""
+        self._state = "start"
+        self._key = None
+        self._closed = False
+
+    def feed(self, text):
+        """Adds a chunk of the body. Returns the array entries completed by it."""
+        self._buffer += text
+        self.peak_buffer_chars = max(self.peak_buffer_chars, len(self._buffer))
+        entries = []
+        pos = 0
+        while True:
+            pos = self._skip_whitespace(pos)
+            if pos >= len(self._buffer):
+                break
+            char = self._buffer[pos]
+
+            if self._state == "start":
+                if char != "{":
+                    raise ValueError("Search response is not a JSON object")
+                pos += 1
+                self._state = "key"
+            elif self._state == "key":
+                if char == ",":
+                    pos += 1
+                    continue
+                if char == "}":
+                    pos += 1
+                    self._state = "done"
+                    continue
+                value, end = self._decode(pos)
+                if end is None:
+                    break
+                self._key, pos = value, end
+                self._state = "colon"
+            elif self._state == "colon":
+                if char != ":":
+                    raise ValueError(f"Expected ':' after key {self._key!r}")
+                pos += 1
+                self._state = "value"
+            elif self._state == "value":
+                if self._key == self.array_key and char == "[":
+                    pos += 1
+                    self.array_found = True
+                    self._state = "array"
+                    continue
+                value, end = self._decode(pos)
+                if end is None:
+                    break
+                self.fields[self._key] = value
+                pos = end
+                self._state = "key"
+            elif self._state == "array":
+                if char == ",":
+                    pos += 1
+                    continue
+                if char == "]":
+                    pos += 1
+                    self._state = "key"
+                    continue
+                entry, end = self._decode(pos)
+                if end is None:
+                    break
+                entries.append(entry)
+                self.entries_seen += 1
+                pos = end
+            else:  # done
+                pos = len(self._buffer)
+
+        self._buffer = self._buffer[pos:]
+        return entries
+
+    def close(self):
+        """Marks the end of the body; raises if the object was incomplete."""
+        self._closed = True
+        if self._state != "done":
+            raise ValueError("Search response ended before the JSON object was complete")
+
+    def _skip_whitespace(self, pos):
+        while pos < len(self._buffer) and self._buffer[pos] in _WHITESPACE:
+            pos += 1
+        return pos
+
+    def _decode(self, pos):
+        """Returns (value, end) or (None, None) if the value is not complete in the buffer yet."""
+        try:
+            value, end = _decoder.raw_decode(self._buffer, pos)
+        except json.JSONDecodeError:
+            return None, None
+        if not self._closed and (end >= len(self._buffer) or (
+                isinstance(value, (int, float)) and self._buffer[end] in _NUMBER_CHARS)):
+            return None, None  # A number cut by the chunk boundary ("12." + "5") may still continue
+        return value, end
+
+
+def stream_json_response(response, array_key="data", on_entry=None, chunk_size=16384, started_at=None, raw_chunks=None):
+    """
+    Parses a `requests` response opened with `stream=True` while the body arrives.
+    `on_entry(entry)` is called for each entry of `array_key` as soon as it is decoded; what it
+    returns is kept in the parsed array instead of the entry, so no second list is needed.
+    If `raw_chunks` is a list, the received byte chunks are appended to it (references, no copy).
+
+    Returns (parsed object, metrics) where metrics has time_to_first_entry_ms, total_ms,
+    entries and peak_buffer_chars.
+    """
+    started_at = started_at or time.perf_counter()
+    parser = StreamingArrayParser(array_key)
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    entries = []
+    first_entry_at = None
+
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        if raw_chunks is not None:
+            raw_chunks.append(chunk)
+        for entry in parser.feed(utf8.decode(chunk)):
+            if first_entry_at is None:
+                first_entry_at = time.perf_counter()
+            entries.append(on_entry(entry) if on_entry else entry)
+    for entry in parser.feed(utf8.decode(b"", final=True)):
+        entries.append(on_entry(entry) if on_entry else entry)
+    parser.close()
+
+    parsed = dict(parser.fields)
+    if parser.array_found:
+        parsed[array_key] = entries
+    metrics = {
+        "time_to_first_entry_ms": round((first_entry_at - started_at) * 1000) if first_entry_at else None,
+        "total_ms": round((time.perf_counter() - started_at) * 1000),
+        "entries": len(entries),
+        "peak_buffer_chars": parser.peak_buffer_chars,
+    }
+    return parsed, metrics
@@ -0,0 +1,262 @@
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import openai
+from dotenv import load_dotenv
+from tools.turn_memo import memoize
+from tools import deadline
+from tools.circuit_breaker import CircuitOpen, get_breaker
+from tools.llm_router import llm_router
+from tools import model_policy
+from tools.prompt_registry import record_usage
+from tools.llm_usage import record_llm_call, record_memo_hit
+from tools.tracing import record_span
+
+# ✅ Load environment variables
+load_dotenv()
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL")
+DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "15"))  # Cap per LLM call, shortened to the turn budget
+
+# ✅ In-call requests on the voice path, where tail latency is heard as silence
+HEDGED_CALL_SITES = {
+    call_site.strip()
+    for call_site in os.getenv("LLM_HEDGED_CALL_SITES", "flight_selection,flight_query,ask_for_missing_details,detect_intent").split(",")
+    if call_site.strip()
+}
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+hedge_stats = {"hedged": 0, "hedge_wins": 0}
+
+deepseek_headers = {
+    "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+    "Content-Type": "application/json",
+}
+
+_openai_client = None
+_async_openai_client = None
+
+
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = openai.OpenAI(api_key=OPENAI_API_KEY)
+    return _openai_client
+
+
+def get_async_openai_client():
+    global _async_openai_client
+    if _async_openai_client is None:
+        _async_openai_client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
+    return _async_openai_client
+
+
+def chat_completion(messages, model="gpt-4o", provider="openai", call_site=None, hedge=None, **params):
+    """
+    Single entry point for side-channel LLM calls (OpenAI or DeepSeek).
+    Model, max_tokens and temperature come from the model policy of `call_site` when it has
+    one (tools/model_policy.py). Identical prompts within one caller turn are sent only once.
+
+    Each call only gets what is left of the turn's latency budget. The router may send the
+    request to a faster healthy backend of the same class; call sites in HEDGED_CALL_SITES
+    (or `hedge=True`) send a second request when the first one is slower than usual.
+
+    Returns the stripped message content; raises on API errors and on an exhausted budget.
+    """
+    call_site = call_site or model
+    caller = _caller_name(sys._getframe(1))
+    provider, model, params = model_policy.resolve(call_site, provider, model, params)
+    if hedge is None:
+        hedge = call_site in HEDGED_CALL_SITES
+    computed = False
+
+    def compute():
+        nonlocal computed
+        computed = True
+        return _create_completion(provider, model, messages, params, call_site, hedge, caller)
+
+    content = memoize(f"llm:{call_site}", (provider, model, messages, params), compute)
+    if not computed:
+        record_memo_hit(call_site)
+    return content
+
+
+def _caller_name(frame):
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+
+def _create_completion(provider, model, messages, params, call_site, hedge, caller):
+    backends = llm_router.route(provider, model)
+    if hedge:
+        secondary = llm_router.hedge_backend(backends)
+        delay = llm_router.hedge_delay(backends[0])
+        if secondary is not None and delay is not None:
+            return _hedged_completion(backends[0], secondary, delay, messages, params, call_site, caller)
+
+    for backend in backends[:-1]:
+        try:
+            return _send(backend, messages, params, call_site, caller)
+        except CircuitOpen:
+            continue  # Nothing was sent, try the next backend of the class
+    return _send(backends[-1], messages, params, call_site, caller)
+
+
+def _hedged_completion(primary, secondary, delay, messages, params, call_site, caller):
+    """
+    Sends the request to the best backend and, if it has not answered within `delay` (its
+    rolling p95 latency), to another healthy backend. The first answer wins; the loser's
+    result is dropped (an HTTP request already in flight cannot be aborted).
+    """
+    first = _hedge_executor.submit(_send, primary, messages, params, call_site, caller)
+    done, _ = wait([first], timeout=delay)
+    if done and first.exception() is None:
+        return first.result()
+    if done and isinstance(first.exception(), deadline.BudgetExhausted):
+        raise first.exception()
+
+    hedge_stats["hedged"] += 1
+    second = _hedge_executor.submit(_send, secondary, messages, params, call_site, caller)
+    pending = {first, second} - done
+    error = first.exception() if done else None
+    while pending:
+        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in finished:
+            if future.exception() is None:
+                for loser in pending:
+                    loser.cancel()
+                if future is second:
+                    hedge_stats["hedge_wins"] += 1
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def _send(backend, messages, params, call_site, caller=None):
+    """Calls one backend and records its latency, outcome and token usage."""
+    started = time.perf_counter()
+    try:
+        content, usage = _send_to_provider(backend[0], backend[1], messages, params, call_site)
+    except (deadline.BudgetExhausted, CircuitOpen):
+        raise  # No request was sent
+    except Exception:
+        _record_request(backend, call_site, caller, None, time.perf_counter() - started, False)
+        raise
+    _record_request(backend, call_site, caller, usage, time.perf_counter() - started, True)
+    return content
+
+
+def _record_request(backend, call_site, caller, usage, latency, ok, route_sample=True):
+    """Instrumentation of every side-channel LLM request: router stats, prompt cache and cost accounting."""
+    if route_sample:
+        llm_router.record(backend, latency, ok)
+    if usage:
+        record_usage(call_site, usage["prompt_tokens"], usage["cached_tokens"])
+    record_llm_call(call_site, backend[0], backend[1], usage, latency, ok, caller)
+    record_span(f"llm.{call_site}", latency, ok=ok, model=f"{backend[0]}:{backend[1]}", **(usage or {}))
+
+
+def _send_to_provider(provider, model, messages, params, call_site):
+    if provider == "deepseek":
+        payload = {"model": model, "messages": messages, **params}
+        response = deadline.post(
+            DEEPSEEK_API_URL, f"llm:{call_site}", cap=LLM_CALL_TIMEOUT, breaker="deepseek", headers=deepseek_headers, json=payload
+        )
+        response.raise_for_status()
+        data = response.json()
+        usage = data.get("usage") or {}
+        return data["choices"][0]["message"]["content"].strip(), {
+            "prompt_tokens": usage.get("prompt_tokens") or 0,
+            "completion_tokens": usage.get("completion_tokens") or 0,
+            "cached_tokens": usage.get("prompt_cache_hit_tokens") or 0,
+        }
+
+    # ✅ No client retries: a retry would not fit in the remaining budget anyway
+    timeout = deadline.call_timeout(f"llm:{call_site}", cap=LLM_CALL_TIMEOUT)
+    client = get_openai_client().with_options(timeout=timeout, max_retries=0)
+    try:
+        response = get_breaker("openai").call(client.chat.completions.create, model=model, messages=messages, **params)
+    except openai.APITimeoutError:
+        deadline.record_timeout(f"llm:{call_site}")
+        raise
+    return response.choices[0].message.content.strip(), _openai_usage(response.usage)
+
+
+def _openai_usage(usage):
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "completion_tokens": usage.completion_tokens or 0,
+        "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+    }
+
+
+async def stream_chat_completion(messages, model="gpt-4o", provider="openai", call_site=None, **params):
+    """
+    Async variant of chat_completion for long spoken answers: yields the text as it is generated,
+    so speech synthesis can start on the first sentence. Same model policy, routing, breakers and
+    turn budget; streamed answers are not memoized.
+
+    Falls back to the next backend only while nothing has been yielded yet. Backends without
+    streaming support (DeepSeek) yield their complete answer at once.
+    """
+    call_site = call_site or model
+    caller = _caller_name(sys._getframe(1))  # The consumer of the first token: the agent's stream
+    provider, model, params = model_policy.resolve(call_site, provider, model, params)
+    backends = llm_router.route(provider, model)
+    for i, backend in enumerate(backends):
+        started = False
+        try:
+            if backend[0] != "openai":
+                yield await asyncio.to_thread(_send, backend, messages, params, call_site, caller)
+                return
+            async for delta in _stream_openai(backend, messages, params, call_site, caller):
+                started = True
+                yield delta
+            return
+        except CircuitOpen:
+            if started or i == len(backends) - 1:
+                raise
+
+
+async def _stream_openai(backend, messages, params, call_site, caller):
+    provider, model = backend
+    timeout = deadline.call_timeout(f"llm:{call_site}", cap=LLM_CALL_TIMEOUT)
+    breaker = get_breaker(provider)
+    breaker.before_call()
+    client = get_async_openai_client().with_options(timeout=timeout, max_retries=0)
+    started = time.perf_counter()
+    ok, finished, usage = True, False, None
+    try:
+        stream = await client.chat.completions.create(
+            model=model, messages=messages, stream=True, stream_options={"include_usage": True}, **params
+        )
+        # ✅ Closes the HTTP response also when the listener stops reading early (barge-in)
+        async with stream:
+            async for chunk in stream:
+                if chunk.usage is not None:  # Sent with the last chunk
+                    usage = _openai_usage(chunk.usage)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        finished = True
+    except openai.APITimeoutError:
+        ok = False
+        deadline.record_timeout(f"llm:{call_site}")
+        raise
+    except Exception:
+        ok = False
+        raise
+    finally:
+        # ✅ A stream closed early by the listener (barge-in) is no upstream failure and no latency sample
+        duration = time.perf_counter() - started
+        breaker.record(ok, duration)
+        _record_request(backend, call_site, caller, usage, duration, ok, route_sample=finished or not ok)
+
+
+def llm_routing_summary():
+    """Rolling latency/error stats per backend, re-routed requests and hedge counters."""
+    return {**llm_router.summary(), "hedging": dict(hedge_stats)}
@@ -0,0 +1,170 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from tools.circuit_breaker import is_open
+
+logger = logging.getLogger("llm-router")
+
+LLM_ROUTING = os.getenv("LLM_ROUTING", "on") == "on"
+ROUTER_WINDOW = float(os.getenv("LLM_ROUTER_WINDOW", "300"))  # Seconds of calls the latency percentiles cover
+ROUTER_MIN_SAMPLES = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", "5"))  # Samples before a backend's latency is trusted
+ROUTER_MAX_ERROR_RATE = float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.3"))
+ROUTER_EXPLORE_RATE = float(os.getenv("LLM_ROUTER_EXPLORE_RATE", "0.05"))  # Share of calls sent to a random healthy backend
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.3"))  # Seconds; floor of the measured p95
+
+# ✅ Request classes: interchangeable backends ("provider:model"), in order of preference
+ROUTE_CLASSES = {
+    "large": os.getenv("LLM_ROUTE_LARGE", "openai:gpt-4o,deepseek:deepseek-chat" if os.getenv("DEEPSEEK_API_URL") else "openai:gpt-4o"),
+    "small": os.getenv("LLM_ROUTE_SMALL", "openai:gpt-4o-mini"),
+}
+MODEL_CLASSES = {
+    "gpt-4": "large",
+    "gpt-4o": "large",
+    "deepseek-chat": "large",
+    "gpt-4o-mini": "small",
+}
+
+
+def _parse_backends(spec):
+    backends = []
+    for item in spec.split(","):
+        provider, _, model = item.strip().partition(":")
+        if provider and model:
+            backends.append((provider, model))
+    return backends
+
+
+def _percentile(values, percentile):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+class BackendStats:
+    """
+    Rolling latency and error window of one (provider, model). Recorded from hedge and
+    step threads while the router reads it, so the window is only touched under its lock.
+    """
+
+    def __init__(self, window=ROUTER_WINDOW):
+        self.window = window
+        self.calls = 0
+        self.errors = 0
+        self._samples = deque()  # (finished_at, latency_seconds, ok)
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        now = time.monotonic()
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.errors += 1
+            self._samples.append((now, latency, ok))
+            while self._samples and now - self._samples[0][0] > self.window:
+                self._samples.popleft()
+
+    def _snapshot(self):
+        with self._lock:
+            return list(self._samples)
+
+    def latencies(self):
+        return [latency for _, latency, ok in self._snapshot() if ok]
+
+    def percentile(self, percentile):
+        latencies = self.latencies()
+        return _percentile(latencies, percentile) if len(latencies) >= ROUTER_MIN_SAMPLES else None
+
+    def error_rate(self):
+        samples = self._snapshot()
+        if not samples:
+            return 0.0
+        return sum(1 for _, _, ok in samples if not ok) / len(samples)
+
+    def summary(self):
+        with self._lock:
+            calls, errors, samples = self.calls, self.errors, list(self._samples)
+        latencies = [latency for _, latency, ok in samples if ok]
+        return {
+            "calls": calls,
+            "errors": errors,
+            "window_error_rate": round(sum(1 for _, _, ok in samples if not ok) / len(samples), 3) if samples else 0.0,
+            "p50_ms": round(_percentile(latencies, 50) * 1000) if latencies else None,
+            "p95_ms": round(_percentile(latencies, 95) * 1000) if latencies else None,
+        }
+
+
+class LLMRouter:
+    """
+    Picks the backend for each LLM request among the backends of its request class:
+    healthy ones (breaker closed, low error rate) first, the fastest by rolling p50 first.
+    Backends without enough samples keep their configured preference.
+    """
+
+    def __init__(self, route_classes=None, model_classes=None, enabled=LLM_ROUTING):
+        self.route_classes = {name: _parse_backends(spec) for name, spec in (route_classes or ROUTE_CLASSES).items()}
+        self.model_classes = model_classes or MODEL_CLASSES
+        self.enabled = enabled
+        self.stats = {}  # (provider, model) -> BackendStats
+        self.routed = {}  # "requested -> chosen" -> count
+        self._lock = threading.Lock()
+
+    def _stats(self, backend):
+        stats = self.stats.get(backend)
+        if stats is None:
+            with self._lock:
+                stats = self.stats.setdefault(backend, BackendStats())
+        return stats
+
+    def _healthy(self, backend):
+        return not is_open(backend[0]) and self._stats(backend).error_rate() < ROUTER_MAX_ERROR_RATE
+
+    def route(self, provider, model):
+        """Returns the candidate backends for a request for `provider`/`model`, best first."""
+        requested = (provider, model)
+        pool = self.route_classes.get(self.model_classes.get(model), [])
+        if not self.enabled or not pool:
+            return [requested]
+
+        candidates = list(dict.fromkeys([requested] + pool))
+        healthy = [backend for backend in candidates if self._healthy(backend)]
+        p50s = {backend: self._stats(backend).percentile(50) for backend in healthy}
+        if all(p50 is not None for p50 in p50s.values()):
+            healthy.sort(key=p50s.get)  # Until every backend is measured, the preference order stands
+        if len(healthy) > 1 and random.random() < ROUTER_EXPLORE_RATE:
+            explored = random.choice(healthy[1:])  # Keeps the latency of the other backends measured
+            healthy.remove(explored)
+            healthy.insert(0, explored)
+        ranked = healthy + [backend for backend in candidates if backend not in healthy]
+
+        if ranked[0] != requested:
+            key = f"{provider}:{model} -> {ranked[0][0]}:{ranked[0][1]}"
+            self.routed[key] = self.routed.get(key, 0) + 1
+            logger.debug("LLM request routed %s", key)
+        return ranked
+
+    def record(self, backend, latency, ok):
+        self._stats(backend).record(latency, ok)
+
+    def hedge_delay(self, backend):
+        """
+        Seconds to wait for `backend` before a hedged request is sent, or None while it has
+        fewer than ROUTER_MIN_SAMPLES answers: without a measured p95 a hedge doubles the load blindly.
+        """
+        delay = self._stats(backend).percentile(HEDGE_PERCENTILE)
+        return max(HEDGE_MIN_DELAY, delay) if delay is not None else None
+
+    def hedge_backend(self, backends):
+        """The healthy backend after `backends[0]` a hedged request goes to, or None (never the same one)."""
+        return next((backend for backend in backends[1:] if backend != backends[0] and self._healthy(backend)), None)
+
+    def summary(self):
+        return {
+            "backends": {f"{provider}:{model}": stats.summary() for (provider, model), stats in list(self.stats.items())},
+            "routed": dict(self.routed),
+        }
+
+
+llm_router = LLMRouter()
@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import threading
+from tools.audit_log import audit_log
+from tools.logging_config import call_context
+from tools.worker_metrics import counter, histogram
+
+logger = logging.getLogger("llm-usage")
+
+# ✅ USD per 1M tokens: (input, cached input, output). LLM_PRICES='{"gpt-4o": [2.5, 1.25, 10]}' updates entries
+LLM_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4": (30.00, 30.00, 60.00),
+    "deepseek-chat": (0.27, 0.07, 1.10),
+}
+try:
+    LLM_PRICES.update({model: tuple(price) for model, price in json.loads(os.getenv("LLM_PRICES", "{}")).items()})
+except (ValueError, TypeError) as e:
+    logger.error("Invalid LLM_PRICES: %s", e)
+
+LLM_USAGE_CALLS = int(os.getenv("LLM_USAGE_CALLS", "50"))  # Calls whose totals are kept (the worker totals keep counting)
+
+_lock = threading.Lock()
+LLM_DURATION = histogram("llm_request_duration_seconds", "Duration of a side-channel LLM request", ["call_site", "provider"])
+LLM_ERRORS = counter("llm_errors_total", "Failed side-channel LLM requests", ["call_site", "provider"])
+LLM_TOKENS = counter("llm_tokens_total", "Side-channel LLM tokens by kind (prompt, cached, completion)", ["call_site", "kind"])
+LLM_COST = counter("llm_cost_usd_total", "Side-channel LLM cost in USD", ["call_site"])
+LLM_MEMO_HITS = counter("llm_memo_hits_total", "LLM requests answered from the turn memo", ["call_site"])
+
+usage_by_call_site = {}  # Worker lifetime: call_site -> totals
+usage_by_call = {}  # call_id -> totals over all call sites, most recent LLM_USAGE_CALLS calls
+calls_seen = 0
+
+
+def call_cost(model, prompt_tokens, completion_tokens, cached_tokens):
+    """USD cost of one request (0 for models without a price entry)."""
+    price = LLM_PRICES.get(model)
+    if price is None:
+        return 0.0
+    input_price, cached_price, output_price = price
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * input_price + cached_tokens * cached_price + completion_tokens * output_price) / 1_000_000
+
+
+def _empty_totals():
+    return {
+        "requests": 0, "errors": 0, "memo_hits": 0, "prompt_tokens": 0, "completion_tokens": 0,
+        "cached_tokens": 0, "cost_usd": 0.0, "latency_s": 0.0, "models": {}, "callers": {},
+    }
+
+
+def _call_totals(call_id):
+    global calls_seen
+    totals = usage_by_call.get(call_id)
+    if totals is None:
+        totals = usage_by_call[call_id] = _empty_totals()
+        calls_seen += 1
+        while len(usage_by_call) > LLM_USAGE_CALLS:
+            del usage_by_call[next(iter(usage_by_call))]
+    return totals
+
+
+def _add(totals, record):
+    totals["requests"] += 1
+    totals["errors"] += not record["ok"]
+    totals["prompt_tokens"] += record["prompt_tokens"]
+    totals["completion_tokens"] += record["completion_tokens"]
+    totals["cached_tokens"] += record["cached_tokens"]
+    totals["cost_usd"] += record["cost_usd"]
+    totals["latency_s"] += record["latency_s"]
+    totals["models"][record["model"]] = totals["models"].get(record["model"], 0) + 1
+    totals["callers"][record["caller"]] = totals["callers"].get(record["caller"], 0) + 1
+
+
+def record_llm_call(call_site, provider, model, usage, latency, ok, caller=None):
+    """
+    Records one LLM request (also failed and hedged ones: they are billed or at least slow).
+    `usage` is {"prompt_tokens", "completion_tokens", "cached_tokens"} as reported by the provider.
+    """
+    usage = usage or {}
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    completion_tokens = usage.get("completion_tokens") or 0
+    cached_tokens = usage.get("cached_tokens") or 0
+    record = {
+        "call_site": call_site,
+        "caller": caller or call_site,
+        "provider": provider,
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cached_tokens": cached_tokens,
+        "cost_usd": call_cost(model, prompt_tokens, completion_tokens, cached_tokens),
+        "latency_s": latency,
+        "ok": ok,
+    }
+    call_id = call_context["call_id"]
+    with _lock:
+        _add(usage_by_call_site.setdefault(call_site, _empty_totals()), record)
+        _add(_call_totals(call_id), record)
+    LLM_DURATION.observe(latency, call_site=call_site, provider=provider)
+    if not ok:
+        LLM_ERRORS.inc(call_site=call_site, provider=provider)
+    LLM_TOKENS.inc(prompt_tokens, call_site=call_site, kind="prompt")
+    LLM_TOKENS.inc(cached_tokens, call_site=call_site, kind="cached")
+    LLM_TOKENS.inc(completion_tokens, call_site=call_site, kind="completion")
+    LLM_COST.inc(record["cost_usd"], call_site=call_site)
+    audit_log.log("llm_call", record, call_id=call_id)
+
+
+def record_memo_hit(call_site):
+    """Counts a request answered from the turn memo (no tokens spent)."""
+    with _lock:
+        usage_by_call_site.setdefault(call_site, _empty_totals())["memo_hits"] += 1
+        _call_totals(call_context["call_id"])["memo_hits"] += 1
+    LLM_MEMO_HITS.inc(call_site=call_site)
+
+
+def _rounded(totals):
+    return {
+        **totals,
+        "cost_usd": round(totals["cost_usd"], 6),
+        "latency_s": round(totals["latency_s"], 3),
+        "avg_latency_ms": round(totals["latency_s"] / totals["requests"] * 1000) if totals["requests"] else None,
+        "models": dict(totals["models"]),
+        "callers": dict(totals["callers"]),
+    }
+
+
+def llm_usage_summary(call_id=None):
+    """
+    Side-channel LLM usage (outside the voice pipeline): totals of the call `call_id` (default the
+    current one), of the worker, and per call site sorted by cost, most expensive first.
+    """
+    call_id = call_id or call_context["call_id"]
+    with _lock:
+        by_call_site = sorted(usage_by_call_site.items(), key=lambda item: item[1]["cost_usd"], reverse=True)
+        worker = {"calls": calls_seen}
+        for field in ("requests", "errors", "memo_hits", "prompt_tokens", "completion_tokens", "cached_tokens", "cost_usd"):
+            worker[field] = sum(totals[field] for totals in usage_by_call_site.values())
+        worker["cost_usd"] = round(worker["cost_usd"], 6)
+        return {
+            "call": _rounded(usage_by_call.get(call_id, _empty_totals())),
+            "worker": worker,
+            "by_call_site": {call_site: _rounded(totals) for call_site, totals in by_call_site},
+        }
@@ -1,22 +1,23 @@
 import json
+import logging
 import re
 from typing import Optional
 
-from langchain_openai import ChatOpenAI
 import spacy
 from dateutil import parser
 import os
 from dotenv import load_dotenv
-import openai
+from tools.llm_client import chat_completion
+from tools.prompt_registry import register_prompt
+from tools.turn_memo import turn_memoized
+
+logger = logging.getLogger("location-extractor")
 # ✅ Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 # ✅ Load NLP Model (Ensure `en_core_web_sm` is installed)
 nlp = spacy.load("en_core_web_sm")
 
-# ✅ Initialize GPT-4
-llm = ChatOpenAI(model="gpt-4o", openai_api_key=OPENAI_API_KEY)
-
 
 def extract_location(text, keyword=None):
     """
@@ -41,39 +42,32 @@ def extract_location(text, keyword=None):
     return extract_location_with_nlp(text, keyword)
 
 
-def extract_locations_with_gpt(text):
-    """
-    Uses GPT-4 to extract origin and destination locations in structured JSON format.
-    Example: "I want to go to Madrid from Dhaka" → {"origin": "Dhaka", "destination": "Madrid"}
-    """
-
-    prompt = f"""
-    You are a travel assistant. Extract the **origin** and **destination** from the following text.
-
-    **User Input:** "{text}"
+LOCATIONS_PROMPT = register_prompt(
+    "extract_locations",
+    system="""
+    You are a helpful travel assistant. Extract the **origin** and **destination** from the user's text.
 
     Respond in this exact JSON format:
-    {{
+    {
         "origin": "<extracted_origin>",
         "destination": "<extracted_destination>"
-    }}
+    }
 
     If a location is missing, return `"null"` for that field.
+    """,
+    user='**User Input:** "{text}"',
+)
+
+
+@turn_memoized("extract_locations")
+def extract_locations_with_gpt(text):
+    """
+    Uses GPT-4 to extract origin and destination locations in structured JSON format.
+    Example: "I want to go to Madrid from Dhaka" → {"origin": "Dhaka", "destination": "Madrid"}
     """
 
     try:
-        client = openai.Client()  # ✅ Initialize OpenAI client
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a helpful travel assistant."},
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=50,
-            temperature=0.3,
-        )
-
-        response_text = response.choices[0].message.content.strip()
+        response_text = chat_completion(LOCATIONS_PROMPT.messages(text=text), call_site="extract_locations")
 
         # ✅ Convert JSON response into a dictionary
         gpt_locations = eval(response_text)
@@ -81,7 +75,7 @@ def extract_locations_with_gpt(text):
         return gpt_locations if isinstance(gpt_locations, dict) else None
 
     except Exception as e:
-        print(f"❌ GPT-4 Extraction Failed: {e}")
+        logger.error("❌ GPT-4 Extraction Failed: %s", e)
         return None  # Fail-safe fallback
 
 
@@ -0,0 +1,152 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL")  # Level of the application loggers, e.g. DEBUG
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")  # Per-logger levels, e.g. "flight-search-api=DEBUG,livekit=WARNING"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# ✅ Loggers of this application (the rest belong to libraries)
+APP_LOGGERS = [
+    "inbound-flight-agent",
+    "agent-selector",
+    "booking-flow",
+    "confirm-booking",
+    "fare-calendar",
+    "flight-search",
+    "flight-search-api",
+    "flight-selection",
+    "language-detection",
+    "passenger-details",
+    "detect-intent",
+    "location-extractor",
+    "nlp-utils",
+    "json-memory",
+    "turn-memo",
+    "async-steps",
+    "speculative-search",
+    "audit-log",
+    "deadline",
+    "circuit-breaker",
+    "llm-router",
+    "model-policy",
+    "speech-stream",
+    "prompt-registry",
+    "llm-usage",
+    "tracing",
+    "loop-watchdog",
+    "worker-metrics",
+    "call-profiler",
+    "memory-guard",
+]
+
+# ✅ One caller per worker process, so the correlation IDs are process-wide
+call_context = {"call_id": "-", "room": "-", "participant": "-"}
+
+_listener = None
+
+
+def set_call_context(room=None, participant=None):
+    """Sets the correlation IDs attached to every log record of the current call. Returns the call_id."""
+    call_context["call_id"] = uuid.uuid4().hex[:12]
+    call_context["room"] = room or "-"
+    call_context["participant"] = participant or "-"
+    return call_context["call_id"]
+
+
+class CallContextFilter(logging.Filter):
+    """Adds `call_id`, `room` and `participant` to each record."""
+
+    def filter(self, record):
+        for key, value in call_context.items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including the correlation IDs."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "call_id": getattr(record, "call_id", "-"),
+            "room": getattr(record, "room", "-"),
+            "participant": getattr(record, "participant", "-"),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: records are dropped when the queue is full."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+def parse_levels(spec):
+    """Parses "name=LEVEL,name=LEVEL" into {name: level}."""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level=LOG_LEVEL, levels=LOG_LEVELS, log_format=LOG_FORMAT):
+    """
+    Moves the root handlers (LiveKit's, or a stream handler when there are none) behind a queue,
+    so emitting a record never waits for I/O, and applies the per-logger levels.
+    Safe to call more than once.
+    """
+    global _listener
+
+    if level:
+        for name in APP_LOGGERS:
+            logging.getLogger(name).setLevel(level.upper())
+    for name, logger_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    if _listener is not None:
+        return
+
+    root = logging.getLogger()
+    handlers = [handler for handler in root.handlers if not isinstance(handler, QueueHandler)]
+    if not handlers:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [%(room)s/%(participant)s %(call_id)s] %(message)s"
+        ))
+        handlers = [stream_handler]
+        if root.level == logging.WARNING:
+            root.setLevel(logging.INFO)
+    if log_format == "json":
+        for handler in handlers:
+            handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = _DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(CallContextFilter())
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from tools.tracing import record_span
+from tools.worker_metrics import histogram, register_collector
+
+logger = logging.getLogger("loop-watchdog")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Moves one level up
+
+LOOP_WATCHDOG = os.getenv("LOOP_WATCHDOG", "on") == "on"
+LOOP_WATCHDOG_INTERVAL = float(os.getenv("LOOP_WATCHDOG_INTERVAL", "0.1"))  # Seconds between two lag probes
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "0.1"))  # Lag (seconds) from which the loop counts as blocked
+LOOP_LAG_TOP_N = int(os.getenv("LOOP_LAG_TOP_N", "10"))
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float("inf"))  # Histogram upper bounds, seconds
+LOOP_LAG = histogram("event_loop_lag_seconds", "Event loop scheduling lag", buckets=LAG_BUCKETS)
+
+# ✅ Our own code: the blocking call is attributed to the innermost frame in these directories
+APP_DIRS = tuple(os.path.join(BASE_DIR, name) + os.sep for name in ("agents", "tools", "memory"))
+APP_FILES = (os.path.join(BASE_DIR, "agent.py"), os.path.join(BASE_DIR, "app.py"))
+# ✅ Shared plumbing that every upstream call passes through; the business function above it is the offender
+PLUMBING_MODULES = {
+    "tools.deadline", "tools.circuit_breaker", "tools.llm_client", "tools.turn_memo", "tools.async_steps",
+    "tools.tracing", "tools.loop_watchdog", "memory.json_memory",
+}
+
+
+def _is_app_frame(filename):
+    return filename.startswith(APP_DIRS) or filename in APP_FILES
+
+
+def _module_of(frame):
+    return frame.f_globals.get("__name__", "?")
+
+
+def attribute_stack(frame):
+    """
+    Returns (call_site, blocking_call) for the stack ending in `frame`: the innermost application
+    function outside the shared plumbing, and the first library function it (indirectly) called,
+    e.g. ("agents.confirm_booking_agent.create_booking", "requests.api.post").
+    """
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()  # Outermost first
+
+    call_site = blocking_call = None
+    innermost_app = None
+    for i, current in enumerate(frames):
+        if not _is_app_frame(current.f_code.co_filename):
+            continue
+        innermost_app = i
+        if _module_of(current) not in PLUMBING_MODULES:
+            call_site = f"{_module_of(current)}.{current.f_code.co_name}"
+    if innermost_app is not None and innermost_app + 1 < len(frames):
+        callee = frames[innermost_app + 1]
+        blocking_call = f"{_module_of(callee)}.{callee.f_code.co_name}"
+    elif frames:
+        leaf = frames[-1]
+        blocking_call = f"{_module_of(leaf)}.{leaf.f_code.co_name}"
+    return call_site or "<loop>", blocking_call or "<unknown>"
+
+
+class LoopWatchdog:
+    """
+    Measures how late the event loop runs a task that sleeps `interval` (scheduling lag).
+
+    A sampler thread watches the probe's heartbeat; when the loop has not come back for
+    `threshold` seconds it takes the stack of the loop thread, i.e. of the blocking frame,
+    so the lag measured afterwards is attributed to that call site.
+    """
+
+    def __init__(self, interval=LOOP_WATCHDOG_INTERVAL, threshold=LOOP_LAG_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.histogram = [0] * len(LAG_BUCKETS)
+        self.samples = 0
+        self.lag_sum = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.offenders = {}  # "call_site -> blocking_call" -> {"count", "total_lag_s", "max_lag_s", "stack"}
+        self._heartbeat = None
+        self._captured = None  # (heartbeat, key, stack) of the stall in progress
+        self._loop_thread_id = None
+        self._task = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts the probe on the running loop (once per process)."""
+        if self._task is not None or not LOOP_WATCHDOG:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        threading.Thread(target=self._sample, name="loop-watchdog", daemon=True).start()
+        logger.info("Event loop watchdog started (threshold %.0f ms)", self.threshold * 1000)
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._observe(max(0.0, loop.time() - expected))
+
+    def _sample(self):
+        while True:
+            time.sleep(self.threshold / 2)
+            heartbeat = self._heartbeat
+            if heartbeat is None or time.monotonic() - heartbeat < self.interval + self.threshold:
+                continue
+            if self._captured is not None and self._captured[0] == heartbeat:
+                continue  # This stall is already attributed
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            call_site, blocking_call = attribute_stack(frame)
+            stack = "".join(traceback.format_stack(frame, limit=15))
+            with self._lock:
+                self._captured = (heartbeat, f"{call_site} -> {blocking_call}", stack)
+
+    def _observe(self, lag):
+        LOOP_LAG.observe(lag)
+        with self._lock:
+            self.samples += 1
+            self.lag_sum += lag
+            self.max_lag = max(self.max_lag, lag)
+            self.histogram[next(i for i, bound in enumerate(LAG_BUCKETS) if lag <= bound)] += 1
+            if lag < self.threshold:
+                return
+            self.stalls += 1
+            captured, self._captured = self._captured, None
+            key, stack = (captured[1], captured[2]) if captured else ("<unattributed>", "")
+            offender = self.offenders.get(key)
+            first_seen = offender is None
+            if first_seen:
+                offender = self.offenders[key] = {"count": 0, "total_lag_s": 0.0, "max_lag_s": 0.0, "stack": stack}
+            offender["count"] += 1
+            offender["total_lag_s"] += lag
+            offender["max_lag_s"] = max(offender["max_lag_s"], lag)
+        # ✅ The stall shows up in the waterfall of the turn it delayed
+        record_span("loop.blocked", lag, ok=False, offender=key)
+        if first_seen:
+            logger.warning("🐢 Event loop blocked for %.0f ms by %s\n%s", lag * 1000, key, stack)
+        else:
+            logger.warning("🐢 Event loop blocked for %.0f ms by %s", lag * 1000, key)
+
+    def top_offenders(self, n=LOOP_LAG_TOP_N):
+        with self._lock:
+            ranked = sorted(self.offenders.items(), key=lambda item: item[1]["total_lag_s"], reverse=True)[:n]
+            return [
+                {
+                    "offender": key,
+                    "count": stats["count"],
+                    "total_lag_ms": round(stats["total_lag_s"] * 1000),
+                    "max_lag_ms": round(stats["max_lag_s"] * 1000),
+                }
+                for key, stats in ranked
+            ]
+
+    def summary(self):
+        """Lag histogram (cumulative counts per upper bound, Prometheus-style) and top offenders."""
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(LAG_BUCKETS, self.histogram):
+                cumulative += count
+                buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+            summary = {
+                "samples": self.samples,
+                "stalls": self.stalls,
+                "avg_lag_ms": round(self.lag_sum / self.samples * 1000, 1) if self.samples else None,
+                "max_lag_ms": round(self.max_lag * 1000),
+                "histogram": buckets,
+            }
+        summary["top_offenders"] = self.top_offenders()
+        return summary
+
+
+loop_watchdog = LoopWatchdog()
+
+
+def _offender_metrics():
+    offenders = loop_watchdog.top_offenders()
+    return [(
+        "event_loop_blocked_seconds_total", "counter", "Event loop lag attributed to the blocking call site",
+        [({"offender": item["offender"]}, item["total_lag_ms"] / 1000) for item in offenders],
+    )]
+
+
+register_collector(_offender_metrics)
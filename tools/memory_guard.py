@@ -0,0 +1,162 @@
+import logging
+import os
+import signal
+import threading
+import time
+import tracemalloc
+from tools.audit_log import AUDIT_LOG_DIR
+from tools.worker_metrics import histogram, process_role, register_collector, register_route
+
+try:
+    import psutil  # Optional: RSS; /proc is read without it
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger("memory-guard")
+
+MEMORY_TRACEMALLOC = os.getenv("MEMORY_TRACEMALLOC", "off") == "on"  # Trace from the start; otherwise from the first snapshot request
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "5"))
+MEMORY_SNAPSHOT_TOP = int(os.getenv("MEMORY_SNAPSHOT_TOP", "25"))
+MEMORY_SNAPSHOT_SIGNAL = os.getenv("MEMORY_SNAPSHOT_SIGNAL", "SIGUSR2")  # `kill -USR2 <pid>` writes data/logs/memory-<pid>-*.txt
+MEMORY_SAMPLE_INTERVAL = float(os.getenv("MEMORY_SAMPLE_INTERVAL", "1.0"))  # Seconds between RSS samples of a call
+# ✅ Passed to WorkerOptions: LiveKit warns about / kills a job process above these (0: no limit)
+JOB_MEMORY_WARN_MB = float(os.getenv("JOB_MEMORY_WARN_MB", "300"))
+JOB_MEMORY_LIMIT_MB = float(os.getenv("JOB_MEMORY_LIMIT_MB", "0"))
+MB = 1024 * 1024
+
+CALL_PEAK_RSS = histogram(
+    "call_peak_rss_bytes", "Highest resident memory of the process during a call",
+    buckets=tuple(size * MB for size in (128, 256, 512, 1024, 2048, 4096)) + (float("inf"),),
+)
+
+
+def rss_bytes():
+    """Resident set size of this process (0 if it cannot be read)."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class MemoryGuard:
+    """
+    Memory instrumentation of one process. In the long-lived main worker process: RSS and
+    tracemalloc snapshot diffs on demand (signal or /debug/memory). In a job process, which
+    LiveKit runs for exactly one call and limits with JOB_MEMORY_LIMIT_MB: the call's high-water mark.
+    """
+
+    def __init__(self):
+        self.calls_finished = 0
+        self._call = None  # {"call_id", "start_rss", "peak_rss"} of the active call
+        self._baseline = None
+        self._previous = None
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        """Starts the RSS sampler and the snapshot signal handler (once per process)."""
+        if self._started:
+            return
+        self._started = True
+        if MEMORY_TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        threading.Thread(target=self._sample, name="memory-guard", daemon=True).start()
+        signum = getattr(signal, MEMORY_SNAPSHOT_SIGNAL, None)
+        if signum is None:
+            return
+        try:
+            # ✅ The snapshot is taken off the signal handler, it takes seconds on a large heap
+            signal.signal(signum, lambda *_: threading.Thread(target=self.snapshot_diff, daemon=True).start())
+        except ValueError:  # Not the main thread of the process
+            logger.debug("Memory snapshot signal not installed outside the main thread")
+
+    def _sample(self):
+        while True:
+            time.sleep(MEMORY_SAMPLE_INTERVAL)
+            rss = rss_bytes()
+            with self._lock:
+                if self._call is not None:
+                    self._call["peak_rss"] = max(self._call["peak_rss"], rss)
+
+    def call_started(self, call_id):
+        rss = rss_bytes()
+        with self._lock:
+            self._call = {"call_id": call_id, "start_rss": rss, "peak_rss": rss}
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+    def call_finished(self):
+        """Returns the memory summary of the call that ended."""
+        rss = rss_bytes()
+        with self._lock:
+            self.calls_finished += 1
+            call, self._call = self._call, None
+        if call is None:
+            return None
+        peak = max(call["peak_rss"], rss)
+        CALL_PEAK_RSS.observe(peak)
+        summary = {
+            "start_rss_mb": round(call["start_rss"] / MB, 1),
+            "peak_rss_mb": round(peak / MB, 1),
+            "end_rss_mb": round(rss / MB, 1),
+            "growth_mb": round((rss - call["start_rss"]) / MB, 1),
+            "calls_in_process": self.calls_finished,
+        }
+        if tracemalloc.is_tracing():
+            summary["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / MB, 1)
+        return summary
+
+    def snapshot_diff(self, top=MEMORY_SNAPSHOT_TOP):
+        """
+        Text report of the allocations that grew since the previous and the first snapshot (by
+        source line), also written to data/logs/memory-<pid>-<time>.txt. The first request starts
+        tracemalloc unless MEMORY_TRACEMALLOC=on, so it only sets the baseline.
+        """
+        with self._snapshot_lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ))
+            current, peak = tracemalloc.get_traced_memory()
+            lines = [
+                f"pid {os.getpid()}  rss {rss_bytes() / MB:.1f} MB  traced {current / MB:.1f} MB (peak {peak / MB:.1f} MB)"
+                f"  calls {self.calls_finished}",
+            ]
+            if self._baseline is None:
+                self._baseline = self._previous = snapshot
+                lines.append("Baseline snapshot taken, request again for a diff.")
+            else:
+                for title, reference in (("since previous snapshot", self._previous), ("since baseline", self._baseline)):
+                    lines.append(f"\nTop {top} growth {title}:")
+                    lines.extend(str(stat) for stat in snapshot.compare_to(reference, "lineno")[:top])
+                self._previous = snapshot
+        report = "\n".join(lines) + "\n"
+        os.makedirs(AUDIT_LOG_DIR, exist_ok=True)
+        path = os.path.join(AUDIT_LOG_DIR, f"memory-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(report)
+        logger.info("Memory snapshot diff written to %s", path)
+        return report
+
+
+memory_guard = MemoryGuard()
+
+
+def _memory_metrics():
+    role = {"role": process_role() or "-"}  # Job processes are summed by the server
+    families = [
+        ("process_resident_memory_bytes", "gauge", "Resident memory of the main worker process / of the live job processes", [(role, rss_bytes())]),
+    ]
+    if tracemalloc.is_tracing():
+        families.append(("tracemalloc_traced_bytes", "gauge", "Memory traced by tracemalloc", [(role, tracemalloc.get_traced_memory()[0])]))
+    return families
+
+
+register_collector(_memory_metrics)
+register_route("/debug/memory", memory_guard.snapshot_diff)
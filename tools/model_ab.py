@@ -0,0 +1,130 @@
+"""
+A/B harness for the model policy.
+
+Sends each call site's real prompt over a labelled local dataset once per model tier and reports
+accuracy, errors and latency per call site, e.g.:
+
+    python -m tools.model_ab --call-sites analyze_title,detect_intent --tiers small,large
+
+Datasets are JSON lines in data/model_eval/<call_site>.jsonl: {"args": [...], "expected": ...}.
+A dict `expected` matches when every one of its keys matches the result.
+"""
+import argparse
+import importlib
+import json
+import os
+import re
+import time
+from tabulate import tabulate
+from tools.llm_client import chat_completion
+from tools.llm_router import llm_router
+from tools.model_policy import MODEL_TIERS, policy_for, policy_override
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Moves one level up
+EVAL_DIR = os.path.join(BASE_DIR, "data", "model_eval")
+
+
+
+def _title(text):
+    if text not in ("Mr.", "Ms."):
+        raise ValueError(f"Not a title: {text!r}")
+    return text
+
+
+def _gender(text):
+    return json.loads(text)["gender"]
+
+
+def _country(text):
+    if not text:
+        raise ValueError("Empty country")
+    return text
+
+
+def _intent(text):
+    return json.loads(re.sub(r"```json\n?|```", "", text).strip())["intent"].lower()
+
+
+# ✅ Call site -> (prompt, its argument names, strict parser of the answer). The call-site functions
+# return a default ("Mr.", "other", ...) when the call or the parsing fails, which would be scored
+# as an answer; here any exception is counted as an error instead
+EVAL_TARGETS = {
+    "correct_airport_name": ("tools.utils:AIRPORT_NAME_PROMPT", ["input_text", "known_names"], str.strip),
+    "analyze_title": ("agents.passenger_details_agent:TITLE_PROMPT", ["first_name"], _title),
+    "analyze_gender": ("agents.passenger_details_agent:GENDER_PROMPT", ["name"], _gender),
+    "get_country_from_text": ("agents.language_detection_agent:COUNTRY_PROMPT", ["location_text"], _country),
+    "detect_intent": ("tools.detect_intent:INTENT_PROMPT", ["user_input"], _intent),
+}
+
+
+def load_dataset(call_site):
+    path = os.path.join(EVAL_DIR, f"{call_site}.jsonl")
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _normalize(value):
+    return value.strip().lower() if isinstance(value, str) else value
+
+
+def matches(result, expected):
+    if isinstance(expected, dict):
+        return isinstance(result, dict) and all(_normalize(result.get(k)) == _normalize(v) for k, v in expected.items())
+    return _normalize(result) == _normalize(expected)
+
+
+def _percentile(values, percentile):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))] if ordered else None
+
+
+def evaluate(call_site, tier):
+    """Runs the dataset of `call_site` with the model of `tier`. Returns one report row."""
+    prompt_target, arg_names, parse = EVAL_TARGETS[call_site]
+    module_name, prompt_name = prompt_target.split(":")
+    prompt = getattr(importlib.import_module(module_name), prompt_name)
+    examples = load_dataset(call_site)
+    latencies, correct, errors = [], 0, 0
+
+    with policy_override({call_site: {"tier": tier}}):
+        for example in examples:
+            messages = prompt.messages(**dict(zip(arg_names, example.get("args", []))))
+            started = time.perf_counter()
+            try:
+                result = parse(chat_completion(messages, call_site=call_site))
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            correct += matches(result, example["expected"])
+
+    return {
+        "call_site": call_site,
+        "tier": tier,
+        "model": MODEL_TIERS[tier][1],
+        "current": "*" if policy_for(call_site).get("tier") == tier else "",
+        "examples": len(examples),
+        "accuracy": round(correct / len(examples), 3) if examples else None,
+        "errors": errors,
+        "p50_ms": round(_percentile(latencies, 50)) if latencies else None,
+        "p95_ms": round(_percentile(latencies, 95)) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare model tiers per LLM call site on labelled data.")
+    parser.add_argument("--call-sites", default=",".join(EVAL_TARGETS), help="Comma-separated call sites")
+    parser.add_argument("--tiers", default="small,large", help="Comma-separated model tiers")
+    args = parser.parse_args()
+
+    llm_router.enabled = False  # Measure exactly the tier's model
+    rows = [
+        evaluate(call_site.strip(), tier.strip())
+        for call_site in args.call_sites.split(",") if call_site.strip()
+        for tier in args.tiers.split(",") if tier.strip()
+    ]
+    print(tabulate(rows, headers="keys"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger("model-policy")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Moves one level up
+EXPERIMENTS_FILE = os.path.join(BASE_DIR, "data", "model_experiments.json")
+
+# ✅ Model tiers: (provider, model)
+MODEL_TIERS = {
+    "small": ("openai", "gpt-4o-mini"),
+    "large": ("openai", "gpt-4o"),
+    "deepseek": ("deepseek", "deepseek-chat"),
+}
+
+# ✅ Central model choice per LLM call site. None leaves the parameter at the API default.
+MODEL_POLICY = {
+    "voice_router": {"tier": "small"},
+    "agent_selector": {"tier": "large"},
+    "correct_airport_name": {"tier": "small", "max_tokens": 10, "temperature": 0},
+    "analyze_title": {"tier": "small", "max_tokens": 5, "temperature": 0.5},
+    "analyze_gender": {"tier": "small", "max_tokens": 10, "temperature": 0.5},
+    "get_country_from_text": {"tier": "small", "max_tokens": 10, "temperature": 0},
+    "extract_locations": {"tier": "small", "max_tokens": 50, "temperature": 0.3},
+    "detect_intent": {"tier": "large", "max_tokens": 20, "temperature": 0},
+    "flight_selection": {"tier": "large"},
+    "flight_query": {"tier": "large"},
+    "smart_assistant": {"tier": "large"},
+    "ask_for_missing_details": {"tier": "deepseek", "max_tokens": 200, "temperature": 0.8},
+    "passenger_summary": {"tier": "large", "max_tokens": 150, "temperature": 0.5},
+    "booking_confirmation_message": {"tier": "large"},
+}
+
+# ✅ MODEL_POLICY_OVERRIDES='{"detect_intent": {"tier": "small"}}' changes entries without a deploy
+MODEL_POLICY_OVERRIDES = os.getenv("MODEL_POLICY_OVERRIDES", "")
+# ✅ MODEL_EXPERIMENT=<name> applies the overrides of that experiment from data/model_experiments.json
+MODEL_EXPERIMENT = os.getenv("MODEL_EXPERIMENT", "")
+
+_local = threading.local()
+
+
+def _load_overrides():
+    overrides = {}
+    if MODEL_POLICY_OVERRIDES:
+        try:
+            overrides.update(json.loads(MODEL_POLICY_OVERRIDES))
+        except ValueError as e:
+            logger.error("Invalid MODEL_POLICY_OVERRIDES: %s", e)
+    if MODEL_EXPERIMENT:
+        try:
+            with open(EXPERIMENTS_FILE, "r", encoding="utf-8") as f:
+                experiment = json.load(f).get(MODEL_EXPERIMENT)
+        except (OSError, ValueError) as e:
+            logger.error("Could not load model experiments: %s", e)
+            experiment = None
+        if experiment is None:
+            logger.warning("Model experiment %s not found", MODEL_EXPERIMENT)
+        else:
+            for call_site, entry in experiment.items():
+                overrides[call_site] = {**overrides.get(call_site, {}), **entry}
+    return overrides
+
+
+_overrides = _load_overrides()
+
+
+def policy_for(call_site):
+    """Returns the effective policy entry of `call_site` (empty if it has none)."""
+    entry = dict(MODEL_POLICY.get(call_site, {}))
+    entry.update(_overrides.get(call_site, {}))
+    entry.update(getattr(_local, "overrides", {}).get(call_site, {}))
+    return entry
+
+
+def resolve(call_site, provider, model, params):
+    """
+    Applies the policy of `call_site` to a request. Returns (provider, model, params);
+    values not covered by the policy stay as the caller passed them.
+    """
+    entry = policy_for(call_site)
+    tier = entry.get("tier")
+    if tier in MODEL_TIERS:
+        provider, model = MODEL_TIERS[tier]
+    elif tier:
+        logger.warning("Unknown model tier %s for %s", tier, call_site)
+    params = dict(params)
+    for name in ("max_tokens", "temperature"):
+        if entry.get(name) is not None:
+            params[name] = entry[name]
+    return provider, model, params
+
+
+def policy_model(call_site, default="gpt-4o"):
+    """Model name for call sites that build their own client (LiveKit, LangChain)."""
+    tier = policy_for(call_site).get("tier")
+    return MODEL_TIERS[tier][1] if tier in MODEL_TIERS else default
+
+
+@contextmanager
+def policy_override(overrides):
+    """Temporarily overrides policy entries in the current thread, e.g. {"detect_intent": {"tier": "small"}}."""
+    previous = getattr(_local, "overrides", {})
+    _local.overrides = {**previous, **overrides}
+    try:
+        yield
+    finally:
+        _local.overrides = previous
@@ -1,8 +1,11 @@
+import logging
 import re
 import openai
 import spacy
 from config import OPENAI_API_KEY
 
+logger = logging.getLogger("nlp-utils")
+
 # Load NLP model (English)
 nlp = spacy.load("en_core_web_sm")
 
@@ -38,7 +41,7 @@ class NLPUtils:
             return eval(response.choices[0].message.content.strip())
 
         except Exception as e:
-            print(f"❌ GPT-4 Extraction Failed: {e}")
+            logger.error("❌ GPT-4 Extraction Failed: %s", e)
             return None
 
     def extract_location_with_nlp(self, text, keyword=None):
@@ -0,0 +1,147 @@
+"""
+Registry of the LLM prompts, one per call site. Run `python -m tools.prompt_registry` to list
+the static prefix of every registered prompt with its token count.
+"""
+import importlib
+import logging
+import textwrap
+import threading
+
+try:
+    import tiktoken  # Optional: exact token counts
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger("prompt-registry")
+
+_encoding = None
+_encoding_failed = False
+
+
+def count_tokens(text):
+    """Token count of `text` (o200k via tiktoken, else an estimate of 4 characters per token)."""
+    global _encoding, _encoding_failed
+    if tiktoken is not None and _encoding is None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:  # The encoding file is downloaded on first use
+            logger.warning("tiktoken encoding unavailable, estimating token counts: %s", e)
+            _encoding_failed = True
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+class PromptTemplate:
+    """
+    One LLM prompt, split for provider-side prefix caching:
+
+    - `system`: everything static (role, examples, rules, output format), compiled once at
+      registration, so it is byte-identical on every call and always sent first.
+    - `user`: the minimal dynamic suffix, a str.format template. Slow-changing data (a flight
+      list) comes before the caller's words, so it is part of the cached prefix on the next turn.
+    """
+
+    def __init__(self, name, system, user):
+        self.name = name
+        self.system = textwrap.dedent(system).strip()
+        self.user = textwrap.dedent(user).strip()
+        self._system_tokens = None
+
+    @property
+    def system_tokens(self):
+        if self._system_tokens is None:  # Counted on first use, not at import
+            self._system_tokens = count_tokens(self.system)
+        return self._system_tokens
+
+    def messages(self, **values):
+        """Returns the chat messages for `values`."""
+        suffix = self.user.format(**values)
+        _record_suffix(self.name, count_tokens(suffix))
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": suffix},
+        ]
+
+
+PROMPTS = {}  # name (= LLM call site) -> PromptTemplate
+prompt_stats = {}  # name -> {"calls", "suffix_tokens", "prompt_tokens", "cached_tokens"}
+_stats_lock = threading.Lock()
+
+
+def register_prompt(name, system, user):
+    """Compiles and registers the prompt of LLM call site `name`."""
+    template = PromptTemplate(name, system, user)
+    PROMPTS[name] = template
+    return template
+
+
+def _empty_stats():
+    return {"calls": 0, "suffix_tokens": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+
+def _stats(name):
+    return prompt_stats.setdefault(name, _empty_stats())
+
+
+def _record_suffix(name, tokens):
+    with _stats_lock:
+        stats = _stats(name)
+        stats["calls"] += 1
+        stats["suffix_tokens"] += tokens
+
+
+def record_usage(name, prompt_tokens, cached_tokens):
+    """Adds the provider-reported prompt and cached prompt tokens of one call to `name`."""
+    with _stats_lock:
+        stats = _stats(name)
+        stats["prompt_tokens"] += prompt_tokens or 0
+        stats["cached_tokens"] += cached_tokens or 0
+
+
+def prompt_summary():
+    """Per template: static prefix tokens, average dynamic suffix tokens and cached-token ratio."""
+    with _stats_lock:
+        summary = {}
+        for name in sorted(set(PROMPTS) | set(prompt_stats)):
+            stats = prompt_stats.get(name) or _empty_stats()
+            summary[name] = {
+                "static_tokens": PROMPTS[name].system_tokens if name in PROMPTS else None,
+                "calls": stats["calls"],
+                "avg_suffix_tokens": round(stats["suffix_tokens"] / stats["calls"]) if stats["calls"] else None,
+                "prompt_tokens": stats["prompt_tokens"],
+                "cached_tokens": stats["cached_tokens"],
+                "cached_ratio": round(stats["cached_tokens"] / stats["prompt_tokens"], 3) if stats["prompt_tokens"] else None,
+            }
+        return summary
+
+
+# ✅ Modules that register prompts, imported by the CLI below
+PROMPT_MODULES = [
+    "tools.detect_intent",
+    "tools.location_extractor",
+    "tools.utils",
+    "agents.flight_search_agent",
+    "agents.flight_selection_agent",
+    "agents.flight_query_agent",
+    "agents.smart_assistant_agent",
+    "agents.passenger_details_agent",
+    "agents.language_detection_agent",
+    "agents.confirm_booking_agent",
+]
+
+
+def main():
+    from tabulate import tabulate
+
+    for module_name in PROMPT_MODULES:
+        importlib.import_module(module_name)
+    rows = [
+        {"prompt": name, "static_tokens": template.system_tokens, "static_bytes": len(template.system.encode("utf-8"))}
+        for name, template in sorted(PROMPTS.items())
+    ]
+    print(tabulate(rows, headers="keys"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("speculative-search")
+
+SEARCH_RESULT_TTL = float(os.getenv("SEARCH_RESULT_TTL", "300"))  # Seconds a finished search stays reusable
+STALE_RESULT_TTL = float(os.getenv("STALE_RESULT_TTL", "1800"))  # Seconds a result may be served while the upstream is down
+STALE_RESULT_LIMIT = 20
+
+
+class SpeculativeSearchScheduler:
+    """
+    Keyed, single-flight background searches.
+
+    - `schedule(request)` starts the search for `key_func(request)` in the background as soon as the
+      slots are known, and drops unfinished speculative searches for other keys (the slots changed).
+    - `get(request)` hands over the in-flight or cached result for the same key, or searches now.
+
+    Error results (strings) and exceptions are never cached. The last good results are also kept
+    for `stale()`, the fallback while the upstream is unavailable.
+    """
+
+    def __init__(self, search_func, key_func, ttl=SEARCH_RESULT_TTL, max_workers=4):
+        self.search_func = search_func
+        self.key_func = key_func
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="flight-search")
+        self._entries = {}  # key -> (future, started_at)
+        self._last_results = OrderedDict()  # key -> (result, finished_at)
+        self._lock = threading.Lock()
+        self.stats = {"scheduled": 0, "reused": 0, "discarded": 0, "direct": 0, "stale_served": 0}
+
+    def _fresh_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        future, started_at = entry
+        if time.monotonic() - started_at > self.ttl:
+            del self._entries[key]
+            return None
+        return future
+
+    def schedule(self, request, replace=True):
+        """Starts (or reuses) the background search for `request`. Returns the future, or None if the slots are incomplete."""
+        key = self.key_func(request)
+        if key is None:
+            return None
+
+        dropped = []
+        with self._lock:
+            for other_key in list(self._entries):
+                self._fresh_entry(other_key)  # ✅ Drops expired searches (and their results) of abandoned slots
+            future = self._fresh_entry(key)
+            if future is not None:
+                return future
+
+            if replace:
+                # ✅ Slots changed: unfinished searches for the old slots are no longer wanted
+                for other_key, (other_future, _) in list(self._entries.items()):
+                    if not other_future.done():
+                        dropped.append(other_future)
+                        del self._entries[other_key]
+                        self.stats["discarded"] += 1
+
+            future = self._executor.submit(self.search_func, dict(request))
+            self._entries[key] = (future, time.monotonic())
+            self.stats["scheduled"] += 1
+
+        # ✅ Outside the lock: cancel() and add_done_callback() on a finished future run the
+        # callbacks right away, and _forget_failures takes the lock itself
+        future.add_done_callback(lambda done, key=key: self._forget_failures(key, done))
+        for other_future in dropped:
+            other_future.cancel()  # Only succeeds while still queued; running ones are just dropped
+
+        logger.info("🛫 Search started in background for %s", key)
+        return future
+
+    def _forget_failures(self, key, future):
+        if future.cancelled() or future.exception() is not None or isinstance(future.result(), str):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and entry[0] is future:
+                    del self._entries[key]
+            return
+        with self._lock:
+            self._last_results[key] = (future.result(), time.monotonic())
+            self._last_results.move_to_end(key)
+            while len(self._last_results) > STALE_RESULT_LIMIT:
+                self._last_results.popitem(last=False)
+
+    def stale(self, request, max_age=STALE_RESULT_TTL):
+        """Returns the last good result for `request` up to `max_age` seconds old, or None."""
+        key = self.key_func(request)
+        with self._lock:
+            entry = self._last_results.get(key) if key is not None else None
+            if entry is None or time.monotonic() - entry[1] > max_age:
+                return None
+            self.stats["stale_served"] += 1
+        return entry[0]
+
+    def peek(self, request):
+        """Returns the finished result for `request` without waiting, or None."""
+        key = self.key_func(request)
+        with self._lock:
+            future = self._fresh_entry(key) if key is not None else None
+        if future is None or not future.done() or future.cancelled() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def get(self, request, timeout=None):
+        """Returns the search result for `request`, waiting for an in-flight search if there is one."""
+        key = self.key_func(request)
+        with self._lock:
+            future = self._fresh_entry(key) if key is not None else None
+            # ✅ Counted under the lock like every stats update: get() runs on several threads
+            self.stats["reused" if future is not None else "direct"] += 1
+
+        if future is None:
+            future = self.schedule(request, replace=False) if key is not None else None
+            if future is None:
+                return self.search_func(dict(request))
+        return future.result(timeout=timeout)
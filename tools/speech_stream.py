@@ -0,0 +1,111 @@
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger("speech-stream")
+
+MIN_SENTENCE_CHARS = int(os.getenv("MIN_SENTENCE_CHARS", "20"))  # Shorter sentences are merged with the next one
+FIRST_AUDIO_SAMPLES = int(os.getenv("FIRST_AUDIO_SAMPLES", "200"))  # Latency samples kept per tool
+
+# ✅ Sentence end: . ! ? or the Bangla dari, followed by whitespace
+SENTENCE_END = re.compile(r"(?<=[.!?।])\s+")
+
+
+async def sentence_stream(tokens, fallback=None, min_chars=MIN_SENTENCE_CHARS):
+    """
+    Regroups an async stream of LLM tokens into complete sentences for TTS.
+    If the token stream fails before anything was yielded, `fallback` is yielded instead.
+    """
+    buffer = ""
+    spoken = False
+    try:
+        async for token in tokens:
+            buffer += token
+            parts = SENTENCE_END.split(buffer)
+            buffer = parts.pop()
+            sentence = ""
+            for part in parts:
+                sentence = f"{sentence} {part}" if sentence else part
+                if len(sentence) >= min_chars:
+                    spoken = True
+                    yield sentence + " "
+                    sentence = ""
+            if sentence:
+                buffer = f"{sentence} {buffer}"
+    except Exception as e:
+        logger.error("❌ Streamed answer failed: %s", e)
+        if spoken or fallback is None:
+            return
+        buffer = fallback
+    if buffer.strip():
+        yield buffer.strip()
+
+
+class FirstAudioTracker:
+    """
+    Time from a tool call to the first audio of its answer, per tool. The first sentence handed to
+    TTS is timed as well, which separates LLM latency from synthesis latency.
+    """
+
+    def __init__(self, max_samples=FIRST_AUDIO_SAMPLES):
+        self.max_samples = max_samples
+        self.samples = {}  # tool -> {"first_sentence": [seconds], "first_audio": [seconds]}
+        self._pending = None  # (tool, started_at)
+        self._lock = threading.Lock()
+
+    def start(self, tool):
+        """Called when the voice LLM invokes `tool`."""
+        with self._lock:
+            self._pending = (tool, time.monotonic())
+
+    def _add(self, tool, field, seconds):
+        samples = self.samples.setdefault(tool, {"first_sentence": [], "first_audio": []})[field]
+        samples.append(seconds)
+        del samples[:-self.max_samples]
+
+    async def track(self, tool, sentences):
+        """Passes `sentences` through, timing the first one for `tool`."""
+        first = True
+        async for sentence in sentences:
+            if first:
+                first = False
+                with self._lock:
+                    if self._pending and self._pending[0] == tool:
+                        self._add(tool, "first_sentence", time.monotonic() - self._pending[1])
+            yield sentence
+
+    def speech_started(self):
+        """Called when the agent starts speaking; closes the pending tool call."""
+        with self._lock:
+            if self._pending is None:
+                return
+            tool, started_at = self._pending
+            self._pending = None
+            latency = time.monotonic() - started_at
+            self._add(tool, "first_audio", latency)
+        logger.debug("First audio of %s after %.0f ms", tool, latency * 1000)
+
+    def summary(self):
+        def percentiles(values):
+            ordered = sorted(values)
+            if not ordered:
+                return None
+            return {
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000),
+            }
+
+        with self._lock:
+            return {
+                tool: {
+                    "calls": len(fields["first_audio"]),
+                    "first_sentence": percentiles(fields["first_sentence"]),
+                    "first_audio": percentiles(fields["first_audio"]),
+                }
+                for tool, fields in self.samples.items()
+            }
+
+
+first_audio = FirstAudioTracker()
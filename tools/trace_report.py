@@ -0,0 +1,138 @@
+"""
+Reports on the spans written by tools/tracing.py (data/logs/traces-*.jsonl.*), e.g.:
+
+    python -m tools.trace_report                     # waterfall of every turn of the latest call
+    python -m tools.trace_report --call 3f2a9c1b7d04  # waterfall of one call
+    python -m tools.trace_report --stats             # per-stage percentiles across all calls
+"""
+import argparse
+import glob
+import gzip
+import io
+import json
+import os
+from tabulate import tabulate
+from tools.audit_log import AUDIT_LOG_DIR
+
+try:
+    import zstandard  # Optional: needed for .zst trace files
+except ImportError:
+    zstandard = None
+
+BAR_WIDTH = 40
+
+
+def _open(path):
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise SystemExit(f"zstandard is required to read {path}")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb")), encoding="utf-8")
+    return gzip.open(path, "rt", encoding="utf-8")
+
+
+def load_spans(directory=AUDIT_LOG_DIR):
+    """Returns the spans of all trace files, each with its `call_id`, in file order."""
+    spans = []
+    for path in sorted(glob.glob(os.path.join(directory, "traces-*.jsonl.*"))):
+        try:
+            with _open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # Truncated last line of a file that is still being written
+                    if record.get("kind") == "span":
+                        spans.append({**record["body"], "call_id": record.get("call_id")})
+        except (OSError, EOFError):
+            continue  # File still open by a running worker
+    return spans
+
+
+def _percentile(values, percentile):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+def stage_stats(spans):
+    """Per span name: count, error count and p50/p95/p99/max duration in ms."""
+    durations = {}
+    errors = {}
+    for item in spans:
+        durations.setdefault(item["name"], []).append(item["duration_ms"])
+        errors[item["name"]] = errors.get(item["name"], 0) + (item["status"] == "error")
+    rows = [
+        {
+            "stage": name,
+            "count": len(values),
+            "errors": errors[name],
+            "p50_ms": _percentile(values, 50),
+            "p95_ms": _percentile(values, 95),
+            "p99_ms": _percentile(values, 99),
+            "max_ms": max(values),
+        }
+        for name, values in durations.items()
+    ]
+    return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
+
+
+def waterfall(trace_spans):
+    """Text waterfall of one trace: spans as an indented tree with offset, duration and a bar."""
+    by_id = {item["span_id"]: item for item in trace_spans}
+    children = {}
+    roots = []
+    for item in sorted(trace_spans, key=lambda item: item["start"]):
+        parent_id = item["parent_id"] if item["parent_id"] in by_id else None
+        (children.setdefault(parent_id, []) if parent_id else roots).append(item)
+
+    start = min(item["start"] for item in trace_spans)
+    total = max(item["end"] for item in trace_spans) - start or 1e-9
+    lines = []
+
+    def render(item, depth):
+        offset = item["start"] - start
+        left = int(offset / total * BAR_WIDTH)
+        width = max(1, int((item["end"] - item["start"]) / total * BAR_WIDTH))
+        bar = " " * left + "█" * min(width, BAR_WIDTH - left)
+        marker = " ✗" if item["status"] == "error" else ""
+        label = ("  " * depth + item["name"])[:48]
+        lines.append(f"{label:<48} {offset * 1000:>8.0f} {item['duration_ms']:>8.0f}  |{bar:<{BAR_WIDTH}}|{marker}")
+        for child in children.get(item["span_id"], []):
+            render(child, depth + 1)
+
+    for root in roots:
+        render(root, 0)
+    header = f"{'span':<48} {'at_ms':>8} {'dur_ms':>8}"
+    return "\n".join([header] + lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Waterfall and percentile reports of the per-turn traces.")
+    parser.add_argument("--dir", default=AUDIT_LOG_DIR, help="Directory of the trace files")
+    parser.add_argument("--call", help="call_id to show (default: the latest call)")
+    parser.add_argument("--stats", action="store_true", help="Per-stage percentiles across all calls")
+    args = parser.parse_args()
+
+    spans = load_spans(args.dir)
+    if not spans:
+        print("No spans found.")
+        return
+    if args.stats:
+        print(f"{len({item['call_id'] for item in spans})} calls, {len(spans)} spans")
+        print(tabulate(stage_stats(spans), headers="keys"))
+        return
+
+    call_id = args.call or max(spans, key=lambda item: item["end"])["call_id"]
+    traces = {}
+    for item in spans:
+        if item["call_id"] == call_id:
+            traces.setdefault(item["trace_id"], []).append(item)
+    print(f"Call {call_id}: {len(traces)} turns")
+    for trace_spans in sorted(traces.values(), key=lambda items: min(item["start"] for item in items)):
+        turn = next((item for item in trace_spans if item["name"] == "turn"), None)
+        first_audio = turn["attributes"].get("first_audio_ms") if turn else None
+        print(f"\nTrace {trace_spans[0]['trace_id'][:12]}  first_audio_ms={first_audio}")
+        print(waterfall(trace_spans))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import atexit
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import requests
+from tools.audit_log import AuditLogWriter, AUDIT_LOG_DIR
+from tools.logging_config import call_context
+
+logger = logging.getLogger("tracing")
+
+TRACING = os.getenv("TRACING", "on") == "on"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))  # Share of calls whose spans are exported
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")  # e.g. http://localhost:4318, spans are POSTed to /v1/traces
+TRACE_OTLP_BATCH = int(os.getenv("TRACE_OTLP_BATCH", "200"))
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "akij-inbound-flight-agent")
+
+# ✅ Finished spans go to data/logs/traces-*.jsonl.gz, one {"kind": "span", "body": span} record per line
+trace_log = AuditLogWriter(directory=AUDIT_LOG_DIR, prefix="traces", sample_rate=TRACE_SAMPLE_RATE)
+atexit.register(trace_log.close)
+
+_active_span = contextvars.ContextVar("active_span", default=None)
+# ✅ One caller per worker process: spans without a parent in their context (worker threads) join the turn
+_turn_span = None
+
+
+def _new_id(length):
+    return uuid.uuid4().hex[:length]
+
+
+class Span:
+    """One timed operation of a caller turn. Times are epoch seconds, like OpenTelemetry's."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "end", "attributes", "status")
+
+    def __init__(self, name, trace_id=None, parent_id=None, start=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id or _new_id(32)
+        self.span_id = _new_id(16)
+        self.parent_id = parent_id
+        self.start = start if start is not None else time.time()
+        self.end = None
+        self.attributes = attributes or {}
+        self.status = "ok"
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        self.status = "error"
+        self.attributes["error"] = str(error)[:200]
+
+    def finish(self, end=None):
+        if self.end is not None:
+            return
+        self.end = end if end is not None else time.time()
+        _export(self)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": round(self.start, 6),
+            "end": round(self.end, 6),
+            "duration_ms": round((self.end - self.start) * 1000, 1),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+    def fail(self, error):
+        pass
+
+    def finish(self, end=None):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _parent():
+    return _active_span.get() or _turn_span
+
+
+def start_span(name, start=None, **attributes):
+    """Starts a span under the active span (or the current turn). The caller must finish() it."""
+    if not TRACING:
+        return NOOP_SPAN
+    parent = _parent()
+    return Span(
+        name,
+        trace_id=parent.trace_id if parent else None,
+        parent_id=parent.span_id if parent else None,
+        start=start,
+        attributes=attributes,
+    )
+
+
+@contextmanager
+def span(name, **attributes):
+    """Times the block as a span; spans started inside it (also in asyncio.to_thread) become its children."""
+    current = start_span(name, **attributes)
+    if current is NOOP_SPAN:
+        yield current
+        return
+    token = _active_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(e)
+        raise
+    finally:
+        _active_span.reset(token)
+        current.finish()
+
+
+def record_span(name, duration, end=None, ok=True, **attributes):
+    """Records an operation that already happened (`duration` seconds up to `end`, default now)."""
+    if not TRACING:
+        return
+    end = end if end is not None else time.time()
+    finished = start_span(name, start=end - max(0.0, duration), **attributes)
+    if not ok:
+        finished.status = "error"
+    finished.finish(end)
+
+
+def start_turn_trace(label="", start=None):
+    """Starts the root span of a new caller turn (a new trace), ending the previous one."""
+    global _turn_span
+    end_turn_trace()
+    if not TRACING:
+        return NOOP_SPAN
+    _turn_span = Span("turn", start=start, attributes={"label": label})
+    return _turn_span
+
+
+def end_turn_trace(end=None):
+    global _turn_span
+    turn, _turn_span = _turn_span, None
+    if turn is not None:
+        turn.finish(end)
+
+
+def current_turn_trace():
+    return _turn_span
+
+
+def _export(finished):
+    record = finished.to_dict()
+    trace_log.log("span", record, call_id=call_context["call_id"], room=call_context["room"])
+    if _otlp_exporter is not None:
+        _otlp_exporter.export(record, call_context["call_id"])
+
+
+class OTLPExporter:
+    """
+    Minimal OTLP/HTTP JSON exporter (collector stand-in): batches spans on a bounded queue and
+    POSTs them from a background thread. Spans are dropped, never waited for, when it falls behind.
+    """
+
+    def __init__(self, endpoint, batch_size=TRACE_OTLP_BATCH):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.batch_size = batch_size
+        self.stats = {"exported": 0, "dropped": 0, "failed_batches": 0}
+        self._queue = queue.Queue(maxsize=batch_size * 10)
+        threading.Thread(target=self._run, name="otlp-exporter", daemon=True).start()
+
+    def export(self, record, call_id):
+        try:
+            self._queue.put_nowait((record, call_id))
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=1.0))
+                except queue.Empty:
+                    break
+            try:
+                requests.post(self.url, json=self._payload(batch), timeout=5).raise_for_status()
+                self.stats["exported"] += len(batch)
+            except Exception as e:
+                self.stats["failed_batches"] += 1
+                logger.warning("OTLP export failed: %s", e)
+
+    @staticmethod
+    def _payload(batch):
+        def attribute(key, value):
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        spans = [
+            {
+                "traceId": record["trace_id"],
+                "spanId": record["span_id"],
+                "parentSpanId": record["parent_id"] or "",
+                "name": record["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(int(record["start"] * 1e9)),
+                "endTimeUnixNano": str(int(record["end"] * 1e9)),
+                "attributes": [attribute("call_id", call_id)] + [attribute(k, v) for k, v in record["attributes"].items()],
+                "status": {"code": 2 if record["status"] == "error" else 1},
+            }
+            for record, call_id in batch
+        ]
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "tools.tracing"}, "spans": spans}],
+            }]
+        }
+
+
+_otlp_exporter = OTLPExporter(TRACE_OTLP_ENDPOINT) if TRACING and TRACE_OTLP_ENDPOINT else None
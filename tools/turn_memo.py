@@ -0,0 +1,163 @@
+import copy
+import functools
+import json
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from tools.deadline import start_deadline, clear_deadline
+from tools.tracing import start_turn_trace, end_turn_trace
+from tools.worker_metrics import counter
+
+logger = logging.getLogger("turn-memo")
+
+# ✅ One caller per worker process, so the active turn is process-wide state
+_current_turn = None
+_turn_lock = threading.Lock()
+_turn_counter = 0
+turn_memo_stats = []  # Per-turn summaries: {"turn": n, "label": ..., "calls": ..., "hits": ...}
+MEMO_LOOKUPS = counter("turn_memo_lookups_total", "Lookups in the per-turn memo")
+MEMO_HITS = counter("turn_memo_hits_total", "Lookups answered by the per-turn memo")
+
+
+class TurnMemo:
+    """
+    Memo table that lives for exactly one caller utterance.
+    Concurrent callers of the same key wait for the first computation instead of repeating it.
+    """
+
+    def __init__(self, turn_id, label=""):
+        self.turn_id = turn_id
+        self.label = label
+        self.calls = 0
+        self.hits = 0
+        self.hits_by_namespace = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            self.calls += 1
+            future = self._entries.get(key)
+            if future is not None:
+                self.hits += 1
+                namespace = key.split("|", 1)[0]
+                self.hits_by_namespace[namespace] = self.hits_by_namespace.get(namespace, 0) + 1
+                owner = False
+            else:
+                future = Future()
+                self._entries[key] = future
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            # ✅ Failures are not memoized, the next caller retries
+            with self._lock:
+                self._entries.pop(key, None)
+            future.set_exception(e)
+            raise
+        future.set_result(value)
+        return value
+
+    def invalidate(self, namespace):
+        prefix = namespace + "|"
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def summary(self):
+        return {
+            "turn": self.turn_id,
+            "label": self.label,
+            "calls": self.calls,
+            "hits": self.hits,
+            "hits_by_namespace": dict(self.hits_by_namespace),
+        }
+
+
+def begin_turn(label=""):
+    """
+    Ends the previous turn (if any) and starts a fresh memo and latency budget for a new
+    caller utterance.
+    """
+    global _current_turn, _turn_counter
+    end_turn()
+    with _turn_lock:
+        _turn_counter += 1
+        _current_turn = TurnMemo(_turn_counter, label)
+        start_deadline(label=label)
+        return _current_turn
+
+
+def end_turn():
+    """Closes the active turn and reports its memo hit count."""
+    global _current_turn
+    with _turn_lock:
+        turn, _current_turn = _current_turn, None
+    if turn is None:
+        return None
+    clear_deadline()
+    summary = turn.summary()
+    turn_memo_stats.append(summary)
+    del turn_memo_stats[:-100]  # Keep only recent turns
+    MEMO_LOOKUPS.inc(summary["calls"])
+    MEMO_HITS.inc(summary["hits"])
+    logger.info("Turn %s memo: %s hits / %s calls %s", summary["turn"], summary["hits"], summary["calls"], summary["hits_by_namespace"])
+    return summary
+
+
+def current_turn():
+    return _current_turn
+
+
+@contextmanager
+def turn_scope(label=""):
+    """Runs the block inside a turn, reusing the active one if the voice pipeline already started it."""
+    if _current_turn is not None:
+        yield _current_turn
+        return
+    turn = begin_turn(label)
+    start_turn_trace(label)
+    try:
+        yield turn
+    finally:
+        if _current_turn is turn:
+            end_turn()
+        end_turn_trace()
+
+
+def make_key(namespace, *parts):
+    return namespace + "|" + json.dumps(parts, sort_keys=True, default=str)
+
+
+def memoize(namespace, key_parts, compute, copy_result=False):
+    """
+    Returns `compute()` memoized for the active turn under `namespace` + `key_parts`.
+    Outside a turn the value is computed directly.
+    """
+    turn = _current_turn
+    if turn is None:
+        return compute()
+    value = turn.get_or_compute(make_key(namespace, *key_parts), compute)
+    return copy.deepcopy(value) if copy_result else value
+
+
+def invalidate(namespace):
+    """Drops memoized values of `namespace` from the active turn (e.g. after a file write)."""
+    turn = _current_turn
+    if turn is not None:
+        turn.invalidate(namespace)
+
+
+def turn_memoized(namespace, copy_result=False):
+    """Decorator that dedupes identical calls of a function within one turn."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return memoize(namespace, (args, kwargs), lambda: func(*args, **kwargs), copy_result=copy_result)
+        return wrapper
+    return decorator
@@ -5,6 +5,8 @@ import openai
 import os
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from tools.llm_client import chat_completion
+from tools.prompt_registry import register_prompt
 load_dotenv()
 
 
@@ -16,24 +18,22 @@ PASSENGER_DETAILS_FILE = "data/passenger_data.json"
 
 
 
-def correct_airport_name(input_text, known_names):
-    import openai
-    prompt = f"""
-    Match the following name to the closest valid option from the list below:
+AIRPORT_NAME_PROMPT = register_prompt(
+    "correct_airport_name",
+    system="Match the input name to the closest valid option from the list. Output: Best matching valid name.",
+    user="""
     List: {known_names}
 
     Input: {input_text}
-    Output: Best matching valid name.
-    """
+    """,
+)
 
-    client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=10,
-        temperature=0
+
+def correct_airport_name(input_text, known_names):
+    return chat_completion(
+        AIRPORT_NAME_PROMPT.messages(known_names=known_names, input_text=input_text),
+        call_site="correct_airport_name",
     )
-    return response.choices[0].message.content.strip()
 
 
 def load_data(file):
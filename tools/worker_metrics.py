@@ -0,0 +1,344 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("worker-metrics")
+
+METRICS = os.getenv("METRICS", "on") == "on"
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))  # Fixed port of the main worker process
+# ✅ Job processes (one per call) write their metrics here; the main worker process serves the sum
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "akij-agent-metrics"))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))  # Seconds between two job-process snapshots
+METRICS_PREFIX = "akij_agent_"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, float("inf"))  # Seconds
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = METRICS_PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> value
+        self._lock = threading.Lock()
+
+
+class Counter(_Metric):
+    """Monotonic counter, one series per label combination."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def series(self):
+        with self._lock:
+            return [[dict(zip(self.labelnames, key)), value] for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """Value that goes up and down (active calls)."""
+
+    kind = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """
+    Histogram with fixed buckets: observe() only increments one bucket under the metric's lock,
+    the cumulative counts Prometheus expects are computed when scraped.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def series(self):
+        with self._lock:
+            return [[dict(zip(self.labelnames, key)), [list(counts), total]] for key, (counts, total) in self._values.items()]
+
+
+REGISTRY = {}  # name -> metric
+_collectors = []  # Callables returning [(name, kind, help, [(labels dict, value)])] at scrape time
+_routes = {}  # Extra GET paths of the metrics server -> callable returning the plain-text body
+
+
+def _register(metric):
+    existing = REGISTRY.get(metric.name)
+    if existing is not None:
+        return existing  # Module re-imported (e.g. by a CLI): keep counting into the same series
+    REGISTRY[metric.name] = metric
+    return metric
+
+
+def counter(name, help, labelnames=()):
+    return _register(Counter(name, help, labelnames))
+
+
+def gauge(name, help, labelnames=()):
+    return _register(Gauge(name, help, labelnames))
+
+
+def histogram(name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+    return _register(Histogram(name, help, labelnames, buckets))
+
+
+def register_collector(collect):
+    """
+    Registers `collect()`, called on every scrape, for stats a module already keeps elsewhere
+    (breaker states, cache counters). It returns [(name, kind, help, [(labels, value), ...])].
+    """
+    _collectors.append(collect)
+
+
+def register_route(path, handler):
+    """Serves `handler()` (plain text) at `path` next to /metrics, e.g. debug reports."""
+    _routes[path] = handler
+
+
+def counter_family(name, help, stats, label):
+    """Collector family exposing a flat {key: count} stats dict as one counter labelled `label`."""
+    return name, "counter", help, [({label: key}, value) for key, value in dict(stats).items()]
+
+
+def snapshot():
+    """
+    This process's metrics as plain data, also the format of the job-process files:
+    {name: {"kind", "help", "buckets", "series": [[labels, value]]}}, a histogram value is [counts, sum].
+    """
+    families = {}
+    for metric in list(REGISTRY.values()):
+        families[metric.name] = {
+            "kind": metric.kind, "help": metric.help, "buckets": getattr(metric, "buckets", None), "series": metric.series(),
+        }
+    for collect in list(_collectors):
+        try:
+            collected = collect()
+        except Exception as e:  # A broken collector must not take the endpoint down
+            logger.warning("Metrics collector %s failed: %s", getattr(collect, "__name__", collect), e)
+            continue
+        for name, kind, help, samples in collected:
+            families[METRICS_PREFIX + name] = {"kind": kind, "help": help, "buckets": None, "series": [[dict(labels), value] for labels, value in samples]}
+    return families
+
+
+def _merge(merged, families, gauges=True):
+    """Adds `families` (snapshot format) to `merged` ({name: family with "series": {label items: value}})."""
+    for name, family in families.items():
+        if family["kind"] == "gauge" and not gauges:
+            continue
+        target = merged.setdefault(name, {"kind": family["kind"], "help": family["help"], "buckets": family["buckets"], "series": {}})
+        for labels, value in family["series"]:
+            key = tuple(sorted(labels.items()))
+            current = target["series"].get(key)
+            if family["kind"] == "histogram":
+                if current is None or len(current[0]) != len(value[0]):
+                    target["series"][key] = [list(value[0]), value[1]]
+                else:
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+            else:
+                target["series"][key] = (current or 0) + value
+
+
+def _as_families(merged):
+    return {
+        name: {**family, "series": [[dict(key), value] for key, value in family["series"].items()]}
+        for name, family in merged.items()
+    }
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_archive = {}  # Counters and histograms of job processes that have exited (merged format)
+_archive_lock = threading.Lock()
+
+
+def _merge_job_files(merged):
+    """
+    Adds the job-process files: counters and histograms of every process that ever reported
+    (exited ones are folded into the archive and their file removed), gauges of live ones only.
+    """
+    with _archive_lock:
+        for path in glob.glob(os.path.join(METRICS_DIR, "job-*.json")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    report = json.load(f)
+            except (OSError, ValueError):
+                continue  # Removed meanwhile
+            if _pid_alive(report["pid"]):
+                _merge(merged, report["families"])
+                continue
+            _merge(_archive, report["families"], gauges=False)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        _merge(merged, _as_families(_archive), gauges=False)
+
+
+def _format(merged):
+    lines = []
+    for name, family in sorted(merged.items()):
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        for key, value in family["series"].items():
+            if family["kind"] != "histogram":
+                lines.append(f"{name}{_format_labels(key)} {value}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(family["buckets"], counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_bound(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{name}_count{_format_labels(key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def render():
+    """
+    All metrics in the Prometheus text exposition format: this process's and, in the main
+    worker process, the sum over the job processes. Gauges are summed over live processes.
+    """
+    merged = {}
+    _merge(merged, snapshot())
+    if _role == "worker":
+        _merge_job_files(merged)
+    return _format(merged)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        handler = render if path == "/metrics" else _routes.get(path)
+        if handler is None:
+            self.send_error(404)
+            return
+        try:
+            body = handler().encode("utf-8")
+        except Exception as e:
+            logger.warning("Metrics server route %s failed: %s", path, e)
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # One line per scrape would drown the call logs
+
+
+_server = None
+_role = None  # "worker" (serves /metrics) or "job" (reports to it)
+
+
+def process_role():
+    return _role
+
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """
+    Serves /metrics on a fixed port from the main worker process (call before cli.run_app), in a
+    daemon thread so scrapes never wait on an event loop. Job processes report through METRICS_DIR.
+    """
+    global _server, _role
+    if _server is not None or not METRICS:
+        return _server
+    _role = "worker"
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)  # Files of a previous worker run
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    try:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning("Metrics port %s:%s unavailable, metrics are not exported: %s", host, port, e)
+        return None
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info("Metrics served on http://%s:%s/metrics", host, port)
+    return _server
+
+
+def flush_metrics():
+    """Writes this job process's snapshot to METRICS_DIR (atomically, the server may read it any time)."""
+    if _role != "job":
+        return
+    path = os.path.join(METRICS_DIR, f"job-{os.getpid()}.json")
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"pid": os.getpid(), "families": snapshot()}, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        logger.warning("Metrics snapshot not written: %s", e)
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        flush_metrics()
+
+
+def start_metrics_reporter():
+    """Reports this job process's metrics to the main worker process every METRICS_FLUSH_INTERVAL seconds (once per process)."""
+    global _role
+    if _role is not None or not METRICS:
+        return
+    _role = "job"
+    threading.Thread(target=_flush_periodically, name="metrics-reporter", daemon=True).start()
+    atexit.register(flush_metrics)